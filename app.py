@@ -3,25 +3,29 @@ import pandas as pd
 import streamlit as st
 
 from utils.db_query import (
-    get_primary_gene_id,
-    get_gene_annotation,
-    get_gene_core,
-    get_sequences,
-    get_promoter,
+    get_gene_annotation_table,
+    get_promoters,
     get_fielder_best_hit,
     get_fielder_all_hits,
-    get_fielder_promoter,
+    get_fielder_promoters,
     get_cs_self_best_hit,
-    get_cs_self_all_hits
+    get_cs_self_all_hits,
+    search_alias
 )
 
-from utils.go_enrichment import run_go_enrichment, create_go_barplot_bytes
-from utils.kegg_enrichment import (
-    run_kegg_enrichment,
-    create_kegg_bubbleplot_bytes,
-    create_kegg_barplot_bytes
+from utils.fasta_export import SpoolReader, build_promoter_outputs, write_sequence_fasta_files
+from utils.plot_cache import (
+    PLOT_FORMATS,
+    PLOT_MIME_TYPES,
+    PREVIEW_DPI,
+    EXPORT_DPI,
+    cached_plot,
+    is_rendered
 )
 
+# GO / KEGG 富集相关模块依赖 scipy / matplotlib，导入较慢，
+# 只在打开对应页面时才在页面分支内导入，不拖慢首页和其他页面的首次渲染。
+
 # -------------------- 工具函数 --------------------
 def read_gene_ids(uploaded_file, manual_input):
     if uploaded_file:
@@ -166,6 +170,113 @@ def render_example_tools(
     if help_text:
         st.caption(help_text)
 
+def read_contrast_gene_lists(uploaded_files):
+    """
+    批量富集：每个上传的 TXT 文件作为一个 contrast，
+    文件名（去掉扩展名）作为 contrast 名称。
+    与命令行一致，两个文件得到同一个名称时报错并停止，不自动改名。
+    """
+    gene_lists = {}
+    sources = {}
+    for uploaded_file in uploaded_files or []:
+        name = os.path.splitext(uploaded_file.name)[0]
+        if name in sources:
+            st.error(
+                f"上传文件 {sources[name]} 和 {uploaded_file.name} 的 contrast 名称都是 {name!r}，"
+                "请重命名其中一个后重新上传。"
+            )
+            st.stop()
+        sources[name] = uploaded_file.name
+        genes = read_gene_ids(uploaded_file, "")
+        gene_lists[name] = [g.strip() for g in genes if g.strip()]
+    return gene_lists
+
+def render_batch_enrichment_results(results_df, sig_df, summary_df, file_prefix):
+    """
+    批量富集结果展示和下载（三张表都带 contrast 列）。
+    """
+    st.subheader("分析摘要")
+    st.dataframe(summary_df, use_container_width=True)
+
+    if results_df.empty:
+        st.warning("所有 contrast 都没有得到富集结果，请检查输入基因 ID。")
+        return
+
+    st.subheader("显著富集结果")
+    if sig_df.empty:
+        st.warning("当前阈值下没有显著富集条目，下面展示全部结果。")
+        st.dataframe(results_df, use_container_width=True)
+    else:
+        st.dataframe(sig_df, use_container_width=True)
+
+    st.download_button(
+        "📥 下载全部结果 TSV",
+        data=results_df.to_csv(sep="\t", index=False).encode("utf-8-sig"),
+        file_name=f"{file_prefix}_batch_results.tsv",
+        mime="text/tab-separated-values"
+    )
+
+    st.download_button(
+        "📥 下载显著结果 TSV",
+        data=sig_df.to_csv(sep="\t", index=False).encode("utf-8-sig"),
+        file_name=f"{file_prefix}_batch_results_sig.tsv",
+        mime="text/tab-separated-values"
+    )
+
+    st.download_button(
+        "📥 下载分析摘要 TSV",
+        data=summary_df.to_csv(sep="\t", index=False).encode("utf-8-sig"),
+        file_name=f"{file_prefix}_batch_summary.tsv",
+        mime="text/tab-separated-values"
+    )
+
+
+def render_cached_plot(
+    plot_func,
+    plot_df,
+    plot_params,
+    title,
+    caption,
+    download_label,
+    file_stem,
+    key,
+    spec_func=None,
+    interactive=False,
+    image_format="png"
+):
+    """
+    页面预览 + 按需导出：
+    - interactive=True 且提供 spec_func 时，预览由浏览器根据 Vega-Lite 规格绘制，服务器不出图；
+    - 否则显示低分辨率 PNG 预览；
+    - 点击按钮后才渲染 image_format 格式的高清图并提供下载。
+    预览和导出图都进入渲染缓存，只改表格 / 其他图的参数时不会重新绘制。
+    """
+    if interactive and spec_func is not None:
+        spec = spec_func(plot_df, **plot_params)
+        if spec is None:
+            return
+        st.subheader(title)
+        st.vega_lite_chart(spec, use_container_width=True)
+    else:
+        preview = cached_plot(plot_func, plot_df, dpi=PREVIEW_DPI, **plot_params)
+        if preview is None:
+            return
+        st.subheader(title)
+        st.image(preview, caption=caption, use_container_width=True)
+
+    export_params = {**plot_params, "image_format": image_format}
+    export_ready = is_rendered(plot_func, plot_df, dpi=EXPORT_DPI, **export_params)
+    if export_ready or st.button(f"🖼️ 生成高清图（{image_format.upper()}）", key=key):
+        with st.spinner("正在渲染高清图..."):
+            export_bytes = cached_plot(plot_func, plot_df, dpi=EXPORT_DPI, **export_params)
+        if export_bytes is not None:
+            st.download_button(
+                f"{download_label} {image_format.upper()}",
+                data=export_bytes,
+                file_name=f"{file_stem}.{image_format}",
+                mime=PLOT_MIME_TYPES[image_format]
+            )
+
 # -------------------- 打赏提示 --------------------
 def show_tip_box():
     """
@@ -681,6 +792,19 @@ The results generated by this platform should be interpreted together with origi
     if tool == "基因功能注释及三代基因号转换":
         st.header("🔍 基因功能注释及三代基因号转换（本地数据库版）")
 
+        with st.expander("🔎 基因号模糊搜索（不确定完整基因号时使用）", expanded=False):
+            alias_keyword = st.text_input(
+                "输入基因号片段（不区分大小写，例如 1A02G0001）",
+                key="input_alias_search"
+            )
+            if alias_keyword.strip():
+                alias_hits = search_alias(alias_keyword, limit=20)
+                if alias_hits.empty:
+                    st.caption("没有匹配的基因号")
+                else:
+                    st.caption("前缀匹配排在前面，最多显示 20 条")
+                    st.dataframe(alias_hits, use_container_width=True)
+
         uploaded_file = st.file_uploader(
             "上传 TXT 文件（基因号一行一个，不要加“.1”）",
             type=["txt"],
@@ -707,43 +831,16 @@ The results generated by this platform should be interpreted together with origi
         st.info(f"待查询基因数：{len(gene_ids)}")
 
         if st.button("开始查询", key="btn_gene_info"):
-            progress_bar = st.progress(0)
-            status_text = st.empty()
-
-            results = []
+            with st.spinner("正在批量查询基因注释，请稍候..."):
+                anno_table = get_gene_annotation_table(gene_ids)
 
-            for idx, input_gene_id in enumerate(gene_ids, 1):
-                status_text.text(f"正在查询：{input_gene_id} ({idx}/{len(gene_ids)})")
-
-                primary_gene_id = get_primary_gene_id(input_gene_id)
-                anno_df = get_gene_annotation(input_gene_id)
-                core_df = get_gene_core(input_gene_id)
-
-                third_id = None
-                description_en = None
-                description_zh = None
-
-                if not anno_df.empty:
-                    description_en = anno_df.iloc[0].get("description_en", None)
-                    description_zh = anno_df.iloc[0].get("description_zh", None)
-
-                if not core_df.empty:
-                    third_id = core_df.iloc[0].get("gene_id_v3", None)
-
-                results.append([
-                    input_gene_id,
-                    primary_gene_id if primary_gene_id is not None else "未找到",
-                    third_id if pd.notna(third_id) else "",
-                    description_en if pd.notna(description_en) else "",
-                    description_zh if pd.notna(description_zh) else ""
-                ])
-
-                progress_bar.progress(idx / len(gene_ids))
-
-            df = pd.DataFrame(
-                results,
-                columns=["输入基因号", "统一主键", "三代基因号", "功能描述（英文）", "功能描述（中文）"]
-            )
+            df = pd.DataFrame({
+                "输入基因号": anno_table["input_gene_id"],
+                "统一主键": anno_table["primary_gene_id"].fillna("未找到"),
+                "三代基因号": anno_table["gene_id_v3"].fillna(""),
+                "功能描述（英文）": anno_table["description_en"].fillna(""),
+                "功能描述（中文）": anno_table["description_zh"].fillna(""),
+            })
 
             st.success("✅ 查询完成！")
             st.dataframe(df, use_container_width=True)
@@ -755,9 +852,6 @@ The results generated by this platform should be interpreted together with origi
                 "text/csv"
             )
 
-            status_text.empty()
-            progress_bar.empty()
-
     # -------------------- 功能 2 --------------------
     elif tool == "基因cDNA & CDS & protein sequences下载":
         st.header("📍 cDNA / CDS / Protein 下载（本地数据库版）")
@@ -780,74 +874,42 @@ The results generated by this platform should be interpreted together with origi
 
         st.info(f"待查询基因数：{len(gene_ids)}")
 
-        if st.button("获取序列（cDNA / CDS / Protein）", key="btn_sequences"):
-            cdna_records = []
-            cds_records = []
-            protein_records = []
-            failed_genes = []
-            summary_rows = []
-
-            progress = st.progress(0)
-            status_text = st.empty()
-
-            for idx, input_gene_id in enumerate(gene_ids, 1):
-                status_text.text(f"正在处理: {input_gene_id} ({idx}/{len(gene_ids)})")
-
-                primary_gene_id = get_primary_gene_id(input_gene_id)
-                seq_df = get_sequences(input_gene_id)
-
-                if seq_df.empty:
-                    failed_genes.append(input_gene_id)
-                    summary_rows.append([input_gene_id, "", 0, 0, 0])
-                    progress.progress(idx / len(gene_ids))
-                    continue
-
-                cdna_df = seq_df[seq_df["sequence_type"] == "cdna"].copy()
-                cds_df = seq_df[seq_df["sequence_type"] == "cds"].copy()
-                protein_df = seq_df[seq_df["sequence_type"] == "protein"].copy()
-
-                summary_rows.append([
-                    input_gene_id,
-                    primary_gene_id if primary_gene_id else "",
-                    len(cdna_df),
-                    len(cds_df),
-                    len(protein_df)
-                ])
-
-                for _, row in cdna_df.iterrows():
-                    tx_id = row.get("transcript_id", "")
-                    seq = row.get("sequence", "")
-                    header = f">{input_gene_id}|{primary_gene_id}|{tx_id}|cdna"
-                    cdna_records.append(f"{header}\n{seq}\n")
-
-                for _, row in cds_df.iterrows():
-                    tx_id = row.get("transcript_id", "")
-                    seq = row.get("sequence", "")
-                    header = f">{input_gene_id}|{primary_gene_id}|{tx_id}|cds"
-                    cds_records.append(f"{header}\n{seq}\n")
-
-                for _, row in protein_df.iterrows():
-                    tx_id = row.get("transcript_id", "")
-                    seq = row.get("sequence", "")
-                    header = f">{input_gene_id}|{primary_gene_id}|{tx_id}|protein"
-                    protein_records.append(f"{header}\n{seq}\n")
-
-                if len(cdna_df) == 0 and len(cds_df) == 0 and len(protein_df) == 0:
-                    failed_genes.append(input_gene_id)
-
-                progress.progress(idx / len(gene_ids))
+        compress_fasta = st.checkbox(
+            "下载 gzip 压缩的 FASTA（.fasta.gz）",
+            value=False,
+            help="基因数很多时建议开启，下载文件更小。",
+            key="gzip_sequences"
+        )
 
-            summary_df = pd.DataFrame(
-                summary_rows,
-                columns=["输入基因号", "统一主键", "cDNA条数", "CDS条数", "Protein条数"]
-            )
+        if st.button("获取序列（cDNA / CDS / Protein）", key="btn_sequences"):
+            with st.spinner("正在按染色体分库批量导出序列，请稍候..."):
+                export = write_sequence_fasta_files(gene_ids, compress=compress_fasta)
+
+            summary_df = export["summary"].rename(columns={
+                "input_gene_id": "输入基因号",
+                "primary_gene_id": "统一主键",
+                "cdna": "cDNA条数",
+                "cds": "CDS条数",
+                "protein": "Protein条数",
+            })
+            failed_genes = export["failed_genes"]
+
+            if compress_fasta:
+                fasta_suffix, fasta_mime = ".fasta.gz", "application/gzip"
+            else:
+                fasta_suffix, fasta_mime = ".fasta", "text/plain"
 
             st.success("✅ 序列查询完成！")
             st.dataframe(summary_df, use_container_width=True)
 
-            st.download_button("📥 下载 cDNA FASTA", "".join(cdna_records), "cdna_sequences.fasta", "text/plain")
-            st.download_button("📥 下载 CDS FASTA", "".join(cds_records), "cds_sequences.fasta", "text/plain")
-            st.download_button("📥 下载 Protein FASTA ", "".join(protein_records), "protein_sequences.fasta", "text/plain")
+            # 下载按钮会把临时文件整个读进内存（每个文件一份），登记完数据后立即关闭删除临时文件
+            for label, seq_type in (
+                ("📥 下载 cDNA FASTA", "cdna"),
+                ("📥 下载 CDS FASTA", "cds"),
+                ("📥 下载 Protein FASTA ", "protein"),
+            ):
+                with SpoolReader(export["files"][seq_type]) as fasta_stream:
+                    st.download_button(label, fasta_stream, f"{seq_type}_sequences{fasta_suffix}", fasta_mime)
             st.download_button(
                 "📥 下载序列统计 CSV",
                 summary_df.to_csv(index=False).encode("utf-8-sig"),
@@ -858,9 +920,6 @@ The results generated by this platform should be interpreted together with origi
             if failed_genes:
                 st.warning(f"⚠️ 以下基因未获取到序列: {', '.join(failed_genes)}")
 
-            status_text.empty()
-            progress.empty()
-
     # -------------------- 功能 3 --------------------
     elif tool == "中国春同源基因检索（自身同源 + Fielder）":
         st.header("🧬 中国春同源基因检索（自身同源 + Fielder）")
@@ -1010,48 +1069,9 @@ The results generated by this platform should be interpreted together with origi
         st.info(f"待处理基因数：{len(gene_ids)}")
 
         if st.button("开始抓取 Fielder 启动子", key="btn_fielder_promoter"):
-            progress = st.progress(0)
-            status_text = st.empty()
-
-            fasta_records = []
-            summary_rows = []
-            failed_genes = []
-
-            for idx, input_gene_id in enumerate(gene_ids, 1):
-                status_text.text(f"正在查询: {input_gene_id} ({idx}/{len(gene_ids)})")
-
-                promoter_df = get_fielder_promoter(input_gene_id)
-
-                if promoter_df.empty:
-                    failed_genes.append(input_gene_id)
-                    summary_rows.append([input_gene_id, "", "", "", "", "", 0])
-                    progress.progress(idx / len(gene_ids))
-                    continue
-
-                row = promoter_df.iloc[0]
-
-                primary_id = row.get("primary_gene_id", "")
-                chrom = row.get("chromosome", "")
-                strand = row.get("strand", "")
-                promoter_start = row.get("promoter_start", "")
-                promoter_end = row.get("promoter_end", "")
-                promoter_length = row.get("promoter_length", "")
-                promoter_seq = row.get("promoter_sequence", "")
-
-                header = f">{input_gene_id}|{primary_id}|promoter_2000|{chrom}:{promoter_start}-{promoter_end}|{strand}"
-                fasta_records.append(f"{header}\n{promoter_seq}\n")
-
-                summary_rows.append([
-                    input_gene_id,
-                    primary_id if pd.notna(primary_id) else "",
-                    chrom if pd.notna(chrom) else "",
-                    promoter_start if pd.notna(promoter_start) else "",
-                    promoter_end if pd.notna(promoter_end) else "",
-                    strand if pd.notna(strand) else "",
-                    promoter_length if pd.notna(promoter_length) else 0
-                ])
-
-                progress.progress(idx / len(gene_ids))
+            with st.spinner("正在批量查询启动子序列，请稍候..."):
+                promoter_df = get_fielder_promoters(gene_ids)
+                fasta_records, summary_rows, failed_genes = build_promoter_outputs(gene_ids, promoter_df)
 
             summary_df = pd.DataFrame(
                 summary_rows,
@@ -1078,9 +1098,6 @@ The results generated by this platform should be interpreted together with origi
             if failed_genes:
                 st.warning(f"⚠️ 以下基因未获取到启动子序列: {', '.join(failed_genes)}")
 
-            status_text.empty()
-            progress.empty()
-
     # -------------------- 功能 5 --------------------
     elif tool == "中国春启动子抓取":
         st.header("🌱 中国春基因启动子抓取（本地数据库版）")
@@ -1105,48 +1122,9 @@ The results generated by this platform should be interpreted together with origi
         st.info(f"待处理基因数: {len(gene_ids)}")
 
         if st.button("开始抓取", key="btn_cs_promoter"):
-            progress = st.progress(0)
-            status_text = st.empty()
-
-            fasta_records = []
-            summary_rows = []
-            failed_genes = []
-
-            for idx, input_gene_id in enumerate(gene_ids, 1):
-                status_text.text(f"正在查询: {input_gene_id} ({idx}/{len(gene_ids)})")
-
-                promoter_df = get_promoter(input_gene_id)
-
-                if promoter_df.empty:
-                    failed_genes.append(input_gene_id)
-                    summary_rows.append([input_gene_id, "", "", "", "", "", 0])
-                    progress.progress(idx / len(gene_ids))
-                    continue
-
-                row = promoter_df.iloc[0]
-
-                primary_id = row.get("primary_gene_id", "")
-                chrom = row.get("chromosome", "")
-                strand = row.get("strand", "")
-                promoter_start = row.get("promoter_start", "")
-                promoter_end = row.get("promoter_end", "")
-                promoter_length = row.get("promoter_length", "")
-                promoter_seq = row.get("promoter_sequence", "")
-
-                header = f">{input_gene_id}|{primary_id}|promoter_2000|{chrom}:{promoter_start}-{promoter_end}|{strand}"
-                fasta_records.append(f"{header}\n{promoter_seq}\n")
-
-                summary_rows.append([
-                    input_gene_id,
-                    primary_id if pd.notna(primary_id) else "",
-                    chrom if pd.notna(chrom) else "",
-                    promoter_start if pd.notna(promoter_start) else "",
-                    promoter_end if pd.notna(promoter_end) else "",
-                    strand if pd.notna(strand) else "",
-                    promoter_length if pd.notna(promoter_length) else 0
-                ])
-
-                progress.progress(idx / len(gene_ids))
+            with st.spinner("正在批量查询启动子序列，请稍候..."):
+                promoter_df = get_promoters(gene_ids)
+                fasta_records, summary_rows, failed_genes = build_promoter_outputs(gene_ids, promoter_df)
 
             summary_df = pd.DataFrame(
                 summary_rows,
@@ -1173,27 +1151,55 @@ The results generated by this platform should be interpreted together with origi
             if failed_genes:
                 st.warning(f"⚠️ 以下基因未获取到启动子序列: {', '.join(failed_genes)}")
 
-            status_text.empty()
-            progress.empty()
-
     # -------------------- 功能 6 --------------------
     elif tool == "GO富集分析":
         st.header("📊 GO 富集分析")
         st.caption("输入 DEG 列表（一行一个基因号），输出 GO 富集结果表和条形图。")
 
-        uploaded_file = st.file_uploader("上传 DEG TXT 文件（一行一个基因号）", type=["txt"], key="file_go_deg")
-        render_example_tools(
-            input_key="input_go_deg",
-            example_text=get_go_example_text(),
-            load_label="🧪 加载 GO 示例 DEG",
-            download_label="📄 下载 GO 示例 DEG 文件",
-            file_name="example_go_deg_genes.txt",
-            help_text="示例 DEG 从 data/example_go_deg_genes.txt 读取；你可以直接修改该文件来更新 GO 示例。"
+        from utils.go_enrichment import (
+            GO_DAG_MODES,
+            PERMUTATION_DAG_MODES,
+            run_go_enrichment,
+            run_go_enrichment_batch,
+            create_go_barplot_bytes
+        )
+        from utils.plot_spec import go_barplot_spec
+        from utils.result_cache import cached_run, result_key
+        from utils.term_reduction import (
+            DEFAULT_SIMILARITY_CUTOFF,
+            SIMILARITY_METHODS,
+            reduce_redundant_terms
         )
-        manual_input = st.text_area("或者手动输入 DEG（每行一个）", height=200, key="input_go_deg")
 
-        gene_ids = read_gene_ids(uploaded_file, manual_input)
-        gene_ids = [g.strip() for g in gene_ids if g.strip()]
+        batch_mode = st.checkbox(
+            "批量模式：上传多个 DEG 文件，每个文件作为一个 contrast",
+            key="go_batch_mode"
+        )
+
+        gene_lists = None
+        if batch_mode:
+            uploaded_files = st.file_uploader(
+                "上传多个 DEG TXT 文件（一行一个基因号，文件名作为 contrast 名称）",
+                type=["txt"],
+                accept_multiple_files=True,
+                key="files_go_batch"
+            )
+            gene_lists = read_contrast_gene_lists(uploaded_files)
+            gene_ids = [g for genes in gene_lists.values() for g in genes]
+        else:
+            uploaded_file = st.file_uploader("上传 DEG TXT 文件（一行一个基因号）", type=["txt"], key="file_go_deg")
+            render_example_tools(
+                input_key="input_go_deg",
+                example_text=get_go_example_text(),
+                load_label="🧪 加载 GO 示例 DEG",
+                download_label="📄 下载 GO 示例 DEG 文件",
+                file_name="example_go_deg_genes.txt",
+                help_text="示例 DEG 从 data/example_go_deg_genes.txt 读取；你可以直接修改该文件来更新 GO 示例。"
+            )
+            manual_input = st.text_area("或者手动输入 DEG（每行一个）", height=200, key="input_go_deg")
+
+            gene_ids = read_gene_ids(uploaded_file, manual_input)
+            gene_ids = [g.strip() for g in gene_ids if g.strip()]
 
         if not gene_ids:
             st.info("请上传 DEG 文件或手动输入基因号")
@@ -1213,9 +1219,81 @@ The results generated by this platform should be interpreted together with origi
 
         min_size = st.number_input("最小 GO 基因集大小", min_value=1, max_value=50, value=3, step=1)
         max_size = st.number_input("最大 GO 基因集大小", min_value=10, max_value=10000, value=2000, step=10)
+        collapse_homoeologs = st.checkbox(
+            "按 A/B/D 同源组合并基因后再富集（同一事件的三个 homoeolog 只计一次）",
+            key="go_collapse_homoeologs"
+        )
 
         BASE_DIR = os.path.dirname(os.path.abspath(__file__))
         mapping_dir = os.path.join(BASE_DIR, "data", "go_mapping")
+        obo_path = os.path.join(mapping_dir, "go-basic.obo")
+
+        dag_mode = st.selectbox(
+            "GO 层级处理",
+            options=list(GO_DAG_MODES),
+            format_func=lambda x: {
+                "flat": "flat：直接使用注释文件（默认）",
+                "classic": "classic：注释沿 GO DAG 传递到祖先",
+                "elim": "elim：显著子 term 的基因不再计入祖先",
+                "parent_child": "parent-child：以父 term 基因为背景"
+            }[x],
+            key="go_dag_mode"
+        )
+        if dag_mode != "flat" and not os.path.exists(obo_path):
+            st.caption("未找到 data/go_mapping/go-basic.obo，请从 http://purl.obolibrary.org/obo/go/go-basic.obo 下载。")
+
+        # elim / parent-child 不支持置换检验：先选层级处理方式，再决定是否允许填写置换次数
+        permutations_supported = dag_mode in PERMUTATION_DAG_MODES
+        n_permutations = st.number_input(
+            "置换检验次数（0 表示不做；大于 0 时结果增加经验 p 值列 perm_pvalue / perm_p.adjust）",
+            min_value=0,
+            max_value=100000,
+            value=0,
+            step=500,
+            disabled=not permutations_supported,
+            key="go_n_permutations"
+        )
+        if not permutations_supported:
+            if n_permutations > 0:
+                st.caption(f"置换检验只支持 {' / '.join(PERMUTATION_DAG_MODES)} 模式，当前模式下不做置换检验。")
+            n_permutations = 0
+
+        reduce_terms = st.checkbox(
+            "合并冗余 GO term（按 DEG 重叠聚类，条形图每簇只画最显著的 term）",
+            key="go_reduce_terms"
+        )
+        if reduce_terms:
+            col1, col2 = st.columns(2)
+            with col1:
+                similarity_method = st.selectbox(
+                    "相似度",
+                    options=list(SIMILARITY_METHODS),
+                    format_func=lambda x: "Jaccard" if x == "jaccard" else "Kappa",
+                    key="go_similarity_method"
+                )
+            with col2:
+                similarity_cutoff = st.number_input(
+                    "相似度阈值",
+                    min_value=0.05,
+                    max_value=1.0,
+                    value=DEFAULT_SIMILARITY_CUTOFF[similarity_method],
+                    step=0.05,
+                    key="go_similarity_cutoff"
+                )
+
+        col1, col2 = st.columns(2)
+        with col1:
+            interactive_plot = st.checkbox(
+                "交互式预览（浏览器端绘图，可悬停查看基因）",
+                key="go_interactive_plot"
+            )
+        with col2:
+            image_format = st.selectbox(
+                "下载图片格式",
+                options=list(PLOT_FORMATS),
+                format_func=str.upper,
+                key="go_image_format"
+            )
 
         term2gene_path = os.path.join(mapping_dir, "TERM2GENE_protein_coding.tsv")
         term2name_path = os.path.join(mapping_dir, "TERM2NAME_protein_coding.tsv")
@@ -1231,20 +1309,58 @@ The results generated by this platform should be interpreted together with origi
                 st.code(fp)
             st.stop()
 
+        if gene_lists is not None:
+            st.info(f"contrast 数: {len(gene_lists)}，基因总数: {len(gene_ids)}")
+
+            if st.button("开始批量 GO 富集分析", key="btn_go_enrichment_batch"):
+                with st.spinner("正在进行批量 GO 富集分析，请稍候..."):
+                    try:
+                        results_df, sig_df, summary_df = run_go_enrichment_batch(
+                            gene_lists=gene_lists,
+                            term2gene_path=term2gene_path,
+                            term2name_path=term2name_path,
+                            metadata_path=metadata_path,
+                            background_path=background_path,
+                            min_size=min_size,
+                            max_size=max_size,
+                            padj_cutoff=padj_cutoff,
+                            n_permutations=int(n_permutations),
+                            collapse_homoeologs=collapse_homoeologs,
+                            dag_mode=dag_mode,
+                            obo_path=obo_path
+                        )
+                        st.success("✅ 批量 GO 富集分析完成！")
+                        render_batch_enrichment_results(results_df, sig_df, summary_df, "GO_enrichment")
+                    except Exception as e:
+                        st.error(f"批量 GO 富集分析失败：{e}")
+            st.stop()
+
         st.info(f"待分析基因数: {len(gene_ids)}")
 
-        if st.button("开始 GO 富集分析", key="btn_go_enrichment"):
+        # 富集结果按输入内容缓存：只改作图参数时直接从缓存重新绘图，不再重新计算
+        go_params = {
+            "min_size": min_size,
+            "max_size": max_size,
+            "padj_cutoff": padj_cutoff,
+            "n_permutations": int(n_permutations),
+            "collapse_homoeologs": collapse_homoeologs,
+            "dag_mode": dag_mode,
+            "obo_path": obo_path
+        }
+        go_extra_files = [obo_path] if dag_mode != "flat" else []
+        go_key = result_key("go", gene_ids, go_params, required_files + go_extra_files)
+
+        run_clicked = st.button("开始 GO 富集分析", key="btn_go_enrichment")
+        if run_clicked or st.session_state.get("go_result_key") == go_key:
             with st.spinner("正在进行 GO 富集分析，请稍候..."):
                 try:
-                    results_df, sig_df, summary_df = run_go_enrichment(
-                        gene_list=gene_ids,
-                        term2gene_path=term2gene_path,
-                        term2name_path=term2name_path,
-                        metadata_path=metadata_path,
-                        background_path=background_path,
-                        min_size=min_size,
-                        max_size=max_size,
-                        padj_cutoff=padj_cutoff
+                    st.session_state["go_result_key"], (results_df, sig_df, summary_df) = cached_run(
+                        "go",
+                        run_go_enrichment,
+                        gene_ids,
+                        required_files,
+                        go_params,
+                        extra_files=go_extra_files
                     )
 
                     if results_df.empty:
@@ -1256,6 +1372,16 @@ The results generated by this platform should be interpreted together with origi
                     st.subheader("分析摘要")
                     st.dataframe(summary_df, use_container_width=True)
 
+                    plot_df = sig_df if not sig_df.empty else results_df
+                    if reduce_terms:
+                        clustered_df, plot_df = reduce_redundant_terms(
+                            plot_df,
+                            method=similarity_method,
+                            cutoff=similarity_cutoff
+                        )
+                        if not sig_df.empty:
+                            sig_df = clustered_df
+
                     st.subheader("显著富集结果")
                     if sig_df.empty:
                         st.warning("当前 FDR 阈值下没有显著富集条目，下面展示全部结果。")
@@ -1263,23 +1389,23 @@ The results generated by this platform should be interpreted together with origi
                     else:
                         st.dataframe(sig_df, use_container_width=True)
 
-                    plot_df = sig_df if not sig_df.empty else results_df
-                    plot_bytes = create_go_barplot_bytes(
-                        df=plot_df,
-                        top_n=top_n,
-                        plot_metric=plot_metric
+                    if reduce_terms:
+                        st.caption(f"合并后剩余 {len(plot_df)} 个代表 term（cluster_id 列为所属簇）。")
+
+                    render_cached_plot(
+                        create_go_barplot_bytes,
+                        plot_df,
+                        {"top_n": top_n, "plot_metric": plot_metric},
+                        title="GO 富集条形图",
+                        caption="GO enrichment barplot",
+                        download_label="📥 下载富集图",
+                        file_stem="GO_enrichment_barplot",
+                        key="btn_go_barplot_export",
+                        spec_func=go_barplot_spec,
+                        interactive=interactive_plot,
+                        image_format=image_format
                     )
 
-                    if plot_bytes is not None:
-                        st.subheader("GO 富集条形图")
-                        st.image(plot_bytes, caption="GO enrichment barplot", use_container_width=True)
-                        st.download_button(
-                            "📥 下载富集图 PNG",
-                            data=plot_bytes,
-                            file_name="GO_enrichment_barplot.png",
-                            mime="image/png"
-                        )
-
                     st.download_button(
                         "📥 下载全部结果 TSV",
                         data=results_df.to_csv(sep="\t", index=False).encode("utf-8-sig"),
@@ -1309,34 +1435,62 @@ The results generated by this platform should be interpreted together with origi
         st.header("📊 KEGG 富集分析")
         st.caption("输入 DEG 列表（一行一个基因号），基于本地 gene-KO 和 KEGG KO-pathway 映射进行 KEGG 富集分析。")
 
-        uploaded_file = st.file_uploader(
-            "上传 DEG TXT 文件（一行一个基因号）",
-            type=["txt"],
-            key="file_kegg_deg"
-        )
-        render_example_tools(
-            input_key="input_kegg_deg",
-            example_text=get_kegg_example_text(),
-            load_label="🧪 加载 KEGG 示例 DEG",
-            download_label="📄 下载 KEGG 示例 DEG 文件",
-            file_name="example_kegg_deg_genes.txt",
-            help_text="示例 DEG 从 data/example_kegg_deg_genes.txt 读取；你可以直接修改该文件来更新 KEGG 示例。"
+        from utils.kegg_enrichment import (
+            run_kegg_enrichment,
+            run_kegg_enrichment_batch,
+            create_kegg_bubbleplot_bytes,
+            create_kegg_barplot_bytes
         )
+        from utils.plot_spec import kegg_barplot_spec, kegg_bubbleplot_spec
+        from utils.result_cache import cached_run, result_key
 
-        manual_input = st.text_area(
-            "或者手动输入 DEG（每行一个）",
-            height=200,
-            key="input_kegg_deg"
+        batch_mode = st.checkbox(
+            "批量模式：上传多个 DEG 文件，每个文件作为一个 contrast",
+            key="kegg_batch_mode"
         )
 
-        gene_ids = read_gene_ids(uploaded_file, manual_input)
-        gene_ids = [g.strip() for g in gene_ids if g.strip()]
+        gene_lists = None
+        if batch_mode:
+            uploaded_files = st.file_uploader(
+                "上传多个 DEG TXT 文件（一行一个基因号，文件名作为 contrast 名称）",
+                type=["txt"],
+                accept_multiple_files=True,
+                key="files_kegg_batch"
+            )
+            gene_lists = read_contrast_gene_lists(uploaded_files)
+            gene_ids = [g for genes in gene_lists.values() for g in genes]
+        else:
+            uploaded_file = st.file_uploader(
+                "上传 DEG TXT 文件（一行一个基因号）",
+                type=["txt"],
+                key="file_kegg_deg"
+            )
+            render_example_tools(
+                input_key="input_kegg_deg",
+                example_text=get_kegg_example_text(),
+                load_label="🧪 加载 KEGG 示例 DEG",
+                download_label="📄 下载 KEGG 示例 DEG 文件",
+                file_name="example_kegg_deg_genes.txt",
+                help_text="示例 DEG 从 data/example_kegg_deg_genes.txt 读取；你可以直接修改该文件来更新 KEGG 示例。"
+            )
+
+            manual_input = st.text_area(
+                "或者手动输入 DEG（每行一个）",
+                height=200,
+                key="input_kegg_deg"
+            )
+
+            gene_ids = read_gene_ids(uploaded_file, manual_input)
+            gene_ids = [g.strip() for g in gene_ids if g.strip()]
 
         if not gene_ids:
             st.info("请上传 DEG 文件或手动输入基因号")
             st.stop()
 
-        st.info(f"待分析基因数: {len(gene_ids)}")
+        if gene_lists is not None:
+            st.info(f"contrast 数: {len(gene_lists)}，基因总数: {len(gene_ids)}")
+        else:
+            st.info(f"待分析基因数: {len(gene_ids)}")
 
         col1, col2, col3 = st.columns(3)
 
@@ -1386,6 +1540,19 @@ The results generated by this platform should be interpreted together with origi
                 step=10
             )
 
+        n_permutations = st.number_input(
+            "置换检验次数（0 表示不做；大于 0 时结果增加经验 p 值列 perm_pvalue / perm_p.adjust）",
+            min_value=0,
+            max_value=100000,
+            value=0,
+            step=500,
+            key="kegg_n_permutations"
+        )
+        collapse_homoeologs = st.checkbox(
+            "按 A/B/D 同源组合并基因后再富集（同一事件的三个 homoeolog 只计一次）",
+            key="kegg_collapse_homoeologs"
+        )
+
         with st.expander("高级绘图参数"):
             col6, col7, col8 = st.columns(3)
 
@@ -1435,6 +1602,22 @@ The results generated by this platform should be interpreted together with origi
                     step=10
                 )
 
+            col11, col12 = st.columns(2)
+
+            with col11:
+                interactive_plot = st.checkbox(
+                    "交互式预览（浏览器端绘图，可悬停查看通路信息）",
+                    key="kegg_interactive_plot"
+                )
+
+            with col12:
+                image_format = st.selectbox(
+                    "下载图片格式",
+                    options=list(PLOT_FORMATS),
+                    format_func=str.upper,
+                    key="kegg_image_format"
+                )
+
         BASE_DIR = os.path.dirname(os.path.abspath(__file__))
         mapping_dir = os.path.join(BASE_DIR, "data", "kegg_mapping")
 
@@ -1461,17 +1644,47 @@ The results generated by this platform should be interpreted together with origi
             st.code(ko2pathway_path)
             st.code(pathway2name_path)
 
-        if st.button("开始 KEGG 富集分析", key="btn_kegg_enrichment"):
+        if gene_lists is not None:
+            if st.button("开始批量 KEGG 富集分析", key="btn_kegg_enrichment_batch"):
+                with st.spinner("正在进行批量 KEGG 富集分析，请稍候..."):
+                    try:
+                        results_df, sig_df, summary_df = run_kegg_enrichment_batch(
+                            gene_lists=gene_lists,
+                            gene2ko_path=gene2ko_path,
+                            ko2pathway_path=ko2pathway_path,
+                            pathway2name_path=pathway2name_path,
+                            min_size=min_size,
+                            max_size=max_size,
+                            pvalue_cutoff=pvalue_cutoff,
+                            n_permutations=int(n_permutations),
+                            collapse_homoeologs=collapse_homoeologs
+                        )
+                        st.success("✅ 批量 KEGG 富集分析完成！")
+                        render_batch_enrichment_results(results_df, sig_df, summary_df, "KEGG_enrichment")
+                    except Exception as e:
+                        st.error(f"批量 KEGG 富集分析失败：{e}")
+            st.stop()
+
+        # 富集结果按输入内容缓存：只改作图参数时直接从缓存重新绘图，不再重新计算
+        kegg_params = {
+            "min_size": min_size,
+            "max_size": max_size,
+            "pvalue_cutoff": pvalue_cutoff,
+            "n_permutations": int(n_permutations),
+            "collapse_homoeologs": collapse_homoeologs
+        }
+        kegg_key = result_key("kegg", gene_ids, kegg_params, required_files)
+
+        run_clicked = st.button("开始 KEGG 富集分析", key="btn_kegg_enrichment")
+        if run_clicked or st.session_state.get("kegg_result_key") == kegg_key:
             with st.spinner("正在进行 KEGG 富集分析，请稍候..."):
                 try:
-                    results_df, sig_df, summary_df = run_kegg_enrichment(
-                        gene_list=gene_ids,
-                        gene2ko_path=gene2ko_path,
-                        ko2pathway_path=ko2pathway_path,
-                        pathway2name_path=pathway2name_path,
-                        min_size=min_size,
-                        max_size=max_size,
-                        pvalue_cutoff=pvalue_cutoff
+                    st.session_state["kegg_result_key"], (results_df, sig_df, summary_df) = cached_run(
+                        "kegg",
+                        run_kegg_enrichment,
+                        gene_ids,
+                        required_files,
+                        kegg_params
                     )
 
                     if results_df.empty:
@@ -1497,60 +1710,48 @@ The results generated by this platform should be interpreted together with origi
                     else:
                         plot_df = results_df
 
-                    bubble_bytes = create_kegg_bubbleplot_bytes(
-                        df=plot_df,
-                        top_n=top_n,
-                        bubble_min_size=bubble_min_size,
-                        bubble_max_size=bubble_max_size,
-                        clip_minus_log10_p=clip_minus_log10_p,
-                        clip_mode="quantile",
-                        clip_quantile=clip_quantile,
-                        clip_fixed_value=30,
-                        min_x_cap=5,
-                        label_wrap_width=label_wrap_width
+                    clip_params = {
+                        "top_n": top_n,
+                        "clip_minus_log10_p": clip_minus_log10_p,
+                        "clip_mode": "quantile",
+                        "clip_quantile": clip_quantile,
+                        "clip_fixed_value": 30,
+                        "min_x_cap": 5,
+                        "label_wrap_width": label_wrap_width
+                    }
+
+                    render_cached_plot(
+                        create_kegg_bubbleplot_bytes,
+                        plot_df,
+                        {
+                            **clip_params,
+                            "bubble_min_size": bubble_min_size,
+                            "bubble_max_size": bubble_max_size
+                        },
+                        title="KEGG 富集气泡图",
+                        caption="KEGG enrichment bubble plot",
+                        download_label="📥 下载 KEGG 气泡图",
+                        file_stem="KEGG_enrichment_bubbleplot",
+                        key="btn_kegg_bubble_export",
+                        spec_func=kegg_bubbleplot_spec,
+                        interactive=interactive_plot,
+                        image_format=image_format
                     )
 
-                    barplot_bytes = create_kegg_barplot_bytes(
-                        df=plot_df,
-                        top_n=top_n,
-                        clip_minus_log10_p=clip_minus_log10_p,
-                        clip_mode="quantile",
-                        clip_quantile=clip_quantile,
-                        clip_fixed_value=30,
-                        min_x_cap=5,
-                        label_wrap_width=label_wrap_width
+                    render_cached_plot(
+                        create_kegg_barplot_bytes,
+                        plot_df,
+                        clip_params,
+                        title="KEGG 富集条形图",
+                        caption="KEGG enrichment barplot",
+                        download_label="📥 下载 KEGG 条形图",
+                        file_stem="KEGG_enrichment_barplot",
+                        key="btn_kegg_barplot_export",
+                        spec_func=kegg_barplot_spec,
+                        interactive=interactive_plot,
+                        image_format=image_format
                     )
 
-                    if bubble_bytes is not None:
-                        st.subheader("KEGG 富集气泡图")
-                        st.image(
-                            bubble_bytes,
-                            caption="KEGG enrichment bubble plot",
-                            use_container_width=True
-                        )
-
-                        st.download_button(
-                            "📥 下载 KEGG 气泡图 PNG",
-                            data=bubble_bytes,
-                            file_name="KEGG_enrichment_bubbleplot.png",
-                            mime="image/png"
-                        )
-
-                    if barplot_bytes is not None:
-                        st.subheader("KEGG 富集条形图")
-                        st.image(
-                            barplot_bytes,
-                            caption="KEGG enrichment barplot",
-                            use_container_width=True
-                        )
-
-                        st.download_button(
-                            "📥 下载 KEGG 条形图 PNG",
-                            data=barplot_bytes,
-                            file_name="KEGG_enrichment_barplot.png",
-                            mime="image/png"
-                        )
-
                     st.download_button(
                         "📥 下载全部 KEGG 富集结果 TSV",
                         data=results_df.to_csv(sep="\t", index=False).encode("utf-8-sig"),
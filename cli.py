@@ -0,0 +1,405 @@
+# -*- coding: utf-8 -*-
+
+"""
+WheatGeneToolkit 命令行版（不需要浏览器 / Streamlit）
+
+用法：
+
+python cli.py annotate genes.txt -o annotation.tsv
+python cli.py sequences genes.txt --types cds,protein -o seqs.fasta.gz
+python cli.py promoters genes.txt --source cs -o promoters.fasta --summary promoters.tsv
+python cli.py homologs genes.txt --target fielder --best-only
+python cli.py go deg.txt -o go.tsv --summary go_summary.tsv
+python cli.py kegg deg_a.txt deg_b.txt -o kegg.tsv          # 多个文件按 contrast 批量富集
+cat genes.txt | python cli.py annotate - > annotation.tsv
+
+- 输入：一个或多个基因列表文件（一行一个基因号，支持 .gz），不给文件或给 "-" 时读取 stdin；
+- 输出：TSV / FASTA 写到 -o 指定的文件（以 .gz 结尾时 gzip 压缩），不指定时写到 stdout；
+- 数据库查询类命令按 --chunk-size 个输入基因为一批，查询一批写出一批，
+  内存占用与输入总数无关，10 万级别的基因列表也不会一次性载入结果。
+"""
+
+import argparse
+import gzip
+import io
+import sys
+from itertools import islice
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, TextIO
+
+import pandas as pd
+
+
+PROJECT_ROOT = Path(__file__).resolve().parent
+GO_MAPPING_DIR = PROJECT_ROOT / "data" / "go_mapping"
+KEGG_MAPPING_DIR = PROJECT_ROOT / "data" / "kegg_mapping"
+
+# 每批处理的输入基因数
+DEFAULT_CHUNK_SIZE = 5000
+
+
+# ==============================
+# 输入 / 输出
+# ==============================
+
+def _open_text(path: str, mode: str) -> TextIO:
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8", newline="")
+
+
+def iter_gene_ids(paths: Optional[List[str]]) -> Iterator[str]:
+    """
+    逐行读取基因号，跳过空行和 # 开头的注释行。
+    """
+    for path in paths or ["-"]:
+        handle = sys.stdin if path == "-" else _open_text(path, "r")
+        try:
+            for line in handle:
+                gene = line.strip()
+                if gene and not gene.startswith("#"):
+                    yield gene
+        finally:
+            if handle is not sys.stdin:
+                handle.close()
+
+
+def iter_chunks(items: Iterable[str], size: int) -> Iterator[List[str]]:
+    it = iter(items)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def open_output(path: Optional[str]) -> TextIO:
+    """
+    None / "-" 为 stdout；.gz 结尾时 gzip 压缩。
+    """
+    if path is None or path == "-":
+        return sys.stdout
+    return _open_text(path, "w")
+
+
+class TsvWriter:
+    """
+    分批写 TSV：只在第一个有列的批次写表头，之后的批次按该批的列顺序追加。
+    没有列的批次（查询函数在无结果时返回的 pd.DataFrame()）直接跳过，
+    不能用它确定表头，否则之后所有批次都会被 reindex 成空行。
+    """
+
+    def __init__(self, handle: TextIO):
+        self.handle = handle
+        self.columns: Optional[List[str]] = None
+
+    def write(self, df: pd.DataFrame) -> None:
+        if len(df.columns) == 0 or (df.empty and self.columns is not None):
+            return
+
+        if self.columns is None:
+            self.columns = list(df.columns)
+            df.to_csv(self.handle, sep="\t", index=False)
+        else:
+            df.reindex(columns=self.columns).to_csv(self.handle, sep="\t", index=False, header=False)
+
+
+def _write_frame(df: pd.DataFrame, path: Optional[str]) -> None:
+    out = open_output(path)
+    try:
+        df.to_csv(out, sep="\t", index=False)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+def _warn(message: str) -> None:
+    print(message, file=sys.stderr)
+
+
+# ==============================
+# 数据库查询类命令
+# ==============================
+
+def cmd_annotate(args) -> int:
+    from utils.db_query import get_gene_annotation_table
+
+    out = open_output(args.output)
+    writer = TsvWriter(out)
+    n_missing = 0
+    try:
+        for chunk in iter_chunks(iter_gene_ids(args.inputs), args.chunk_size):
+            table = get_gene_annotation_table(chunk)
+            n_missing += int(table["primary_gene_id"].isna().sum())
+            writer.write(table)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    if n_missing:
+        _warn(f"{n_missing} 个输入基因没有找到统一主键（primary_gene_id 为空）")
+    return 0
+
+
+def cmd_sequences(args) -> int:
+    from utils.fasta_export import SEQUENCE_TYPES, format_fasta_record, iter_sequence_records
+
+    sequence_types = tuple(t.strip() for t in args.types.split(",") if t.strip())
+    unknown = [t for t in sequence_types if t not in SEQUENCE_TYPES]
+    if unknown:
+        raise SystemExit(f"未知的序列类型: {', '.join(unknown)}（可选 {', '.join(SEQUENCE_TYPES)}）")
+
+    out = open_output(args.output)
+    n_records = 0
+    try:
+        for chunk in iter_chunks(iter_gene_ids(args.inputs), args.chunk_size):
+            for record in iter_sequence_records(list(dict.fromkeys(chunk)), sequence_types):
+                out.write(format_fasta_record(*record))
+                n_records += 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    _warn(f"共写出 {n_records} 条序列")
+    return 0
+
+
+def cmd_promoters(args) -> int:
+    from utils.db_query import get_fielder_promoters, get_promoters
+    from utils.fasta_export import build_promoter_outputs
+
+    fetch = get_promoters if args.source == "cs" else get_fielder_promoters
+    key_column = "统一主键" if args.source == "cs" else "Fielder主键"
+    summary_columns = ["输入基因号", key_column, "染色体", "启动子起点", "启动子终点", "链方向", "启动子长度"]
+
+    out = open_output(args.output)
+    summary_out = open_output(args.summary) if args.summary else None
+    summary_writer = TsvWriter(summary_out) if summary_out else None
+    n_failed = 0
+    try:
+        for chunk in iter_chunks(iter_gene_ids(args.inputs), args.chunk_size):
+            records, summary_rows, failed = build_promoter_outputs(chunk, fetch(chunk))
+            out.writelines(records)
+            n_failed += len(failed)
+            if summary_writer:
+                summary_writer.write(pd.DataFrame(summary_rows, columns=summary_columns))
+    finally:
+        for handle in (out, summary_out):
+            if handle is not None and handle is not sys.stdout:
+                handle.close()
+
+    if n_failed:
+        _warn(f"{n_failed} 个输入基因没有获取到启动子序列")
+    return 0
+
+
+def cmd_homologs(args) -> int:
+    from utils.db_query import get_cs_self_hits, get_fielder_hits
+
+    fetch = get_cs_self_hits if args.target == "self" else get_fielder_hits
+
+    out = open_output(args.output)
+    writer = TsvWriter(out)
+    try:
+        for chunk in iter_chunks(iter_gene_ids(args.inputs), args.chunk_size):
+            writer.write(fetch(list(dict.fromkeys(chunk)), best_only=args.best_only))
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return 0
+
+
+# ==============================
+# 富集分析
+# ==============================
+
+def _read_gene_lists(paths: Optional[List[str]]) -> dict:
+    """
+    每个输入文件一个 contrast（名称为去掉扩展名的文件名，.txt.gz 去掉两层）；
+    stdin 的名称为 "stdin"。两个输入得到同一个名称时报错，不静默覆盖。
+    """
+    sources = {}
+    for path in paths or ["-"]:
+        if path == "-":
+            name = "stdin"
+        else:
+            p = Path(path)
+            name = Path(p.stem).stem if p.suffix == ".gz" else p.stem
+
+        if name in sources:
+            raise ValueError(
+                f"输入文件 {sources[name]} 和 {path} 的 contrast 名称都是 {name!r}，请重命名其中一个。"
+            )
+        sources[name] = path
+
+    return {name: list(iter_gene_ids([path])) for name, path in sources.items()}
+
+
+def _write_enrichment(args, results_df: pd.DataFrame, sig_df: pd.DataFrame, summary_df: pd.DataFrame) -> None:
+    _write_frame(sig_df if args.sig_only else results_df, args.output)
+    if args.summary:
+        _write_frame(summary_df, args.summary)
+
+
+def cmd_go(args) -> int:
+    from utils.go_enrichment import PERMUTATION_DAG_MODES, run_go_enrichment, run_go_enrichment_batch
+
+    if args.permutations > 0 and args.dag_mode not in PERMUTATION_DAG_MODES:
+        raise SystemExit(
+            f"--permutations 只支持 --dag-mode {' / '.join(PERMUTATION_DAG_MODES)}，"
+            f"当前为 {args.dag_mode}"
+        )
+
+    mapping_dir = Path(args.mapping_dir)
+    paths = {
+        "term2gene_path": str(mapping_dir / "TERM2GENE_protein_coding.tsv"),
+        "term2name_path": str(mapping_dir / "TERM2NAME_protein_coding.tsv"),
+        "metadata_path": str(mapping_dir / "wheat_go_metadata.tsv"),
+        "background_path": str(mapping_dir / "wheat_protein_coding_genes.tsv"),
+    }
+    params = {
+        "min_size": args.min_size,
+        "max_size": args.max_size,
+        "padj_cutoff": args.padj_cutoff,
+        "n_permutations": args.permutations,
+        "permutation_seed": args.seed,
+        "collapse_homoeologs": args.collapse_homoeologs,
+        "dag_mode": args.dag_mode,
+        "obo_path": args.obo,
+    }
+
+    gene_lists = _read_gene_lists(args.inputs)
+    if len(gene_lists) == 1:
+        frames = run_go_enrichment(next(iter(gene_lists.values())), **paths, **params)
+    else:
+        frames = run_go_enrichment_batch(gene_lists, **paths, **params, n_jobs=args.jobs)
+
+    _write_enrichment(args, *frames)
+    return 0
+
+
+def cmd_kegg(args) -> int:
+    from utils.kegg_enrichment import run_kegg_enrichment, run_kegg_enrichment_batch
+
+    mapping_dir = Path(args.mapping_dir)
+    paths = {
+        "gene2ko_path": str(mapping_dir / "gene2ko_clean.tsv"),
+        "ko2pathway_path": str(mapping_dir / "kegg_ko2pathway.tsv"),
+        "pathway2name_path": str(mapping_dir / "kegg_pathway2name.tsv"),
+    }
+    params = {
+        "min_size": args.min_size,
+        "max_size": args.max_size,
+        "pvalue_cutoff": args.pvalue_cutoff,
+        "n_permutations": args.permutations,
+        "permutation_seed": args.seed,
+        "collapse_homoeologs": args.collapse_homoeologs,
+    }
+
+    gene_lists = _read_gene_lists(args.inputs)
+    if len(gene_lists) == 1:
+        frames = run_kegg_enrichment(next(iter(gene_lists.values())), **paths, **params)
+    else:
+        frames = run_kegg_enrichment_batch(gene_lists, **paths, **params, n_jobs=args.jobs)
+
+    _write_enrichment(args, *frames)
+    return 0
+
+
+# ==============================
+# 参数解析
+# ==============================
+
+def _add_io_arguments(parser: argparse.ArgumentParser, chunked: bool = True) -> None:
+    parser.add_argument("inputs", nargs="*", help="基因列表文件（一行一个，支持 .gz）；不给或给 - 时读取 stdin")
+    parser.add_argument("-o", "--output", help="输出文件（.gz 结尾时压缩），默认 stdout")
+    if chunked:
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help=f"每批查询的输入基因数（默认 {DEFAULT_CHUNK_SIZE}）",
+        )
+
+
+def _add_enrichment_arguments(parser: argparse.ArgumentParser, max_size: int) -> None:
+    _add_io_arguments(parser, chunked=False)
+    parser.add_argument("--summary", help="分析摘要 TSV 输出文件")
+    parser.add_argument("--sig-only", action="store_true", help="只输出显著结果")
+    parser.add_argument("--min-size", type=int, default=3)
+    parser.add_argument("--max-size", type=int, default=max_size)
+    parser.add_argument("--permutations", type=int, default=0, help="置换检验次数（默认 0，不做）")
+    parser.add_argument("--seed", type=int, default=0, help="置换检验随机数种子")
+    parser.add_argument("--collapse-homoeologs", action="store_true", help="按 A/B/D 同源组合并基因后再富集")
+    parser.add_argument("--jobs", type=int, default=1, help="多个输入文件时的并行进程数")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="wheat-toolkit",
+        description="WheatGeneToolkit 命令行版：基因注释、序列、启动子、同源基因和 GO / KEGG 富集",
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("annotate", help="基因功能注释及基因号转换（TSV）")
+    _add_io_arguments(p)
+    p.set_defaults(func=cmd_annotate)
+
+    p = sub.add_parser("sequences", help="cDNA / CDS / protein 序列（FASTA）")
+    _add_io_arguments(p)
+    p.add_argument("--types", default="cdna,cds,protein", help="逗号分隔的序列类型（默认 cdna,cds,protein）")
+    p.set_defaults(func=cmd_sequences)
+
+    p = sub.add_parser("promoters", help="启动子序列（FASTA）")
+    _add_io_arguments(p)
+    p.add_argument("--source", choices=["cs", "fielder"], default="cs", help="中国春或 Fielder 基因（默认 cs）")
+    p.add_argument("--summary", help="启动子统计 TSV 输出文件")
+    p.set_defaults(func=cmd_promoters)
+
+    p = sub.add_parser("homologs", help="中国春自身同源 / Fielder 同源基因（TSV）")
+    _add_io_arguments(p)
+    p.add_argument("--target", choices=["self", "fielder"], default="self", help="自身同源或 Fielder 同源（默认 self）")
+    p.add_argument("--best-only", action="store_true", help="每个输入只输出最可信的一条")
+    p.set_defaults(func=cmd_homologs)
+
+    p = sub.add_parser("go", help="GO 富集分析（TSV）")
+    _add_enrichment_arguments(p, max_size=2000)
+    p.add_argument("--padj-cutoff", type=float, default=0.05)
+    p.add_argument(
+        "--dag-mode",
+        choices=["flat", "classic", "elim", "parent_child"],
+        default="flat",
+        help="GO 层级处理方式（默认 flat）；--permutations 只能与 flat / classic 同用",
+    )
+    p.add_argument("--obo", help="GO OBO 文件（默认 data/go_mapping/go-basic.obo）")
+    p.add_argument("--mapping-dir", default=str(GO_MAPPING_DIR))
+    p.set_defaults(func=cmd_go)
+
+    p = sub.add_parser("kegg", help="KEGG 富集分析（TSV）")
+    _add_enrichment_arguments(p, max_size=500)
+    p.add_argument("--pvalue-cutoff", type=float, default=0.05)
+    p.add_argument("--mapping-dir", default=str(KEGG_MAPPING_DIR))
+    p.set_defaults(func=cmd_kegg)
+
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+
+    if isinstance(sys.stdout, io.TextIOWrapper):
+        # Windows 控制台默认编码不是 UTF-8，中文列名会报错
+        sys.stdout.reconfigure(encoding="utf-8")
+
+    try:
+        return args.func(args)
+    except BrokenPipeError:
+        # 输出被 head 等命令提前关闭
+        return 0
+    except (FileNotFoundError, ValueError) as e:
+        _warn(f"错误：{e}")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+
+"""
+启动耗时基准测试。
+
+Streamlit Cloud 冷启动时，第一个用户要等 app.py 导入完、首页渲染完才能看到页面。
+这个脚本在全新的子进程中（不受已导入模块影响）重复测量：
+
+1. import：     import app 的耗时（只导入，不渲染）；
+2. first_render：用 streamlit.testing 的 AppTest 运行一次 app.py（首页 ReadMe）的耗时；
+3. 每一步结束后 matplotlib / scipy / statsmodels 是否已经被导入；
+4. --pages 时，再在同一个会话中依次切换到 GO / KEGG 页面，测量首次打开各页面的耗时。
+
+也可以用 --module 只测某个模块的导入耗时，例如在没有安装 streamlit 的环境中：
+python scripts/bench_startup.py --module utils.go_enrichment
+
+运行方式：
+cd C:\\Users\\86156\\Desktop\\Program\\wheatonline
+python scripts\\bench_startup.py --repeat 5 --pages
+"""
+
+import argparse
+import importlib.util
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+HEAVY_MODULES = ("matplotlib.pyplot", "scipy.stats", "scipy.sparse", "statsmodels")
+
+ENRICHMENT_PAGES = ("GO富集分析", "KEGG富集分析")
+
+# 在子进程中执行的测量代码，结果以一行 JSON 输出
+_IMPORT_SNIPPET = """
+import json, sys, time
+sys.path.insert(0, {root!r})
+t0 = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - t0
+print(json.dumps({{
+    "import": elapsed,
+    "heavy": [m for m in {heavy!r} if m in sys.modules],
+}}))
+"""
+
+_RENDER_SNIPPET = """
+import json, sys, time
+sys.path.insert(0, {root!r})
+from streamlit.testing.v1 import AppTest
+
+result = {{}}
+t0 = time.perf_counter()
+at = AppTest.from_file({app!r}, default_timeout=600)
+at.run()
+result["first_render"] = time.perf_counter() - t0
+result["heavy_after_first_render"] = [m for m in {heavy!r} if m in sys.modules]
+if at.exception:
+    result["error"] = str(at.exception[0].message)
+
+for page in {pages!r}:
+    t0 = time.perf_counter()
+    at.sidebar.radio[0].set_value(page).run()
+    result[page] = time.perf_counter() - t0
+
+print(json.dumps(result, ensure_ascii=False))
+"""
+
+
+def run_snippet(code: str) -> dict:
+    proc = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=PROJECT_ROOT,
+        capture_output=True,
+        text=True,
+        encoding="utf-8",
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "子进程失败")
+
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def summarize(name: str, values: list) -> None:
+    if not values:
+        return
+    print(
+        f"{name:<20s} 中位数 {statistics.median(values):7.3f}s  "
+        f"最小 {min(values):7.3f}s  最大 {max(values):7.3f}s  (n={len(values)})"
+    )
+
+
+def bench_import(module: str, repeat: int) -> None:
+    code = _IMPORT_SNIPPET.format(root=str(PROJECT_ROOT), module=module, heavy=HEAVY_MODULES)
+
+    times = []
+    heavy = []
+    for _ in range(repeat):
+        result = run_snippet(code)
+        times.append(result["import"])
+        heavy = result["heavy"]
+
+    summarize(f"import {module}", times)
+    print(f"{'':<20s} 已导入的重量级模块: {', '.join(heavy) or '无'}")
+
+
+def bench_render(repeat: int, pages: bool) -> None:
+    if importlib.util.find_spec("streamlit") is None:
+        print("未安装 streamlit，跳过 first_render 测量")
+        return
+
+    code = _RENDER_SNIPPET.format(
+        root=str(PROJECT_ROOT),
+        app=str(PROJECT_ROOT / "app.py"),
+        heavy=HEAVY_MODULES,
+        pages=ENRICHMENT_PAGES if pages else (),
+    )
+
+    results = [run_snippet(code) for _ in range(repeat)]
+    if results[-1].get("error"):
+        print(f"app.py 运行出错: {results[-1]['error']}")
+
+    summarize("first_render", [r["first_render"] for r in results])
+    print(f"{'':<20s} 首页渲染后已导入: {', '.join(results[-1]['heavy_after_first_render']) or '无'}")
+
+    if pages:
+        for page in ENRICHMENT_PAGES:
+            summarize(f"open {page}", [r[page] for r in results])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="测量 app.py 的导入和首次渲染耗时")
+    parser.add_argument("--repeat", type=int, default=5, help="每项测量重复次数（默认 5）")
+    parser.add_argument("--module", default="app", help="要测量导入耗时的模块（默认 app）")
+    parser.add_argument("--pages", action="store_true", help="同时测量首次打开 GO / KEGG 页面的耗时")
+    parser.add_argument("--no-render", action="store_true", help="只测导入耗时")
+    args = parser.parse_args()
+
+    print(f"Python {sys.version.split()[0]}  项目目录 {PROJECT_ROOT}")
+
+    try:
+        bench_import(args.module, args.repeat)
+    except RuntimeError as e:
+        print(f"import {args.module} 失败: {e}")
+
+    if args.module == "app" and not args.no_render:
+        bench_render(args.repeat, args.pages)
+
+
+if __name__ == "__main__":
+    main()
@@ -29,12 +29,17 @@ python scripts\\split_sqlite_db.py
 """
 
 import json
-import re
 import shutil
 import sqlite3
+import sys
 import time
 from pathlib import Path
 
+# 脚本以 python scripts/xxx.py 运行，需要把项目根目录加入 sys.path 才能导入 utils
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.gene_id import parse_gene_id
+
 
 PROJECT_ROOT = Path.cwd()
 SOURCE_DB = PROJECT_ROOT / "wheat_toolkit.db"
@@ -203,27 +208,14 @@ def detect_gene_column(columns):
 
 def parse_chr_from_gene_id(gene_id):
     """
-    从小麦基因 ID 中解析染色体。
+    从小麦基因 ID 中解析染色体（与 utils/db_query.py 的查询路由共用同一个解析）。
 
     支持：
     TraesCS1A02G000100
     TraesCS5B02G233300.1
     TraesFLD5B01G105200
     """
-    if gene_id is None:
-        return "unknown"
-
-    s = str(gene_id)
-
-    m = re.search(r"TraesCS([1-7][ABD])", s)
-    if m:
-        return m.group(1)
-
-    m = re.search(r"TraesFLD([1-7][ABD])", s)
-    if m:
-        return m.group(1)
-
-    return "unknown"
+    return parse_gene_id(gene_id).chr
 
 
 def copy_whole_table(src_conn, table: str, out_path: Path):
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+
+"""
+测试共用的 fixture。
+
+tiny_db：在临时目录中建一个只含少量记录的 SQLite 分库和 manifest，
+并把 utils.db_query 的路由表指向它（仓库不附带真实数据库）。
+"""
+
+import json
+import sqlite3
+
+import pytest
+
+
+TINY_TABLES = {
+    "gene_alias": (
+        ["alias_value", "primary_gene_id", "alias_type"],
+        [("OLD_1A1", "TraesCS1A02G000100", "old")],
+    ),
+    "gene_core": (
+        ["primary_gene_id", "gene_id_v3", "chromosome"],
+        [
+            ("TraesCS1A02G000100", "TraesCS1A03G0000100", "1A"),
+            ("TraesCS1B02G000200", "TraesCS1B03G0000200", "1B"),
+            ("TraesCS1D02G000300", "TraesCS1D03G0000300", "1D"),
+        ],
+    ),
+    "cs_self_homolog_map": (
+        [
+            "cs_gene_id", "self_homolog_gene_id", "homolog_type", "same_subgenome",
+            "priority_score", "is_best_hit", "rank_within_cs",
+        ],
+        [
+            ("TraesCS1B02G000200", "TraesCS1D02G000300", "homoeolog", "0", "0.9", "1", "1"),
+            ("TraesCS1B02G000200", "TraesCS1A02G000100", "homoeolog", "0", "0.8", "0", "2"),
+        ],
+    ),
+}
+
+
+@pytest.fixture
+def tiny_db(tmp_path, monkeypatch):
+    from utils import db_query
+    from utils.shard_router import ShardRouter
+
+    db_path = tmp_path / "tiny.sqlite"
+    with sqlite3.connect(db_path) as conn:
+        for table, (columns, rows) in TINY_TABLES.items():
+            conn.execute(f"CREATE TABLE {table} ({', '.join(c + ' TEXT' for c in columns)})")
+            conn.executemany(
+                f"INSERT INTO {table} VALUES ({', '.join('?' * len(columns))})", rows
+            )
+
+    manifest = {
+        "tables": {
+            table: {"strategy": "whole_table", "path": db_path.name}
+            for table in TINY_TABLES
+        }
+    }
+    (tmp_path / "manifest.json").write_text(json.dumps(manifest), encoding="utf-8")
+
+    monkeypatch.setattr(db_query, "_ROUTER", ShardRouter(manifest, tmp_path))
+    return db_path
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+
+"""
+utils/alias_index.py：内存索引与 SQLite LIKE '%kw%' 的结果一致。
+"""
+
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from utils import alias_index, db_query
+from utils.alias_index import AliasIndex
+
+
+ALIASES = [
+    "TraesCS1A02G000100", "traescs1a02g000100.1", "TraesCS1B02G000200",
+    "TraesCS1D02G000300", "TraesCS2A02G123400", "TRAESCS2A02G123400",
+    "Ta_ABC1", "TaABC1", "TaABC12", "abc", "xabcx", "ABC_1", "a%b", "a_b",
+    "GENE-7", "gene_7", "gene7", "7gene", "Cs1a", "", "x",
+]
+
+KEYWORDS = [
+    "a", "A", "ab", "abc", "ABC", "traescs", "1a02", "g000", "02G123",
+    "_", "%", "a_b", "a%b", "ta_abc", "g%7", "gene_", "_1", "%abc%",
+    "c1", "cs1", "e-7", "zzz", "q",
+]
+
+
+@pytest.fixture(scope="module")
+def table():
+    rows = [(alias, f"GENE{i:03d}") for i, alias in enumerate(ALIASES)]
+    # 同一个 alias 对应多个基因
+    rows.append(("TaABC1", "GENE999"))
+    return pd.DataFrame(rows, columns=["alias_value", "primary_gene_id"])
+
+
+@pytest.fixture(scope="module")
+def conn(table):
+    conn = sqlite3.connect(":memory:")
+    table.to_sql("gene_alias", conn, index=False)
+    yield conn
+    conn.close()
+
+
+def like_rows(conn, keyword):
+    return set(conn.execute(
+        "SELECT alias_value, primary_gene_id FROM gene_alias WHERE alias_value LIKE ?",
+        (f"%{keyword}%",),
+    ).fetchall())
+
+
+@pytest.mark.parametrize("keyword", KEYWORDS)
+def test_matches_sqlite_like(table, conn, keyword):
+    result = AliasIndex(table).search(keyword, limit=len(table))
+
+    assert set(map(tuple, result.to_numpy().tolist())) == like_rows(conn, keyword)
+
+
+@pytest.mark.parametrize("keyword", ["a", "ab", "_", "g%"])
+def test_limit_returns_subset_of_like(table, conn, keyword):
+    expected = like_rows(conn, keyword)
+    result = AliasIndex(table).search(keyword, limit=3)
+
+    assert len(result) == min(3, len(expected))
+    assert set(map(tuple, result.to_numpy().tolist())) <= expected
+
+
+def test_prefix_matches_first_in_dictionary_order(table):
+    result = AliasIndex(table).search("abc", limit=len(table))
+    keys = result["alias_value"].str.lower().tolist()
+
+    # 前缀匹配在前，其余子串匹配在后，各自按（小写）字典序
+    assert keys == ["abc", "abc_1", "ta_abc1", "taabc1", "taabc1", "taabc12", "xabcx"]
+
+
+def test_wildcard_prefix_uses_pattern(table):
+    result = AliasIndex(table).search("a_b", limit=len(table))
+
+    # a%b 与 a_b 都以 a?b 开头，排在只是包含 a?b 的 ta_abc1 之前
+    assert result["alias_value"].str.lower().tolist()[:2] == ["a%b", "a_b"]
+
+
+def test_search_alias_reads_index(tiny_db, monkeypatch):
+    monkeypatch.setattr(alias_index, "_INDEX", None)
+
+    result = db_query.search_alias(" old_ ")
+
+    assert result["primary_gene_id"].tolist() == ["TraesCS1A02G000100"]
+    assert db_query.search_alias("   ").empty
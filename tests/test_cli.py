@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+
+"""
+cli.py 的分批输出与输入文件命名。
+"""
+
+import io
+
+import pandas as pd
+import pytest
+
+import cli
+
+
+def test_tsv_writer_skips_frames_without_columns():
+    out = io.StringIO()
+    writer = cli.TsvWriter(out)
+
+    writer.write(pd.DataFrame())
+    writer.write(pd.DataFrame({"input_gene_id": ["g1"], "cs_gene_id": ["c1"]}))
+    writer.write(pd.DataFrame())
+    writer.write(pd.DataFrame({"cs_gene_id": ["c2"], "input_gene_id": ["g2"]}))
+
+    assert out.getvalue() == "input_gene_id\tcs_gene_id\ng1\tc1\ng2\tc2\n"
+
+
+def test_homologs_keeps_hits_after_empty_first_chunk(tiny_db, tmp_path):
+    from utils.db_query import get_cs_self_hits
+
+    empty = get_cs_self_hits(["TraesCS1A02G000100"])
+    assert empty.empty
+    assert list(empty.columns[:2]) == ["input_gene_id", "cs_gene_id"]
+    assert "self_homolog_gene_id" in empty.columns
+
+    genes = tmp_path / "genes.txt"
+    genes.write_text("TraesCS1A02G000100\nTraesCS1B02G000200\n", encoding="utf-8")
+    output = tmp_path / "hits.tsv"
+
+    assert cli.main(["homologs", str(genes), "--chunk-size", "1", "-o", str(output)]) == 0
+
+    result = pd.read_csv(output, sep="\t", dtype=str)
+    assert result["input_gene_id"].tolist() == ["TraesCS1B02G000200"] * 2
+    assert result["self_homolog_gene_id"].tolist() == ["TraesCS1D02G000300", "TraesCS1A02G000100"]
+
+
+def test_read_gene_lists_names_and_duplicates(tmp_path):
+    first = tmp_path / "ctrl.vs.trt.txt"
+    first.write_text("g1\ng2\n", encoding="utf-8")
+    second = tmp_path / "ctrl.vs.mock.txt"
+    second.write_text("g3\n", encoding="utf-8")
+
+    assert cli._read_gene_lists([str(first), str(second)]) == {
+        "ctrl.vs.trt": ["g1", "g2"],
+        "ctrl.vs.mock": ["g3"],
+    }
+
+    with pytest.raises(ValueError):
+        cli._read_gene_lists([str(first), str(tmp_path / "sub" / "ctrl.vs.trt.txt")])
@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+
+"""
+GO DAG 解析 / 传递与 elim、parent-child 富集模式。
+
+tests/data/mini_go.obo 的结构（只有 is_a / part_of 参与传递）：
+
+    GO:0000001 (根)
+    ├── GO:0000002                 is_a
+    │   ├── GO:0000003 (alt_id GO:0000099)
+    │   │   └── GO:0000005         is_a GO:0000003 + is_a GO:0000001
+    │   └── GO:0000004             part_of
+    GO:0000006                     obsolete，跳过
+    GO:0000007                     只有 regulates，视为根
+"""
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.stats import hypergeom
+
+from utils.go_dag import build_go_dag, load_go_dag_file, propagate_go_index, save_go_dag
+from utils.go_enrichment import _enrich_mode, check_dag_mode
+from utils.go_index import build_go_index
+
+
+OBO_PATH = Path(__file__).parent / "data" / "mini_go.obo"
+
+BACKGROUND = [f"g{i:02d}" for i in range(1, 21)]
+
+# 直接注释；GO:0000003 只通过 alt_id GO:0000099 注释，GO:0009999 不在 OBO 中
+TERM2GENE = {
+    "GO:0000005": ["g01", "g02", "g03", "g04"],
+    "GO:0000099": ["g05"],
+    "GO:0000004": ["g06", "g07", "g08"],
+    "GO:0000002": ["g09", "g10"],
+    "GO:0000001": [f"g{i:02d}" for i in range(11, 21)],
+    "GO:0009999": ["g01", "g02", "g11"],
+}
+
+STUDY = {"g01", "g02", "g03", "g04", "g09"}
+
+
+@pytest.fixture(scope="module")
+def dag():
+    return build_go_dag(str(OBO_PATH))
+
+
+@pytest.fixture(scope="module")
+def dag_index(dag):
+    index = build_go_index(
+        term2gene=pd.DataFrame(
+            [(go_id, g) for go_id, genes in TERM2GENE.items() for g in genes],
+            columns=["go_id", "gene_id"],
+        ),
+        term2name=pd.DataFrame(columns=["go_id", "go_term_name"]),
+        metadata=pd.DataFrame(columns=["go_id"]),
+        background_genes=set(BACKGROUND),
+    )
+    return propagate_go_index(index, dag)
+
+
+def _run(dag_index, mode: str) -> pd.DataFrame:
+    index = dag_index.index
+    study_vec = index.study_indicator(STUDY)
+    res = _enrich_mode(
+        index,
+        dag_index,
+        mode,
+        study_vec,
+        index.membership @ study_vec,
+        min_geneset_size=3,
+        max_geneset_size=2000,
+    )
+    return res.set_index("go_id")
+
+
+def _genes(dag_index, go_id: str) -> set:
+    index = dag_index.index
+    row = int(np.flatnonzero(index.term_ids == go_id)[0])
+    return set(index.gene_ids[index.membership[row].indices].tolist())
+
+
+# ============================================================
+# OBO 解析与 DAG 结构
+# ============================================================
+
+def test_obo_terms_and_alt_ids(dag):
+    # obsolete term 跳过，[Typedef] 段不当作 term
+    assert dag.term_ids.tolist() == [f"GO:000000{i}" for i in (1, 2, 3, 4, 5, 7)]
+    assert dag.alt_ids == {"GO:0000099": "GO:0000003"}
+    assert dag.codes_for(np.array(["GO:0000099", "GO:0000006", "GO:0000005"])).tolist() == [2, -1, 4]
+
+
+def test_depth_is_longest_path_to_root(dag):
+    depth = dict(zip(dag.term_ids.tolist(), dag.depth.tolist()))
+    assert depth == {
+        "GO:0000001": 0,
+        "GO:0000002": 1,
+        "GO:0000003": 2,
+        "GO:0000004": 2,  # part_of 参与计算
+        "GO:0000005": 3,  # 经 GO:0000003 的路径比直接 is_a 根更长
+        "GO:0000007": 0,  # regulates 不参与
+    }
+
+
+def test_ancestor_closure(dag):
+    term_ids = dag.term_ids
+    closure = {
+        term_ids[i]: set(term_ids[dag.ancestors[i].indices].tolist())
+        for i in range(dag.n_terms)
+    }
+    assert closure == {
+        "GO:0000001": {"GO:0000001"},
+        "GO:0000002": {"GO:0000001", "GO:0000002"},
+        "GO:0000003": {"GO:0000001", "GO:0000002", "GO:0000003"},
+        "GO:0000004": {"GO:0000001", "GO:0000002", "GO:0000004"},
+        "GO:0000005": {"GO:0000001", "GO:0000002", "GO:0000003", "GO:0000005"},
+        "GO:0000007": {"GO:0000007"},
+    }
+
+
+def test_cycle_is_rejected(tmp_path):
+    obo = tmp_path / "cycle.obo"
+    obo.write_text(
+        "[Term]\nid: GO:0000001\nis_a: GO:0000002\n\n"
+        "[Term]\nid: GO:0000002\nis_a: GO:0000001\n",
+        encoding="utf-8",
+    )
+    with pytest.raises(ValueError):
+        build_go_dag(str(obo))
+
+
+def test_disk_cache_round_trip(dag, tmp_path):
+    path = tmp_path / "go_dag.npz"
+    save_go_dag(dag, path)
+    loaded = load_go_dag_file(path)
+
+    assert loaded.term_ids.tolist() == dag.term_ids.tolist()
+    assert loaded.depth.tolist() == dag.depth.tolist()
+    assert (loaded.ancestors != dag.ancestors).nnz == 0
+    assert loaded.alt_ids == dag.alt_ids
+
+
+# ============================================================
+# 注释传递
+# ============================================================
+
+def test_propagation_follows_true_path_rule(dag_index):
+    assert _genes(dag_index, "GO:0000003") == {"g01", "g02", "g03", "g04", "g05"}
+    assert _genes(dag_index, "GO:0000002") == {f"g{i:02d}" for i in range(1, 11)}
+    assert _genes(dag_index, "GO:0000001") == set(BACKGROUND)
+    # 不在 OBO 中的 term 保留原注释，不参与传递
+    assert _genes(dag_index, "GO:0009999") == {"g01", "g02", "g11"}
+    assert "GO:0000099" not in dag_index.index.term_ids
+
+
+# ============================================================
+# elim / parent-child
+# ============================================================
+
+def test_elim_removes_genes_of_significant_children(dag_index):
+    classic = _run(dag_index, "classic")
+    elim = _run(dag_index, "elim")
+
+    # 最深的 GO:0000005（4/4 为 DEG）先检验并显著，其基因从所有祖先中移除
+    assert elim.loc["GO:0000005", "pvalue"] == classic.loc["GO:0000005", "pvalue"]
+    assert elim.loc["GO:0000005", "pvalue"] < 0.01
+
+    # GO:0000003 剩下的 g05 不是 DEG：classic 中报告，elim 后不再报告
+    assert "GO:0000003" in classic.index
+    assert "GO:0000003" not in elim.index
+
+    # 祖先只保留未被移除的基因
+    assert classic.loc["GO:0000002", ["BgRatio_numerator", "Count"]].tolist() == [10, 5]
+    assert elim.loc["GO:0000002", ["BgRatio_numerator", "Count"]].tolist() == [6, 1]
+    assert elim.loc["GO:0000002", "geneID"] == "g09"
+    assert elim.loc["GO:0000001", ["BgRatio_numerator", "Count"]].tolist() == [16, 1]
+    assert elim.loc["GO:0000002", "pvalue"] == pytest.approx(hypergeom.sf(0, 20, 6, 5))
+
+
+def test_parent_child_population(dag_index):
+    res = _run(dag_index, "parent_child")
+
+    # (总体 = 父节点基因并集, 总体中的 DEG, term 基因数, term 中的 DEG)
+    expected = {
+        "GO:0000005": (20, 5, 4, 4),  # 父节点 GO:0000003 与根的并集
+        "GO:0000003": (10, 5, 5, 4),  # 父节点 GO:0000002
+        "GO:0000002": (20, 5, 10, 5),
+        "GO:0000001": (20, 5, 20, 5),  # 根节点以全部背景为总体
+        "GO:0009999": (20, 5, 3, 2),   # 不在 OBO 中，同样以全部背景为总体
+    }
+    assert sorted(res.index) == sorted(expected)
+    for go_id, (population, population_study, size, count) in expected.items():
+        row = res.loc[go_id]
+        assert row["BgRatio_denominator"] == population
+        assert row["GeneRatio_denominator"] == population_study
+        assert row["BgRatio_numerator"] == size
+        assert row["Count"] == count
+        assert row["pvalue"] == pytest.approx(
+            hypergeom.sf(count - 1, population, size, population_study)
+        )
+
+
+@pytest.mark.parametrize("mode", ["elim", "parent_child"])
+def test_permutations_rejected_for_decorrelated_modes(mode):
+    with pytest.raises(ValueError):
+        check_dag_mode(mode, n_permutations=100)
+    check_dag_mode(mode)
+
+
+@pytest.mark.parametrize("mode", ["flat", "classic"])
+def test_permutations_allowed_for_flat_and_classic(mode):
+    check_dag_mode(mode, n_permutations=100)
+
+
+def test_unknown_dag_mode():
+    with pytest.raises(ValueError):
+        check_dag_mode("weight01")
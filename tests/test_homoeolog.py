@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+
+"""
+A/B/D homoeolog 分组，以及 GO / KEGG 富集中的同源合并。
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.sparse import csr_matrix
+
+from utils import homoeolog
+from utils.go_enrichment import collapse_go_index, enrich_go_index
+from utils.go_index import build_go_index
+from utils.homoeolog import build_homoeolog_index, get_homoeolog_index
+
+
+A1, B1, D1 = "TraesCS1A02G000100", "TraesCS1B02G000100", "TraesCS1D02G000100"
+A2, D2 = "TraesCS2A02G000200", "TraesCS2D02G000200"
+S3, S4, S5, S6 = (
+    "TraesCS3A02G000300", "TraesCS4B02G000400", "TraesCS5D02G000500", "TraesCS6A02G000600",
+)
+
+# A1-B1、D1-B1 串成一组（跨三个亚基因组），A2-D2 一组，其余基因不在同源对中
+PAIRS = pd.DataFrame(
+    [(B1, A1), (D1, B1), (A2, D2)],
+    columns=["cs_gene_id", "self_homolog_gene_id"],
+)
+BACKGROUND = [A1, B1, D1, A2, D2, S3, S4, S5, S6]
+
+
+@pytest.fixture
+def homoeologs(monkeypatch):
+    index = build_homoeolog_index(PAIRS)
+    monkeypatch.setattr(homoeolog, "_INDEX", index)
+    return index
+
+
+def test_groups_are_connected_components(homoeologs):
+    assert homoeologs.n_groups == 2
+    assert homoeologs.group_labels.tolist() == [A1, A2]
+
+    # 组名为组内字典序最小的基因号；不在同源对中的基因返回自身
+    labels = homoeologs.labels_for([D1, B1, A1, D2, S3])
+    assert labels.tolist() == [A1, A1, A1, A2, S3]
+    assert homoeologs.labels_for([]).tolist() == []
+
+
+def test_empty_pairs():
+    index = build_homoeolog_index(pd.DataFrame(columns=["cs_gene_id", "self_homolog_gene_id"]))
+    assert index.n_groups == 0
+    assert index.labels_for([A1]).tolist() == [A1]
+
+
+def test_collapse_matrix_rows_to_groups(homoeologs):
+    gene_ids = np.array([A1, A2, B1, D2, S3])
+    matrix = csr_matrix(np.array([
+        [1, 0, 1, 0, 0],  # 同一组两个基因只计一次
+        [0, 0, 0, 1, 1],
+        [0, 0, 0, 0, 0],
+    ], dtype=np.int32))
+
+    labels, collapsed = homoeologs.collapse(gene_ids, matrix)
+
+    assert labels.tolist() == [A1, A2, S3]
+    assert collapsed.toarray().tolist() == [[1, 0, 0], [0, 1, 1], [0, 0, 0]]
+
+
+def test_homoeolog_index_from_database_skips_same_subgenome(tiny_db):
+    homoeolog.clear_homoeolog_index_cache()
+    try:
+        index = get_homoeolog_index()
+        # tiny_db 中 1B 与 1D、1A 的同源对都跨亚基因组，合并为一组
+        assert index.labels_for([A1, "TraesCS1B02G000200", "TraesCS1D02G000300"]).tolist() == [A1] * 3
+    finally:
+        homoeolog.clear_homoeolog_index_cache()
+
+
+def test_collapsed_go_enrichment_counts_groups(homoeologs):
+    term2gene = pd.DataFrame(
+        [("T1", g) for g in (A1, B1, D1, S3)]
+        + [("T2", g) for g in (B1, A2, S4)]
+        + [("T3", g) for g in (S5, S6, D2)],
+        columns=["go_id", "gene_id"],
+    )
+    index = build_go_index(
+        term2gene=term2gene,
+        term2name=pd.DataFrame(columns=["go_id", "go_term_name"]),
+        metadata=pd.DataFrame(columns=["go_id"]),
+        background_genes=set(BACKGROUND),
+    )
+    collapsed = collapse_go_index(index, homoeologs)
+
+    # 9 个背景基因合并为 A1 组、A2 组和 4 个单独的基因
+    assert collapsed.gene_ids.tolist() == [A1, A2, S3, S4, S5, S6]
+    assert collapsed.n_background == 6
+    # 同一个源索引只合并一次
+    assert collapse_go_index(index, homoeologs) is collapsed
+
+    study = set(homoeologs.labels_for([A1, B1, D1, A2]))
+    res = enrich_go_index(collapsed, study, min_geneset_size=1).set_index("go_id")
+
+    # (term 组数, 背景组数, overlap 组数, study 组数)
+    expected = {"T1": (2, 6, 1, 2), "T2": (3, 6, 2, 2), "T3": (3, 6, 1, 2)}
+    for go_id, values in expected.items():
+        row = res.loc[go_id]
+        assert (
+            row["BgRatio_numerator"], row["BgRatio_denominator"],
+            row["Count"], row["GeneRatio_denominator"],
+        ) == values
+    assert res.loc["T2", "geneID"] == f"{A1}/{A2}"
+
+
+def test_collapsed_kegg_enrichment_counts_groups(homoeologs, tmp_path):
+    from utils.kegg_enrichment import run_kegg_enrichment
+
+    gene2ko = tmp_path / "gene2ko.tsv"
+    pd.DataFrame(
+        [(A1, "K1"), (B1, "K1;K2"), (D1, "K3"), (A2, "K4"), (D2, "K4"), (S3, "K5"), (S4, "K6"), (S5, "K7")],
+        columns=["gene_id", "ko_list"],
+    ).to_csv(gene2ko, sep="\t", index=False)
+    ko2pathway = tmp_path / "ko2pathway.tsv"
+    pd.DataFrame(
+        [("K1", "ko00001"), ("K2", "ko00001"), ("K3", "ko00001"), ("K5", "ko00001"),
+         ("K4", "ko00002"), ("K6", "ko00002"), ("K7", "ko00002")],
+        columns=["KO", "pathway"],
+    ).to_csv(ko2pathway, sep="\t", index=False)
+    pathway2name = tmp_path / "pathway2name.tsv"
+    pd.DataFrame(
+        [("ko00001", "Pathway one"), ("ko00002", "Pathway two")],
+        columns=["pathway", "Description"],
+    ).to_csv(pathway2name, sep="\t", index=False)
+
+    paths = (str(gene2ko), str(ko2pathway), str(pathway2name))
+    deg = [A1, B1, A2]
+
+    _, _, plain_summary = run_kegg_enrichment(deg, *paths, min_size=1)
+    res, _, summary = run_kegg_enrichment(deg, *paths, min_size=1, collapse_homoeologs=True)
+
+    plain = dict(zip(plain_summary["项目"], plain_summary["数值"]))
+    merged = dict(zip(summary["项目"], summary["数值"]))
+
+    assert plain["成功映射到 KO 的 DEG 基因数"] == 3
+    assert plain["前景 KO 数"] == 3
+    assert plain["背景基因数（有 KO 注释）"] == 8
+
+    # A1 / B1 合并为一组，组的 KO 为组内所有基因 KO 的并集（含 D1 的 K3）
+    assert merged["成功映射到 KO 的 DEG 基因数"] == 2
+    assert merged["前景 KO 数"] == 4
+    assert merged["背景基因数（有 KO 注释）"] == 5
+    assert merged["背景 gene-KO 映射条目数"] == 7
+
+    res = res.set_index("ID")
+    assert res.loc["ko00001", "Count"] == 3
+    assert res.loc["ko00001", "geneID"] == "K1/K2/K3"
+    assert res.loc["ko00002", "Count"] == 1
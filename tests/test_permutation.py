@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+
+"""
+utils/permutation.py：随机抽样、经验 p 值与 Besag-Clifford 序贯停止。
+"""
+
+import numpy as np
+import pytest
+from scipy.sparse import csr_matrix
+
+from utils import permutation
+from utils.permutation import draw_random_sets, permutation_pvalues
+
+
+N_BACKGROUND = 40
+
+
+def _membership(rows) -> csr_matrix:
+    data = [(i, j) for i, cols in enumerate(rows) for j in cols]
+    return csr_matrix(
+        (np.ones(len(data), dtype=np.int32), ([i for i, _ in data], [j for _, j in data])),
+        shape=(len(rows), N_BACKGROUND),
+    )
+
+
+# term 0：observed = 0，每次置换都「超出」，很快停止；
+# term 1：observed 远大于可能的 overlap，永远不会超出；
+# term 2 / 3：普通情况
+MEMBERSHIP = _membership([range(0, 10), range(10, 14), range(0, 20), range(5, 25, 2)])
+OBSERVED = np.array([0, 5, 4, 3])
+SET_SIZE = 8
+
+
+def test_draw_random_sets_without_replacement():
+    sets = draw_random_sets(np.random.default_rng(1), N_BACKGROUND, SET_SIZE, 50)
+
+    assert sets.shape == (50, N_BACKGROUND)
+    for i in range(50):
+        row = sets[i].indices
+        assert len(row) == SET_SIZE
+        assert len(np.unique(row)) == SET_SIZE
+
+
+def test_same_seed_gives_identical_pvalues():
+    kwargs = dict(set_size=SET_SIZE, n_background=N_BACKGROUND, n_permutations=500)
+
+    p1, n1 = permutation_pvalues(MEMBERSHIP, OBSERVED, seed=7, **kwargs)
+    p2, n2 = permutation_pvalues(MEMBERSHIP, OBSERVED, seed=7, **kwargs)
+    p3, _ = permutation_pvalues(MEMBERSHIP, OBSERVED, seed=8, **kwargs)
+
+    np.testing.assert_array_equal(p1, p2)
+    np.testing.assert_array_equal(n1, n2)
+    assert not np.array_equal(p1, p3)
+
+
+def test_batching_does_not_change_results(monkeypatch):
+    kwargs = dict(set_size=SET_SIZE, n_background=N_BACKGROUND, n_permutations=300, seed=3)
+    p_single, n_single = permutation_pvalues(MEMBERSHIP, OBSERVED, **kwargs)
+
+    # 每批只有 7 次置换
+    monkeypatch.setattr(permutation, "PERM_BATCH_CELLS", 7 * N_BACKGROUND)
+    p_batched, n_batched = permutation_pvalues(MEMBERSHIP, OBSERVED, **kwargs)
+
+    np.testing.assert_array_equal(p_single, p_batched)
+    np.testing.assert_array_equal(n_single, n_batched)
+
+
+def test_pvalues_in_unit_interval_with_plus_one_convention():
+    n_permutations = 400
+    p, n_done = permutation_pvalues(
+        MEMBERSHIP, OBSERVED, SET_SIZE, N_BACKGROUND,
+        n_permutations=n_permutations, stop_after=n_permutations + 1, seed=0,
+    )
+
+    assert ((p > 0) & (p <= 1)).all()
+    assert (n_done == n_permutations).all()
+
+    # p = (r + 1) / (B + 1)，r 为 0..B 的整数
+    r = p * (n_permutations + 1) - 1
+    np.testing.assert_allclose(r, np.round(r), atol=1e-9)
+    assert p[0] == 1.0
+    assert p[1] == 1 / (n_permutations + 1)
+
+
+def test_sequential_stop_only_for_terms_reaching_stop_after():
+    n_permutations, stop_after = 1000, 10
+    p, n_done = permutation_pvalues(
+        MEMBERSHIP, OBSERVED, SET_SIZE, N_BACKGROUND,
+        n_permutations=n_permutations, stop_after=stop_after, seed=0,
+    )
+
+    stopped = n_done < n_permutations
+    # observed = 0 的 term 第 stop_after 次置换就停止
+    assert n_done[0] == stop_after
+    assert p[0] == 1.0
+    # 永远不超出的 term 跑满全部置换
+    assert not stopped[1]
+    assert p[1] == 1 / (n_permutations + 1)
+
+    # 提前停止的 term：p = stop_after / 已完成置换数；其余按 (r + 1) / (B + 1)
+    np.testing.assert_allclose(p[stopped] * n_done[stopped], stop_after)
+    r = p[~stopped] * (n_permutations + 1) - 1
+    assert (np.round(r) < stop_after).all()
+
+
+def test_empty_inputs():
+    p, n_done = permutation_pvalues(MEMBERSHIP, OBSERVED, 0, N_BACKGROUND, n_permutations=10)
+    assert (p == 1).all() and (n_done == 0).all()
+
+    p, n_done = permutation_pvalues(MEMBERSHIP[:0], OBSERVED[:0], SET_SIZE, N_BACKGROUND)
+    assert p.shape == (0,) and n_done.shape == (0,)
+
+
+def test_kegg_gene_to_ko_matches_naive_loop():
+    # 玩具 KEGG 索引：6 个基因，5 个 KO（一个基因可对应多个 KO，多个基因可对应同一 KO），
+    # 3 条通路在 KO 层面检验
+    gene_kos = {0: [0], 1: [0, 1], 2: [2], 3: [3], 4: [3, 4], 5: []}
+    pathway_kos = [{0, 1}, {2, 3, 4}, {1, 4}]
+    observed = np.array([2, 2, 1])
+    n_genes, set_size, n_permutations, seed = 6, 3, 200, 11
+
+    gene_to_ko = csr_matrix(
+        (
+            np.ones(sum(len(v) for v in gene_kos.values()), dtype=np.int32),
+            ([g for g, kos in gene_kos.items() for _ in kos], [k for kos in gene_kos.values() for k in kos]),
+        ),
+        shape=(n_genes, 5),
+    )
+    membership = csr_matrix(
+        (
+            np.ones(sum(len(s) for s in pathway_kos), dtype=np.int32),
+            ([i for i, s in enumerate(pathway_kos) for _ in s], [k for s in pathway_kos for k in sorted(s)]),
+        ),
+        shape=(len(pathway_kos), 5),
+    )
+
+    p, n_done = permutation_pvalues(
+        membership, observed, set_size, n_genes,
+        gene_to_feature=gene_to_ko,
+        n_permutations=n_permutations, stop_after=n_permutations + 1, seed=seed,
+    )
+
+    # 朴素实现：同一个随机数流抽出同样的基因集，逐个映射为 KO 集合再数 overlap
+    random_sets = draw_random_sets(np.random.default_rng(seed), n_genes, set_size, n_permutations)
+    exceed = np.zeros(len(pathway_kos), dtype=np.int64)
+    for i in range(n_permutations):
+        kos = {k for g in random_sets[i].indices for k in gene_kos[int(g)]}
+        for j, pathway in enumerate(pathway_kos):
+            exceed[j] += len(kos & pathway) >= observed[j]
+
+    assert (n_done == n_permutations).all()
+    np.testing.assert_array_equal(p, (exceed + 1) / (n_permutations + 1))
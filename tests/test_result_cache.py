@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+
+"""
+utils/result_cache.py：缓存键的构成。
+"""
+
+import os
+
+from utils.result_cache import result_key
+
+
+def test_gene_order_and_duplicates_do_not_change_key(tmp_path):
+    path = tmp_path / "term2gene.tsv"
+    path.write_text("GO:1\tg1\n")
+
+    params = {"min_size": 10}
+    assert result_key("go", ["g2", " g1", "g2"], params, [str(path)]) == \
+        result_key("go", ["g1", "g2"], params, [str(path)])
+
+
+def test_homolog_db_counts_only_when_collapsing(tiny_db, tmp_path):
+    db_path = tmp_path / "tiny.sqlite"
+    flat = {"collapse_homoeologs": False}
+    collapsed = {"collapse_homoeologs": True}
+    before = (result_key("kegg", ["g1"], flat, []), result_key("kegg", ["g1"], collapsed, []))
+
+    st = os.stat(db_path)
+    os.utime(db_path, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+
+    assert result_key("kegg", ["g1"], flat, []) == before[0]
+    assert result_key("kegg", ["g1"], collapsed, []) != before[1]
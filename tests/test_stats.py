@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+
+"""
+utils/stats.py 的数值回归测试。
+
+tests/data/multitest_baseline.json 由改用 utils.stats 之前的代码生成：
+- multitest：statsmodels.stats.multitest.multipletests（fdr_bh / fdr_by / bonferroni）
+  的输出；含 NaN 的用例只对非 NaN 部分调用 multipletests，NaN 位置保持 NaN；
+- go：旧 enrich_go（statsmodels BH）在一组合成 term 上的 p.adjust / significant；
+- kegg：旧 run_kegg_enrichment（kegg_enrichment.bh_adjust）在
+  data/kegg_mapping + data/example_kegg_deg_genes.txt 上的 p.adjust。
+"""
+
+import json
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from utils.stats import (
+    bh_adjust,
+    bh_reject,
+    bonferroni_adjust,
+    by_adjust,
+    p_adjust,
+    storey_pi0,
+    storey_qvalues,
+)
+
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+BASELINE = json.loads((Path(__file__).parent / "data" / "multitest_baseline.json").read_text())
+
+MULTITEST_CASES = sorted(BASELINE["multitest"])
+ADJUST_FUNCS = {"BH": bh_adjust, "BY": by_adjust, "bonferroni": bonferroni_adjust}
+
+
+def _array(values):
+    return np.array(values, dtype=float)
+
+
+# ============================================================
+# 多重检验校正：与 statsmodels 基线逐位一致
+# ============================================================
+
+@pytest.mark.parametrize("case", MULTITEST_CASES)
+@pytest.mark.parametrize("method", sorted(ADJUST_FUNCS))
+def test_adjust_matches_multipletests(case, method):
+    entry = BASELINE["multitest"][case]
+    p = _array(entry["pvalues"])
+    expected = _array(entry[method])
+
+    np.testing.assert_array_equal(ADJUST_FUNCS[method](p), expected)
+    np.testing.assert_array_equal(p_adjust(p, method), expected)
+
+
+@pytest.mark.parametrize("case", MULTITEST_CASES)
+def test_bh_reject_matches_multipletests(case):
+    entry = BASELINE["multitest"][case]
+    reject = bh_reject(_array(entry["pvalues"]))
+
+    assert reject.dtype == bool
+    np.testing.assert_array_equal(reject, np.array(entry["BH_reject"], dtype=bool))
+
+
+def test_baseline_covers_edge_cases():
+    cases = BASELINE["multitest"]
+    assert cases["empty"]["pvalues"] == []
+    assert np.isnan(_array(cases["with_nan"]["pvalues"])).any()
+    for name in ("uniform_ties", "skewed_ties"):
+        p = _array(cases[name]["pvalues"])
+        assert len(np.unique(p)) < len(p)
+
+
+def test_nan_positions_stay_nan():
+    p = _array([0.01, np.nan, 0.02])
+    np.testing.assert_array_equal(bh_adjust(p), _array([0.02, np.nan, 0.02]))
+    np.testing.assert_array_equal(bh_reject(p), [True, False, True])
+
+
+def test_empty_input():
+    for func in ADJUST_FUNCS.values():
+        assert func([]).shape == (0,)
+    assert bh_reject([]).shape == (0,)
+    assert storey_qvalues([]).shape == (0,)
+
+
+def test_p_adjust_rejects_unknown_method():
+    with pytest.raises(ValueError):
+        p_adjust([0.1, 0.2], method="holm")
+
+
+# ============================================================
+# Storey q 值
+# ============================================================
+
+def test_storey_pi0_estimate():
+    # 4 个 p >= 0.05，共 10 个：pi0 = 0.4 / 0.95
+    p = _array([0.001, 0.002, 0.01, 0.02, 0.03, 0.04, 0.2, 0.5, 0.7, 0.9])
+    assert storey_pi0(p) == pytest.approx(0.4 / 0.95)
+
+    q = storey_qvalues(p)
+    np.testing.assert_allclose(q, storey_pi0(p) * bh_adjust(p), rtol=0, atol=0)
+    assert (q <= bh_adjust(p)).all()
+
+
+def test_storey_pi0_is_clipped_to_one():
+    # 全部 p >= lam 时 mean / (1 - lam) > 1，应截断为 1，q 值等于 BH
+    p = _array([0.3, 0.5, 0.8, 0.99, 1.0])
+    assert storey_pi0(p) == 1.0
+    np.testing.assert_array_equal(storey_qvalues(p), bh_adjust(p))
+
+
+def test_storey_qvalues_nan_when_pi0_is_zero():
+    p = _array([0.001, 0.01, 0.02, 0.049])
+    assert storey_pi0(p) == 0.0
+    assert np.isnan(storey_qvalues(p)).all()
+
+
+def test_storey_ignores_nan_pvalues():
+    p = _array([0.01, np.nan, 0.5, 0.9])
+    assert storey_pi0(p) == pytest.approx(min((2 / 3) / 0.95, 1.0))
+    assert np.isnan(storey_qvalues(p)[1])
+
+
+# ============================================================
+# GO / KEGG 富集结果中的 p.adjust 与基线一致
+# ============================================================
+
+def test_enrich_go_p_adjust_matches_baseline():
+    from utils.go_enrichment import enrich_go
+
+    base = BASELINE["go"]
+    res = enrich_go(
+        set(base["study"]),
+        set(base["background"]),
+        {go_id: set(genes) for go_id, genes in base["go_to_genes"].items()},
+    ).set_index("go_id")
+    expected = base["result"]
+
+    assert sorted(res.index) == sorted(expected)
+    for column in ("pvalue", "p.adjust"):
+        np.testing.assert_array_equal(
+            res.loc[list(expected), column].to_numpy(),
+            _array([expected[g][column] for g in expected]),
+        )
+    np.testing.assert_array_equal(
+        res.loc[list(expected), "significant"].to_numpy(dtype=bool),
+        [expected[g]["significant"] for g in expected],
+    )
+
+
+def test_kegg_p_adjust_matches_baseline():
+    from utils.kegg_enrichment import run_kegg_enrichment
+
+    mapping = PROJECT_ROOT / "data" / "kegg_mapping"
+    deg_file = PROJECT_ROOT / "data" / "example_kegg_deg_genes.txt"
+    if not (mapping / "gene2ko_clean.tsv").exists() or not deg_file.exists():
+        pytest.skip("缺少 data/kegg_mapping 或示例 DEG 文件")
+
+    deg = [
+        line.strip() for line in deg_file.read_text(encoding="utf-8").splitlines()
+        if line.strip() and not line.startswith("#")
+    ]
+    res, _, _ = run_kegg_enrichment(
+        deg,
+        str(mapping / "gene2ko_clean.tsv"),
+        str(mapping / "kegg_ko2pathway.tsv"),
+        str(mapping / "kegg_pathway2name.tsv"),
+    )
+    res = res.set_index("ID")
+    expected = BASELINE["kegg"]
+
+    assert sorted(res.index) == sorted(expected)
+    np.testing.assert_array_equal(
+        res.loc[list(expected), "pvalue"].to_numpy(),
+        _array([expected[k]["pvalue"] for k in expected]),
+    )
+    # 旧 KEGG 代码按 p * n / rank 计算，现在与 statsmodels 一致按 p / (rank / n)，
+    # 两者最多相差 1 ulp
+    np.testing.assert_allclose(
+        res.loc[list(expected), "p.adjust"].to_numpy(),
+        _array([expected[k]["p.adjust"] for k in expected]),
+        rtol=1e-14,
+        atol=0,
+    )
+
+    p = res["pvalue"].to_numpy()
+    np.testing.assert_array_equal(res["qvalue"].to_numpy(), storey_qvalues(p))
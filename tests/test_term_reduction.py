@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+
+"""
+utils/term_reduction.py：按基因重叠合并冗余 term。
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.term_reduction import cluster_terms, gene_set_matrix, reduce_redundant_terms
+
+
+# 行顺序故意打乱；按 p.adjust 排序后为 A, F, C, B, D, E, G
+RESULT = pd.DataFrame(
+    [
+        ("D", "BP", 0.02, "g5/g6/g7/g8"),
+        ("A", "BP", 0.001, "g1/g2/g3/g4"),
+        ("G", "MF", 0.05, "g1/g2/g3"),
+        ("E", "BP", 0.03, "g1/g9"),
+        ("B", "BP", 0.01, "g1/g2/g3"),
+        ("F", "MF", 0.004, "g1/g2/g3/g4"),
+        ("C", "BP", 0.005, "g5/g6"),
+    ],
+    columns=["go_id", "ontology", "p.adjust", "geneID"],
+)
+RESULT["pvalue"] = RESULT["p.adjust"] / 10
+
+
+def test_gene_set_matrix_counts_unique_genes():
+    matrix, sizes, n_genes = gene_set_matrix(["a/b/b", "", "b/c"])
+
+    assert matrix.shape == (3, 3)
+    assert sizes.tolist() == [2, 0, 2]
+    assert n_genes == 3
+    assert set(matrix.data.tolist()) == {1}
+
+
+def test_cluster_terms_greedy_jaccard():
+    # 行顺序即显著性顺序：0 与 1 的 Jaccard = 3/4，0 与 2 = 1/5，2 与 3 = 2/4
+    matrix, sizes, n_genes = gene_set_matrix(["g1/g2/g3/g4", "g1/g2/g3", "g1/g9", "g9/g10"])
+
+    assert cluster_terms(matrix, sizes, n_genes, method="jaccard", cutoff=0.5).tolist() == [0, 0, 1, 2]
+    assert cluster_terms(matrix, sizes, n_genes, method="jaccard", cutoff=0.8).tolist() == [0, 1, 2, 3]
+    assert cluster_terms(matrix, sizes, n_genes, method="jaccard", cutoff=0.2).tolist() == [0, 0, 0, 1]
+
+
+def test_cluster_terms_kappa_groups_identical_sets():
+    matrix, sizes, n_genes = gene_set_matrix(["g1/g2/g3", "g1/g2/g3", "g4/g5/g6", "g7/g8/g9"])
+    assert cluster_terms(matrix, sizes, n_genes, method="kappa").tolist() == [0, 0, 1, 2]
+
+
+def test_cluster_terms_rejects_unknown_method():
+    matrix, sizes, n_genes = gene_set_matrix(["g1"])
+    with pytest.raises(ValueError):
+        cluster_terms(matrix, sizes, n_genes, method="cosine")
+
+
+def test_reduce_redundant_terms_on_result_table():
+    clustered, reduced = reduce_redundant_terms(RESULT, method="jaccard", cutoff=0.5)
+    clustered = clustered.set_index("go_id")
+
+    # 原表行顺序不变
+    assert clustered.index.tolist() == RESULT["go_id"].tolist()
+
+    # 簇编号按代表 term 的显著性从 1 开始；F / G 与 A / B 基因相同，但属于不同 ontology
+    expected = {
+        "A": (1, 2, True),
+        "B": (1, 2, False),
+        "F": (2, 2, True),
+        "G": (2, 2, False),
+        "C": (3, 2, True),
+        "D": (3, 2, False),
+        "E": (4, 1, True),
+    }
+    for go_id, (cluster_id, cluster_size, representative) in expected.items():
+        row = clustered.loc[go_id]
+        assert row["cluster_id"] == cluster_id
+        assert row["cluster_size"] == cluster_size
+        assert bool(row["is_representative"]) is representative
+
+    # 每个簇的代表是簇内最显著的 term
+    best = clustered.reset_index().sort_values("p.adjust").groupby("cluster_id")["go_id"].first()
+    reps = clustered[clustered["is_representative"]].reset_index().set_index("cluster_id")["go_id"]
+    assert reps.sort_index().tolist() == best.sort_index().tolist()
+
+    # reduced 只保留代表，保持原表顺序
+    assert reduced["go_id"].tolist() == ["A", "E", "F", "C"]
+    assert reduced["is_representative"].all()
+
+
+def test_reduce_redundant_terms_empty_table():
+    clustered, reduced = reduce_redundant_terms(RESULT.iloc[:0])
+
+    assert clustered.columns[-3:].tolist() == ["cluster_id", "cluster_size", "is_representative"]
+    assert reduced.empty
+    assert np.issubdtype(clustered["cluster_id"].dtype, np.integer)
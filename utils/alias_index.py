@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+
+"""
+基因号别名的内存搜索索引
+
+search_alias 原来执行 alias_value LIKE '%kw%'，前置通配符让 SQLite 每次都
+全表扫描 gene_alias（约 21 万行），不适合输入框实时联想。这里把整张表读入内存一次：
+
+1. alias 转小写后去重排序（与 LIKE 对 ASCII 不区分大小写一致），
+   前缀查询用二分查找定位 [kw, kw + 最大字符) 区间；
+2. 每个 alias 的所有 1 / 2 / 3 字符片段建立倒排表（CSR：片段编码 -> alias 编号），
+   子串查询只在关键词各片段中倒排表最短的那个里逐个验证，凑够 limit 条即停止；
+   1~2 个字符的关键词直接取对应片段的倒排表，不再顺序扫描全部 alias；
+3. 与 LIKE 一致，关键词中的 % 匹配任意个字符、_ 匹配单个字符：
+   按通配符拆出的最长字面片段取候选，再用正则逐个验证；
+4. 结果先列前缀匹配，再列其他子串匹配，各自按字典序排列。
+
+索引在进程内只构建一次，所有 Streamlit 会话共享。
+"""
+
+import re
+import threading
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+# 子串验证时每批检查的候选数
+SCAN_BATCH = 256
+
+# 建立倒排表的片段长度
+GRAM_SIZES = (1, 2, 3)
+
+# LIKE 通配符
+_WILDCARDS = re.compile(r"[%_]")
+
+_INDEX: Optional["AliasIndex"] = None
+_INDEX_LOCK = threading.Lock()
+
+
+class AliasIndex:
+    """
+    gene_alias 表的前缀 + trigram 子串索引。
+
+    keys:
+        去重排序后的小写 alias，数组下标即 alias 编号
+    key_indptr / key_rows:
+        alias 编号 -> 原表行号（同一个 alias 可能对应多行）
+    alphabet:
+        alias 中出现过的全部字符（码位升序），片段编码以此为基数
+    grams:
+        片段长度 -> (片段编码（升序）, indptr, 包含该片段的 alias 编号（升序）)
+    """
+
+    def __init__(self, table: pd.DataFrame, value_column: str = "alias_value"):
+        self.table = table.reset_index(drop=True)
+
+        lowered = self.table[value_column].fillna("").astype(str).str.lower().to_numpy(dtype=str)
+        self.keys, key_codes = np.unique(lowered, return_inverse=True)
+        self._key_list: List[str] = self.keys.tolist()
+
+        self.key_rows = np.argsort(key_codes, kind="stable")
+        self.key_indptr = np.zeros(len(self.keys) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(key_codes, minlength=len(self.keys)), out=self.key_indptr[1:])
+
+        self._build_grams()
+
+    @property
+    def n_keys(self) -> int:
+        return len(self.keys)
+
+    def _build_grams(self) -> None:
+        n = len(self.keys)
+        width = max((len(k) for k in self._key_list), default=0)
+
+        self.alphabet = np.empty(0, dtype=np.uint32)
+        self.grams: Dict[int, Tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+        empty = (np.empty(0, dtype=np.int64), np.zeros(1, dtype=np.int64), np.empty(0, dtype=np.int32))
+        for k in GRAM_SIZES:
+            self.grams[k] = empty
+        if n == 0 or width == 0:
+            return
+
+        # 定长 Unicode 数组按 uint32 解读即为码位矩阵，末尾以 0 填充
+        chars = self.keys.astype(f"U{width}").view(np.uint32).reshape(n, width)
+        self.alphabet = np.unique(chars[chars > 0])
+        mapped = np.searchsorted(self.alphabet, chars).astype(np.int64) + 1
+        mapped[chars == 0] = 0
+
+        for k in GRAM_SIZES:
+            if k <= width:
+                self.grams[k] = self._gram_postings(mapped, k)
+
+    def _gram_postings(self, mapped: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        长度为 k 的片段倒排表：(片段编码, indptr, alias 编号)。
+        """
+        n, width = mapped.shape
+        base = len(self.alphabet) + 1
+
+        span = width - k + 1
+        gram = mapped[:, :span].copy()
+        for j in range(1, k):
+            gram = gram * base + mapped[:, j:j + span]
+
+        # 最后一个字符非 0 时前面的字符一定也非 0（填充只在末尾）
+        valid = mapped[:, k - 1:] > 0
+        key_ids = np.broadcast_to(np.arange(n, dtype=np.int32)[:, None], gram.shape)[valid]
+        gram = gram[valid]
+
+        order = np.lexsort((key_ids, gram))
+        gram, key_ids = gram[order], key_ids[order]
+        keep = np.ones(len(gram), dtype=bool)
+        keep[1:] = (gram[1:] != gram[:-1]) | (key_ids[1:] != key_ids[:-1])
+        gram, key_ids = gram[keep], key_ids[keep]
+
+        codes, starts = np.unique(gram, return_index=True)
+        return codes, np.append(starts, len(gram)).astype(np.int64), key_ids
+
+    def _query_grams(self, fragment: str) -> Optional[np.ndarray]:
+        """
+        字面片段的查询编码：不超过 3 个字符时为整个片段，否则为其中所有三字符片段；
+        含有索引中不存在的字符时返回 None（不可能匹配）。
+        """
+        if len(self.alphabet) == 0:
+            return None
+
+        codes = np.array([ord(c) for c in fragment], dtype=np.uint32)
+        pos = np.searchsorted(self.alphabet, codes)
+        if (pos >= len(self.alphabet)).any() or (self.alphabet[np.minimum(pos, len(self.alphabet) - 1)] != codes).any():
+            return None
+
+        mapped = pos.astype(np.int64) + 1
+        base = len(self.alphabet) + 1
+        k = min(len(fragment), GRAM_SIZES[-1])
+        span = len(fragment) - k + 1
+        gram = mapped[:span].copy()
+        for j in range(1, k):
+            gram = gram * base + mapped[j:j + span]
+        return gram
+
+    def _substring_candidates(self, fragment: str):
+        """
+        可能包含字面片段 fragment 的 alias 编号（升序），需要逐个验证。
+        """
+        if not fragment:
+            return np.arange(self.n_keys, dtype=np.int32)
+
+        gram = self._query_grams(fragment)
+        if gram is None:
+            return np.empty(0, dtype=np.int32)
+
+        codes, indptr, key_ids = self.grams[min(len(fragment), GRAM_SIZES[-1])]
+        pos = np.searchsorted(codes, gram)
+        if (pos >= len(codes)).any() or (codes[np.minimum(pos, len(codes) - 1)] != gram).any():
+            return np.empty(0, dtype=np.int32)
+
+        lengths = indptr[pos + 1] - indptr[pos]
+        best = pos[np.argmin(lengths)]
+        return key_ids[indptr[best]:indptr[best + 1]]
+
+    def search_keys(self, keyword: str, limit: int = 20) -> List[int]:
+        """
+        返回匹配的 alias 编号：前缀匹配在前，其他子串匹配在后，最多对应 limit 行。
+        """
+        keyword = keyword.strip().lower()
+        if not keyword or limit <= 0:
+            return []
+
+        keys = self._key_list
+        if _WILDCARDS.search(keyword):
+            # 与 LIKE 一致：% 匹配任意个字符，_ 匹配单个字符。
+            # 二分查找只能用第一个通配符之前的部分，区间内仍要用正则确认是否为前缀匹配
+            pattern = re.compile(
+                "".join(".*" if c == "%" else "." if c == "_" else re.escape(c) for c in keyword),
+                re.DOTALL,
+            )
+            head = _WILDCARDS.split(keyword, 1)[0]
+            candidates = self._substring_candidates(max(_WILDCARDS.split(keyword), key=len))
+            is_prefix = lambda i: pattern.match(keys[i]) is not None
+            contains = lambda i: pattern.search(keys[i]) is not None
+        else:
+            head = keyword
+            candidates = self._substring_candidates(keyword)
+            is_prefix = lambda i: True
+            contains = lambda i: keyword in keys[i]
+
+        lo = bisect_left(keys, head)
+        hi = bisect_left(keys, head + "\U0010ffff", lo)
+        prefix_candidates = candidates[np.searchsorted(candidates, lo):np.searchsorted(candidates, hi)]
+
+        hits: List[int] = []
+        n_rows = 0
+
+        def collect(ids, accept) -> bool:
+            nonlocal n_rows
+            for start in range(0, len(ids), SCAN_BATCH):
+                for i in ids[start:start + SCAN_BATCH].tolist():
+                    if not accept(i):
+                        continue
+                    hits.append(i)
+                    n_rows += int(self.key_indptr[i + 1] - self.key_indptr[i])
+                    if n_rows >= limit:
+                        return True
+            return False
+
+        if collect(prefix_candidates, is_prefix):
+            return hits
+        collect(candidates, lambda i: not (lo <= i < hi and is_prefix(i)) and contains(i))
+        return hits
+
+    def search(self, keyword: str, limit: int = 20) -> pd.DataFrame:
+        """
+        与 search_alias 返回格式一致：gene_alias 表中匹配的行，最多 limit 行。
+        """
+        hits = self.search_keys(keyword, limit)
+        if not hits:
+            return self.table.iloc[:0].copy()
+
+        rows = np.concatenate([
+            self.key_rows[self.key_indptr[i]:self.key_indptr[i + 1]] for i in hits
+        ])[:limit]
+        return self.table.iloc[rows].reset_index(drop=True)
+
+
+def get_alias_index() -> AliasIndex:
+    """
+    获取进程内共享的 AliasIndex，第一次调用时读取整张 gene_alias 表并构建。
+    """
+    global _INDEX
+
+    if _INDEX is not None:
+        return _INDEX
+
+    with _INDEX_LOCK:
+        if _INDEX is None:
+            # 延迟导入：只有搜索时才需要数据库
+            from utils.db_query import get_gene_alias_table
+
+            _INDEX = AliasIndex(get_gene_alias_table())
+        return _INDEX
+
+
+def clear_alias_index_cache() -> None:
+    global _INDEX
+
+    with _INDEX_LOCK:
+        _INDEX = None
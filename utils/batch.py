@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+
+"""
+多列表（多个 contrast）批量富集的公共工具
+
+GO / KEGG 的批量接口都接收 {contrast 名称: 基因列表}，
+结果表在第一列加上 contrast 后按输入顺序堆叠。
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Sequence
+
+import pandas as pd
+
+
+def split_contrasts(gene_lists: Dict[str, List[str]], n_chunks: int) -> List[Dict[str, List[str]]]:
+    """
+    按输入顺序把 contrast 切成最多 n_chunks 个连续分组，拼回去顺序不变。
+    """
+    names = list(gene_lists)
+    n_chunks = max(1, min(n_chunks, len(names)))
+    size, extra = divmod(len(names), n_chunks)
+
+    chunks = []
+    start = 0
+    for i in range(n_chunks):
+        end = start + size + (1 if i < extra else 0)
+        chunks.append({name: gene_lists[name] for name in names[start:end]})
+        start = end
+    return chunks
+
+
+def run_contrast_chunks(
+    batch_func: Callable[..., Sequence[pd.DataFrame]],
+    gene_lists: Dict[str, List[str]],
+    n_jobs: int,
+    **kwargs: Any,
+) -> List[pd.DataFrame]:
+    """
+    在进程池中对每个分组调用 batch_func(分组, n_jobs=1, **kwargs)，
+    再把各分组返回的同位置表格依次拼接。
+
+    batch_func 必须是模块级函数（需要能被 pickle）。
+    """
+    chunks = split_contrasts(gene_lists, n_jobs)
+
+    with ProcessPoolExecutor(max_workers=len(chunks)) as executor:
+        futures = [executor.submit(batch_func, chunk, n_jobs=1, **kwargs) for chunk in chunks]
+        parts = [f.result() for f in futures]
+
+    return [
+        stack_frames([part[i] for part in parts])
+        for i in range(len(parts[0]))
+    ]
+
+
+def with_contrast(df: pd.DataFrame, contrast: str) -> pd.DataFrame:
+    """
+    在第一列插入 contrast 名称。
+    """
+    df = df.copy()
+    df.insert(0, "contrast", contrast)
+    return df
+
+
+def stack_frames(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    """
+    拼接结果表，跳过没有任何列的空表；全部为空时返回空表。
+    """
+    frames = [df for df in frames if len(df.columns)]
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
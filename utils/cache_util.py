@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+
+"""
+进程内缓存的公共部分
+
+1. DerivedCache：按源对象缓存由它派生的结构（homoeolog 合并后的 GOIndex / KeggIndex、
+   沿 DAG 传递后的 GOIndex 等）。源对象是进程内共享的索引，按 id() 查找，
+   同时保存源对象本身，既防止 id 被复用，也能在命中时确认是同一个对象；
+   构建在锁外进行，只有同一个源对象的并发请求会互相等待。
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Tuple
+
+
+# 源索引重建后旧对象不再使用，只保留最近几个
+DEFAULT_MAX_DERIVED = 8
+
+
+class DerivedCache:
+    """
+    source -> build(source) 的 LRU 缓存，线程安全。
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_DERIVED):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[int, Tuple[object, object]]" = OrderedDict()
+        self._building: Dict[int, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def _lookup(self, key: int, source: object) -> Tuple[bool, object]:
+        hit = self._entries.get(key)
+        if hit is None or hit[0] is not source:
+            return False, None
+        self._entries.move_to_end(key)
+        return True, hit[1]
+
+    def get(self, source: object, build: Callable[[object], object]) -> object:
+        """
+        返回 build(source)，同一个 source 只构建一次。
+        """
+        key = id(source)
+        with self._lock:
+            found, result = self._lookup(key, source)
+            if found:
+                return result
+            key_lock = self._building.setdefault(key, threading.Lock())
+
+        with key_lock:
+            with self._lock:
+                found, result = self._lookup(key, source)
+            if found:
+                return result
+
+            try:
+                result = build(source)
+                with self._lock:
+                    self._entries[key] = (source, result)
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+            finally:
+                with self._lock:
+                    self._building.pop(key, None)
+
+            return result
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
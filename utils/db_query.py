@@ -1,13 +1,19 @@
 # -*- coding: utf-8 -*-
 
 import json
-import re
 import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Optional, Any
+from typing import Optional, Any, Dict, Iterable, List, Tuple
 
 import pandas as pd
 
+from utils.gene_id import parse_gene_id
+from utils.shard_router import ShardRouter
+
 
 # ============================================================
 # 项目路径与分库 manifest
@@ -32,7 +38,47 @@ def _load_manifest() -> dict:
         return json.load(f)
 
 
-MANIFEST = _load_manifest()
+# manifest 编译成的路由表（见 utils/shard_router.py）。
+# 导入本模块时不读取 manifest.json，第一次查询时才加载并检查分库文件是否齐全，
+# 这样只用到富集分析等功能的进程不需要为数据库路由付出启动时间。
+_ROUTER: Optional[ShardRouter] = None
+_ROUTER_LOCK = threading.Lock()
+
+
+def _get_router() -> ShardRouter:
+    global _ROUTER
+
+    if _ROUTER is not None:
+        return _ROUTER
+
+    with _ROUTER_LOCK:
+        if _ROUTER is None:
+            _ROUTER = ShardRouter(_load_manifest(), PROJECT_ROOT)
+        return _ROUTER
+
+
+def get_manifest() -> dict:
+    """
+    data/db/manifest.json 的内容（第一次调用时加载）。
+    """
+    return _get_router().manifest
+
+
+def __getattr__(name: str):
+    # 兼容旧代码直接访问 db_query.MANIFEST
+    if name == "MANIFEST":
+        return get_manifest()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# SQLite 单条语句默认最多 999 个参数，批量 IN (...) 查询按这个大小分块
+SQL_IN_CHUNK_SIZE = 900
+
+# 连接池：每个分库最多保留的空闲连接数，以及空闲连接的最长保留时间（秒）
+POOL_MAX_IDLE_PER_DB = 4
+POOL_MAX_IDLE_SECONDS = 600
+
+# 批量查询时并行读取分库的线程数（各分库是独立文件，可并行）
+FETCH_MAX_WORKERS = 8
 
 
 # ============================================================
@@ -48,17 +94,9 @@ def _quote_ident(name: str) -> str:
 
 def _normalize_input_id(input_id: Any) -> str:
     """
-    清理用户输入的基因号。
+    清理用户输入的基因号（见 utils/gene_id.py）。
     """
-    if input_id is None:
-        return ""
-
-    s = str(input_id).strip()
-
-    # 如果用户从 FASTA header 复制了 >gene_id|xxx，只取第一个字段
-    s = s.lstrip(">").split("|")[0].strip()
-
-    return s
+    return parse_gene_id(input_id).gene_id
 
 
 def _remove_transcript_suffix(gene_id: str) -> str:
@@ -67,8 +105,7 @@ def _remove_transcript_suffix(gene_id: str) -> str:
     例如：
     TraesCS5B02G233300.1 -> TraesCS5B02G233300
     """
-    gene_id = _normalize_input_id(gene_id)
-    return re.sub(r"\.\d+$", "", gene_id)
+    return parse_gene_id(gene_id).base_id
 
 
 def parse_chr_from_gene_id(gene_id: Any) -> str:
@@ -80,31 +117,137 @@ def parse_chr_from_gene_id(gene_id: Any) -> str:
     TraesCS5B02G233300.1
     TraesFLD5B01G105200
     """
-    s = _normalize_input_id(gene_id)
-
-    m = re.search(r"TraesCS([1-7][ABD])", s)
-    if m:
-        return m.group(1)
-
-    m = re.search(r"TraesFLD([1-7][ABD])", s)
-    if m:
-        return m.group(1)
-
-    return "unknown"
+    return parse_gene_id(gene_id).chr
 
 
 def _connect_db(db_path: Path) -> sqlite3.Connection:
     """
-    获取 SQLite 连接。
+    获取 SQLite 只读连接（mode=ro）。
     """
     if not db_path.exists():
         raise FileNotFoundError(f"找不到数据库文件: {db_path}")
 
-    conn = sqlite3.connect(str(db_path), check_same_thread=False)
+    conn = sqlite3.connect(
+        db_path.resolve().as_uri() + "?mode=ro",
+        uri=True,
+        check_same_thread=False,
+    )
     conn.execute("PRAGMA query_only = ON")
     return conn
 
 
+class _ConnectionPool:
+    """
+    进程级只读连接池，按分库路径缓存连接。
+
+    - 连接以“借出/归还”的方式使用，同一时刻一个连接只被一个线程使用，
+      适配 Streamlit 每个会话一个线程的模型；
+    - 每个分库最多保留 max_idle_per_db 个空闲连接；
+    - 空闲超过 max_idle_seconds 的连接会被关闭；
+    - hits / misses 记录复用连接和新建连接的次数。
+    """
+
+    def __init__(
+        self,
+        max_idle_per_db: int = POOL_MAX_IDLE_PER_DB,
+        max_idle_seconds: float = POOL_MAX_IDLE_SECONDS,
+    ):
+        self.max_idle_per_db = max_idle_per_db
+        self.max_idle_seconds = max_idle_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._idle: Dict[Path, List[Tuple[sqlite3.Connection, float]]] = {}
+
+    def acquire(self, db_path: Path) -> sqlite3.Connection:
+        self.evict_idle()
+
+        with self._lock:
+            idle = self._idle.get(db_path)
+            if idle:
+                self.hits += 1
+                return idle.pop()[0]
+            self.misses += 1
+
+        return _connect_db(db_path)
+
+    def release(self, db_path: Path, conn: sqlite3.Connection) -> None:
+        with self._lock:
+            idle = self._idle.setdefault(db_path, [])
+            if len(idle) < self.max_idle_per_db:
+                idle.append((conn, time.monotonic()))
+                return
+
+        conn.close()
+
+    @contextmanager
+    def connection(self, db_path: Path):
+        conn = self.acquire(db_path)
+        ok = False
+        try:
+            yield conn
+            ok = True
+        finally:
+            # 查询出错或被中断时不确定连接状态，直接关闭，不再放回池中
+            if ok:
+                self.release(db_path, conn)
+            else:
+                conn.close()
+
+    def evict_idle(self) -> int:
+        """
+        关闭空闲超时的连接，返回关闭的数量。
+        """
+        deadline = time.monotonic() - self.max_idle_seconds
+        expired = []
+
+        with self._lock:
+            for db_path, idle in self._idle.items():
+                keep = [(c, t) for c, t in idle if t >= deadline]
+                expired.extend(c for c, t in idle if t < deadline)
+                self._idle[db_path] = keep
+
+        for conn in expired:
+            conn.close()
+
+        return len(expired)
+
+    def close_all(self) -> None:
+        with self._lock:
+            idle = self._idle
+            self._idle = {}
+
+        for conns in idle.values():
+            for conn, _ in conns:
+                conn.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "idle_connections": sum(len(v) for v in self._idle.values()),
+                "databases": len(self._idle),
+            }
+
+
+_POOL = _ConnectionPool()
+
+
+def close_all() -> None:
+    """
+    关闭连接池中全部空闲连接。
+    """
+    _POOL.close_all()
+
+
+def get_pool_stats() -> dict:
+    """
+    返回连接池的命中 / 未命中次数和当前空闲连接数。
+    """
+    return _POOL.stats()
+
+
 def get_connection(db_file: Optional[str] = None) -> sqlite3.Connection:
     """
     兼容旧代码的连接函数。
@@ -125,13 +268,7 @@ def _get_table_info(table: str) -> dict:
     """
     从 manifest 中获得某个表的拆分信息。
     """
-    try:
-        return MANIFEST["tables"][table]
-    except KeyError:
-        raise KeyError(
-            f"manifest.json 中找不到表 {table}。\n"
-            f"请检查 data/db/manifest.json 是否包含该表。"
-        )
+    return _get_router().table_info(table)
 
 
 def _get_table_db_path(table: str, gene_id: Optional[str] = None) -> Path:
@@ -144,45 +281,16 @@ def _get_table_db_path(table: str, gene_id: Optional[str] = None) -> Path:
     by_chr:
         data/db/gene_promoter_sequence/gene_promoter_sequence_5B.db
     """
-    info = _get_table_info(table)
-    strategy = info.get("strategy")
-
-    if strategy == "whole_table":
-        return PROJECT_ROOT / info["path"]
-
-    if strategy in {"by_chr", "by_chr_from_gene_id"}:
-        if gene_id is None:
-            raise ValueError(f"表 {table} 是按染色体拆分的，必须提供 gene_id。")
-
-        chr_name = parse_chr_from_gene_id(gene_id)
-        shards = info.get("shards", {})
-
-        # 兼容 shards 是 dict 的情况：
-        # "shards": {"5B": {"path": "..."}}
-        if isinstance(shards, dict):
-            if chr_name in shards:
-                return PROJECT_ROOT / shards[chr_name]["path"]
-
-            if "unknown" in shards:
-                return PROJECT_ROOT / shards["unknown"]["path"]
-
-        # 兼容 shards 是 list 的情况：
-        # "shards": [{"chr": "5B", "path": "..."}]
-        if isinstance(shards, list):
-            for shard in shards:
-                if shard.get("chr") == chr_name:
-                    return PROJECT_ROOT / shard["path"]
-
-            for shard in shards:
-                if shard.get("chr") == "unknown":
-                    return PROJECT_ROOT / shard["path"]
+    return _get_router().route(table, gene_id)
 
-        raise FileNotFoundError(
-            f"找不到表 {table} 对应染色体 {chr_name} 的分库。\n"
-            f"gene_id = {gene_id}"
-        )
 
-    raise ValueError(f"未知拆分策略: table={table}, strategy={strategy}")
+def _iter_chunks(items: list, size: Optional[int] = None):
+    """
+    把列表按固定大小切块，用于 IN (...) 批量查询。
+    """
+    size = size or SQL_IN_CHUNK_SIZE
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
 
 
 def _fetch_df(
@@ -195,12 +303,191 @@ def _fetch_df(
     通用查询函数，自动根据 table/gene_id 路由到正确的小数据库。
     """
     db_path = _get_table_db_path(table, gene_id_for_route)
-    conn = _connect_db(db_path)
 
-    try:
+    with _POOL.connection(db_path) as conn:
         return pd.read_sql_query(sql, conn, params=params)
-    finally:
-        conn.close()
+
+
+def _fetch_df_in(
+    table: str,
+    sql_template: str,
+    values: List[Any],
+    gene_id_for_route: Optional[str] = None,
+) -> pd.DataFrame:
+    """
+    批量 IN (...) 查询：values 自动分块，所有分块共用同一个连接。
+
+    sql_template 中用 {placeholders} 表示 IN 列表的位置，例如：
+    SELECT * FROM gene_core WHERE primary_gene_id IN ({placeholders})
+    """
+    values = list(dict.fromkeys(values))
+    if not values:
+        return pd.DataFrame()
+
+    db_path = _get_table_db_path(table, gene_id_for_route)
+
+    with _POOL.connection(db_path) as conn:
+        return _read_sql_in_chunks(conn, sql_template, values)
+
+
+def _read_sql_in_chunks(
+    conn: sqlite3.Connection,
+    sql_template: str,
+    values: List[Any],
+) -> pd.DataFrame:
+    """
+    在同一个连接上按块执行 IN (...) 查询并合并结果。
+    """
+    frames = []
+    for chunk in _iter_chunks(values):
+        sql = sql_template.format(placeholders=", ".join(["?"] * len(chunk)))
+        frames.append(pd.read_sql_query(sql, conn, params=tuple(chunk)))
+
+    return pd.concat(frames, ignore_index=True)
+
+
+def _get_gene_column(table: str) -> str:
+    """
+    表中用于按基因过滤的字段，默认 primary_gene_id。
+    """
+    return _get_table_info(table).get("gene_column") or "primary_gene_id"
+
+
+def _build_in_sql(
+    table: str,
+    columns: Optional[List[str]] = None,
+    extra_where: Optional[str] = None,
+    order_by: Optional[str] = None,
+    gene_column: Optional[str] = None,
+) -> str:
+    """
+    生成按基因号 IN (...) 过滤的查询模板，IN 列表位置为 {placeholders}。
+    """
+    gene_column = gene_column or _get_gene_column(table)
+    select_cols = ", ".join(_quote_ident(c) for c in columns) if columns else "*"
+
+    sql_template = (
+        f"SELECT {select_cols} FROM {_quote_ident(table)} "
+        f"WHERE {_quote_ident(gene_column)} IN ({{placeholders}})"
+    )
+    if extra_where:
+        sql_template += f" AND ({extra_where})"
+    if order_by:
+        sql_template += f" ORDER BY {order_by}"
+
+    return sql_template
+
+
+def _iter_shard_chunks(
+    conn: sqlite3.Connection,
+    sql_template: str,
+    ids: List[str],
+    extra_params: tuple = (),
+    chunk_size: Optional[int] = None,
+):
+    """
+    在一个分库连接上逐块执行 IN 查询，逐块返回 DataFrame。
+    """
+    chunk_size = min(chunk_size or SQL_IN_CHUNK_SIZE, SQL_IN_CHUNK_SIZE - len(extra_params))
+
+    for chunk in _iter_chunks(ids, chunk_size):
+        sql = sql_template.format(placeholders=", ".join(["?"] * len(chunk)))
+        yield pd.read_sql_query(sql, conn, params=tuple(chunk) + tuple(extra_params))
+
+
+def get_table_columns(table: str) -> List[str]:
+    """
+    表的列名（只执行 LIMIT 0 查询，不读取数据）。分库的列相同，读取第一个存在的分库。
+    """
+    for shard in _get_router().files:
+        if shard.table == table and shard.path.exists():
+            with _POOL.connection(shard.path) as conn:
+                cursor = conn.execute(f"SELECT * FROM {table} LIMIT 0")
+                return [d[0] for d in cursor.description]
+    return []
+
+
+def get_table_db_files(table: str) -> List[str]:
+    """
+    表对应的全部分库文件路径（manifest 中登记的，不检查是否存在）。
+    """
+    return [str(shard.path) for shard in _get_router().files if shard.table == table]
+
+
+def fetch_by_genes(
+    table: str,
+    gene_ids: Iterable[str],
+    columns: Optional[List[str]] = None,
+    extra_where: Optional[str] = None,
+    extra_params: tuple = (),
+    order_by: Optional[str] = None,
+    gene_column: Optional[str] = None,
+) -> pd.DataFrame:
+    """
+    按基因号批量查询任意表。
+
+    - 基因号经 ShardRouter.route_many 分到对应分库，每个分库只打开一次；
+    - 每个分库内按块执行 IN (...) 查询；
+    - by_chr 表的多个分库用线程池并行读取。
+
+    参数：
+    columns:
+        只返回这些列，不传则返回全部列
+    extra_where:
+        追加的过滤条件，例如 "sequence_type = ?"，参数放在 extra_params
+    order_by:
+        每个分库内部的排序方式
+    gene_column:
+        过滤字段，不传则使用 manifest 中的 gene_column 或 primary_gene_id
+
+    注意：gene_ids 需要是已经解析好的主键（如 primary_gene_id），
+    这里不做别名转换。
+    """
+    sql_template = _build_in_sql(table, columns, extra_where, order_by, gene_column)
+    groups = _get_router().route_many(table, gene_ids)
+
+    def fetch_shard(db_path: Path, ids: List[str]) -> pd.DataFrame:
+        with _POOL.connection(db_path) as conn:
+            frames = list(_iter_shard_chunks(conn, sql_template, ids, extra_params))
+        return pd.concat(frames, ignore_index=True)
+
+    if not groups:
+        return pd.DataFrame()
+
+    if len(groups) == 1:
+        frames = [fetch_shard(*next(iter(groups.items())))]
+    else:
+        max_workers = min(FETCH_MAX_WORKERS, len(groups))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            frames = list(executor.map(lambda item: fetch_shard(*item), groups.items()))
+
+    return pd.concat(frames, ignore_index=True)
+
+
+def iter_by_genes(
+    table: str,
+    gene_ids: Iterable[str],
+    columns: Optional[List[str]] = None,
+    extra_where: Optional[str] = None,
+    extra_params: tuple = (),
+    order_by: Optional[str] = None,
+    gene_column: Optional[str] = None,
+    chunk_size: Optional[int] = None,
+):
+    """
+    fetch_by_genes 的流式版本：逐个分库、逐块返回 DataFrame。
+
+    同一时刻内存中只有一个块，适合导出整条染色体的序列等大结果。
+    参数含义与 fetch_by_genes 相同，chunk_size 为每块的基因数。
+    """
+    sql_template = _build_in_sql(table, columns, extra_where, order_by, gene_column)
+    groups = _get_router().route_many(table, gene_ids)
+
+    for db_path, ids in groups.items():
+        with _POOL.connection(db_path) as conn:
+            for df in _iter_shard_chunks(conn, sql_template, ids, extra_params, chunk_size):
+                if not df.empty:
+                    yield df
 
 
 # ============================================================
@@ -213,17 +500,10 @@ def get_primary_gene_id(input_id: str, db_file: Optional[str] = None) -> Optiona
 
     db_file 参数保留是为了兼容旧 app.py，不再实际使用。
     """
-    input_id = _normalize_input_id(input_id)
-    if not input_id:
+    candidates = _id_candidates(input_id)
+    if not candidates:
         return None
 
-    input_id_no_suffix = _remove_transcript_suffix(input_id)
-
-    candidates = []
-    for x in [input_id, input_id_no_suffix]:
-        if x and x not in candidates:
-            candidates.append(x)
-
     # 1. 先查 alias 表
     for x in candidates:
         sql = """
@@ -263,6 +543,89 @@ def get_primary_gene_id(input_id: str, db_file: Optional[str] = None) -> Optiona
     return None
 
 
+def _id_candidates(input_id: Any) -> List[str]:
+    """
+    一个输入 ID 的查询候选：原始 ID 在前，去掉 transcript 后缀的在后。
+    """
+    parsed = parse_gene_id(input_id)
+    if not parsed.gene_id:
+        return []
+
+    candidates = [parsed.gene_id]
+    if parsed.base_id and parsed.base_id != parsed.gene_id:
+        candidates.append(parsed.base_id)
+
+    return candidates
+
+
+def resolve_primary_gene_ids(input_ids: Iterable[Any]) -> Dict[Any, Optional[str]]:
+    """
+    批量版 get_primary_gene_id。
+
+    返回 {输入ID: primary_gene_id}，找不到的输入对应 None。
+
+    查询优先级与 get_primary_gene_id 完全一致：
+    1. gene_alias.alias_value
+    2. gene_core.primary_gene_id
+    3. gene_core.gene_id_v3
+
+    每一级只对上一级没有解析出来的候选 ID 做一次分块 IN 查询，
+    而不是每个基因单独查询。
+    """
+    input_ids = list(dict.fromkeys(input_ids))
+    candidates = {x: _id_candidates(x) for x in input_ids}
+    result: Dict[Any, Optional[str]] = {x: None for x in input_ids}
+
+    lookups = [
+        (
+            "gene_alias",
+            """
+            SELECT alias_value AS lookup_id, primary_gene_id
+            FROM gene_alias
+            WHERE alias_value IN ({placeholders})
+            """,
+        ),
+        (
+            "gene_core",
+            """
+            SELECT primary_gene_id AS lookup_id, primary_gene_id
+            FROM gene_core
+            WHERE primary_gene_id IN ({placeholders})
+            """,
+        ),
+        (
+            "gene_core",
+            """
+            SELECT gene_id_v3 AS lookup_id, primary_gene_id
+            FROM gene_core
+            WHERE gene_id_v3 IN ({placeholders})
+            """,
+        ),
+    ]
+
+    for table, sql_template in lookups:
+        pending = [x for x in input_ids if result[x] is None and candidates[x]]
+        if not pending:
+            break
+
+        values = [c for x in pending for c in candidates[x]]
+        df = _fetch_df_in(table, sql_template, values)
+        if df.empty:
+            continue
+
+        # 与单个查询的 LIMIT 1 一致：同一个 lookup_id 只取第一条
+        df = df.dropna(subset=["primary_gene_id"]).drop_duplicates(subset=["lookup_id"])
+        hit = dict(zip(df["lookup_id"], df["primary_gene_id"]))
+
+        for x in pending:
+            for c in candidates[x]:
+                if c in hit:
+                    result[x] = hit[c]
+                    break
+
+    return result
+
+
 # ============================================================
 # 中国春 gene core / annotation / transcript
 # ============================================================
@@ -316,6 +679,65 @@ def get_transcripts(input_id: str, db_file: Optional[str] = None) -> pd.DataFram
     return _fetch_df("transcript_core", sql, (primary_gene_id,))
 
 
+def get_gene_annotation_table(input_ids: Iterable[Any]) -> pd.DataFrame:
+    """
+    批量获取基因注释总表。
+
+    返回列：
+    input_gene_id, primary_gene_id, gene_id_v3, description_en, description_zh
+
+    每个输入一行并保持输入顺序，找不到的基因 primary_gene_id 为空。
+    ID 只解析一次，gene_core 和 gene_annotation 各查询一次后按主键合并。
+    """
+    input_ids = list(input_ids)
+    resolved = resolve_primary_gene_ids(input_ids)
+
+    result = pd.DataFrame({
+        "input_gene_id": input_ids,
+        "primary_gene_id": [resolved.get(x) for x in input_ids],
+    })
+
+    primary_ids = [x for x in dict.fromkeys(result["primary_gene_id"]) if x is not None]
+
+    core_df = fetch_by_genes(
+        "gene_core",
+        primary_ids,
+        columns=["primary_gene_id", "gene_id_v3"],
+        gene_column="primary_gene_id",
+    )
+    anno_df = fetch_by_genes(
+        "gene_annotation",
+        primary_ids,
+        columns=["primary_gene_id", "description_en", "description_zh"],
+        gene_column="primary_gene_id",
+    )
+
+    if core_df.empty:
+        core_df = pd.DataFrame(columns=["primary_gene_id", "gene_id_v3"])
+    if anno_df.empty:
+        anno_df = pd.DataFrame(columns=["primary_gene_id", "description_en", "description_zh"])
+
+    # 与单个查询一致：每个主键只取第一条记录
+    result = result.merge(
+        core_df.drop_duplicates(subset=["primary_gene_id"]),
+        on="primary_gene_id",
+        how="left",
+    )
+    result = result.merge(
+        anno_df.drop_duplicates(subset=["primary_gene_id"]),
+        on="primary_gene_id",
+        how="left",
+    )
+
+    return result[[
+        "input_gene_id",
+        "primary_gene_id",
+        "gene_id_v3",
+        "description_en",
+        "description_zh",
+    ]]
+
+
 # ============================================================
 # 序列 / 启动子 / 结构
 # ============================================================
@@ -389,6 +811,36 @@ def get_promoter(input_id: str, db_file: Optional[str] = None) -> pd.DataFrame:
     )
 
 
+def _attach_input_ids(resolved: Dict[Any, Optional[str]], df: pd.DataFrame) -> pd.DataFrame:
+    """
+    把按主键查询到的结果与输入 ID 对齐，每个主键只保留第一条记录。
+    """
+    if df.empty:
+        return pd.DataFrame()
+
+    id_map = pd.DataFrame(
+        [(k, v) for k, v in resolved.items() if v is not None],
+        columns=["input_gene_id", "primary_gene_id"],
+    )
+    df = df.drop_duplicates(subset=["primary_gene_id"])
+    return id_map.merge(df, on="primary_gene_id", how="inner")
+
+
+def get_promoters(input_ids: Iterable[Any]) -> pd.DataFrame:
+    """
+    批量获取中国春启动子序列。
+
+    返回的每一行对应一个能查到启动子的输入基因，
+    第一列 input_gene_id 为原始输入。
+    """
+    resolved = resolve_primary_gene_ids(input_ids)
+    promoter_df = fetch_by_genes(
+        "gene_promoter_sequence",
+        [x for x in resolved.values() if x is not None],
+    )
+    return _attach_input_ids(resolved, promoter_df)
+
+
 def get_gene_structure(
     input_id: str,
     transcript_id: Optional[str] = None,
@@ -436,60 +888,97 @@ def get_gene_structure(
 # alias 搜索
 # ============================================================
 
-def search_alias(
-    keyword: str,
-    limit: int = 20,
-    db_file: Optional[str] = None,
-) -> pd.DataFrame:
+def get_gene_alias_table() -> pd.DataFrame:
+    """
+    读取整张 gene_alias 表（用于构建内存搜索索引）。
     """
-    模糊搜索基因号。
+    return _fetch_df("gene_alias", "SELECT * FROM gene_alias")
+
+
+def search_alias(keyword: str, limit: int = 20) -> pd.DataFrame:
+    """
+    模糊搜索基因号（不区分大小写的前缀 / 子串匹配）。
+
+    使用进程内的 AliasIndex（见 utils/alias_index.py），第一次调用时读取整张
+    gene_alias 表建索引，之后每次查询不再访问数据库。
+    前缀匹配排在前面，其他子串匹配在后，各自按字典序排列。
     """
+    # 延迟导入，避免与 alias_index 循环引用
+    from utils.alias_index import get_alias_index
+
     keyword = _normalize_input_id(keyword)
     if not keyword:
         return pd.DataFrame()
 
-    keyword_like = f"%{keyword}%"
     limit = max(1, min(int(limit), 500))
-
-    sql = f"""
-    SELECT *
-    FROM gene_alias
-    WHERE alias_value LIKE ?
-    LIMIT {limit}
-    """
-    return _fetch_df("gene_alias", sql, (keyword_like,))
+    return get_alias_index().search(keyword, limit)
 
 
 # ============================================================
 # bundle
 # ============================================================
 
+# 各个 bundle 表对应的数据表和排序方式，与单基因查询函数保持一致
+BUNDLE_TABLES = {
+    "gene_core": ("gene_core", None),
+    "gene_annotation": ("gene_annotation", None),
+    "transcripts": ("transcript_core", "primary_gene_id, is_canonical DESC, transcript_id ASC"),
+    "sequences": ("gene_sequence_resource", "primary_gene_id, transcript_id, sequence_type"),
+    "promoter": ("gene_promoter_sequence", None),
+    "structure": ("gene_structure_feature", "primary_gene_id, transcript_id, feature_order, start"),
+}
+
+
+def get_gene_bundles(input_ids: Iterable[Any]) -> dict:
+    """
+    批量返回一组基因的常用信息。
+
+    - 全部输入只做一次 ID 解析（resolve_primary_gene_ids）；
+    - 每个表通过 fetch_by_genes 按分库分组，每个分库只打开一次；
+    - 返回的每个 DataFrame 都带有 primary_gene_id 列，可按主键拆分。
+
+    返回：
+    {
+        "primary_gene_ids": {输入ID: primary_gene_id 或 None},
+        "gene_core": DataFrame,
+        "gene_annotation": DataFrame,
+        "transcripts": DataFrame,
+        "sequences": DataFrame,
+        "promoter": DataFrame,
+        "structure": DataFrame,
+    }
+    """
+    resolved = resolve_primary_gene_ids(input_ids)
+    primary_ids = [x for x in dict.fromkeys(resolved.values()) if x is not None]
+
+    bundles = {"primary_gene_ids": resolved}
+
+    for key, (table, order_by) in BUNDLE_TABLES.items():
+        if primary_ids:
+            bundles[key] = fetch_by_genes(
+                table,
+                primary_ids,
+                order_by=order_by,
+                gene_column="primary_gene_id",
+            )
+        else:
+            bundles[key] = pd.DataFrame()
+
+    return bundles
+
+
 def get_full_gene_bundle(input_id: str, db_file: Optional[str] = None) -> dict:
     """
     一次性返回一个基因的常用信息。
     """
-    primary_gene_id = get_primary_gene_id(input_id)
+    bundles = get_gene_bundles([input_id])
+    primary_gene_id = bundles["primary_gene_ids"].get(input_id)
 
-    if primary_gene_id is None:
-        return {
-            "primary_gene_id": None,
-            "gene_core": pd.DataFrame(),
-            "gene_annotation": pd.DataFrame(),
-            "transcripts": pd.DataFrame(),
-            "sequences": pd.DataFrame(),
-            "promoter": pd.DataFrame(),
-            "structure": pd.DataFrame(),
-        }
-
-    return {
-        "primary_gene_id": primary_gene_id,
-        "gene_core": get_gene_core(primary_gene_id),
-        "gene_annotation": get_gene_annotation(primary_gene_id),
-        "transcripts": get_transcripts(primary_gene_id),
-        "sequences": get_sequences(primary_gene_id, None),
-        "promoter": get_promoter(primary_gene_id),
-        "structure": get_gene_structure(primary_gene_id, None),
-    }
+    result = {"primary_gene_id": primary_gene_id}
+    for key in BUNDLE_TABLES:
+        result[key] = bundles[key]
+
+    return result
 
 
 # ============================================================
@@ -531,6 +1020,61 @@ def get_fielder_all_hits(input_id: str, db_file: Optional[str] = None) -> pd.Dat
     return _fetch_df("homolog_map", sql, (primary_gene_id,))
 
 
+def _attach_homolog_hits(
+    table: str,
+    resolved: Dict[Any, Optional[str]],
+    df: pd.DataFrame,
+    best_only: bool,
+) -> pd.DataFrame:
+    """
+    把按 cs_gene_id 查询到的同源结果与输入 ID 对齐，保持输入顺序；
+    best_only 时每个中国春基因只保留排序后的第一条，与单个查询的 best_hit.iloc[0] 一致。
+    没有结果时返回带完整列名（input_gene_id + 表的列）的空表，方便分批写出。
+    """
+    if len(df.columns) == 0:
+        df = pd.DataFrame(columns=get_table_columns(table) or ["cs_gene_id"])
+
+    if best_only:
+        df = df.drop_duplicates(subset=["cs_gene_id"])
+
+    id_map = pd.DataFrame(
+        [(k, v) for k, v in resolved.items() if v is not None],
+        columns=["input_gene_id", "cs_gene_id"],
+    )
+    return id_map.merge(df, on="cs_gene_id", how="inner")
+
+
+def _get_homolog_hits(table: str, input_ids: Iterable[Any], best_only: bool) -> pd.DataFrame:
+    resolved = resolve_primary_gene_ids(input_ids)
+    primary_ids = [x for x in dict.fromkeys(resolved.values()) if x is not None]
+
+    if best_only:
+        extra_where = "is_best_hit = '1'"
+        order_by = "cs_gene_id, CAST(rank_within_cs AS INTEGER)"
+    else:
+        extra_where = None
+        order_by = "cs_gene_id, CAST(rank_within_cs AS INTEGER), CAST(priority_score AS REAL) DESC"
+
+    df = fetch_by_genes(
+        table,
+        primary_ids,
+        extra_where=extra_where,
+        order_by=order_by,
+        gene_column="cs_gene_id",
+    )
+    return _attach_homolog_hits(table, resolved, df, best_only)
+
+
+def get_fielder_hits(input_ids: Iterable[Any], best_only: bool = False) -> pd.DataFrame:
+    """
+    批量版 get_fielder_all_hits / get_fielder_best_hit。
+
+    第一列 input_gene_id 为原始输入，按输入顺序排列；
+    best_only=True 时每个输入只返回最可信的一条。
+    """
+    return _get_homolog_hits("homolog_map", input_ids, best_only)
+
+
 # ============================================================
 # Fielder 基因信息 / 启动子
 # ============================================================
@@ -577,6 +1121,20 @@ def get_fielder_promoter(input_id: str, db_file: Optional[str] = None) -> pd.Dat
     )
 
 
+def get_fielder_promoters(input_ids: Iterable[Any]) -> pd.DataFrame:
+    """
+    批量获取 Fielder 启动子序列。
+
+    input_ids 直接是 Fielder 基因号，第一列 input_gene_id 为原始输入。
+    """
+    resolved = {x: _remove_transcript_suffix(x) or None for x in input_ids}
+    promoter_df = fetch_by_genes(
+        "fielder_promoter_sequence",
+        [x for x in resolved.values() if x is not None],
+    )
+    return _attach_input_ids(resolved, promoter_df)
+
+
 # ============================================================
 # 中国春自身同源
 # ============================================================
@@ -616,6 +1174,37 @@ def get_cs_self_all_hits(input_id: str, db_file: Optional[str] = None) -> pd.Dat
     return _fetch_df("cs_self_homolog_map", sql, (primary_gene_id,))
 
 
+def get_cs_self_hits(input_ids: Iterable[Any], best_only: bool = False) -> pd.DataFrame:
+    """
+    批量版 get_cs_self_all_hits / get_cs_self_best_hit，返回格式同 get_fielder_hits。
+    """
+    return _get_homolog_hits("cs_self_homolog_map", input_ids, best_only)
+
+
+# 只把不同亚基因组之间的同源对（A/B/D homoeolog）视为同一组，
+# 同一亚基因组内的旁系同源不参与合并，避免基因家族被串成一个大组
+HOMOEOLOG_PAIR_WHERE = "same_subgenome = '0'"
+
+
+def get_cs_self_homolog_pairs(where: Optional[str] = HOMOEOLOG_PAIR_WHERE) -> pd.DataFrame:
+    """
+    一次性读取中国春自身同源对 (cs_gene_id, self_homolog_gene_id)，
+    用于构建 homoeolog 分组，不逐个基因查询。
+
+    where 为附加的 SQL 过滤条件，传 None 表示读取全部同源对。
+    """
+    sql = """
+    SELECT DISTINCT cs_gene_id, self_homolog_gene_id
+    FROM cs_self_homolog_map
+    WHERE cs_gene_id IS NOT NULL
+      AND self_homolog_gene_id IS NOT NULL
+    """
+    if where:
+        sql += f"  AND ({where})\n"
+
+    return _fetch_df("cs_self_homolog_map", sql)
+
+
 # ============================================================
 # 部署前自检
 # ============================================================
@@ -626,48 +1215,16 @@ def check_database_status() -> pd.DataFrame:
     """
     rows = []
 
-    for table, info in MANIFEST.get("tables", {}).items():
-        strategy = info.get("strategy")
-
-        if strategy == "whole_table":
-            path = PROJECT_ROOT / info["path"]
-            rows.append({
-                "table": table,
-                "strategy": strategy,
-                "shard": "",
-                "path": str(path),
-                "exists": path.exists(),
-                "size_mb": round(path.stat().st_size / 1024 / 1024, 2) if path.exists() else None,
-            })
-
-        elif strategy in {"by_chr", "by_chr_from_gene_id"}:
-            shards = info.get("shards", {})
-
-            if isinstance(shards, dict):
-                iterable = shards.items()
-                for shard_name, shard_info in iterable:
-                    path = PROJECT_ROOT / shard_info["path"]
-                    rows.append({
-                        "table": table,
-                        "strategy": strategy,
-                        "shard": shard_name,
-                        "path": str(path),
-                        "exists": path.exists(),
-                        "size_mb": round(path.stat().st_size / 1024 / 1024, 2) if path.exists() else None,
-                    })
-
-            elif isinstance(shards, list):
-                for shard_info in shards:
-                    shard_name = shard_info.get("chr", "")
-                    path = PROJECT_ROOT / shard_info["path"]
-                    rows.append({
-                        "table": table,
-                        "strategy": strategy,
-                        "shard": shard_name,
-                        "path": str(path),
-                        "exists": path.exists(),
-                        "size_mb": round(path.stat().st_size / 1024 / 1024, 2) if path.exists() else None,
-                    })
+    for f in _get_router().files:
+        exists = f.path.exists()
+        rows.append({
+            "table": f.table,
+            "strategy": f.strategy,
+            "shard": f.shard,
+            "path": str(f.path),
+            "exists": exists,
+            "size_mb": round(f.path.stat().st_size / 1024 / 1024, 2) if exists else None,
+        })
 
     return pd.DataFrame(rows)
 
@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+
+"""
+cDNA / CDS / protein FASTA 流式导出
+
+核心思路：
+1. 输入基因只做一次 ID 解析；
+2. 按 gene_sequence_resource 分库逐块读取序列，每个分库只打开一次；
+3. 一次遍历同时写出 cdna / cds / protein 三个文件；
+4. 写入 SpooledTemporaryFile（可选 gzip），超过阈值自动落盘，生成文件期间内存占用有上限。
+   注意 st.download_button 登记数据时会把文件整个读进内存，
+   所以在 Streamlit 中下载时，每个文件仍会在内存中完整保留一份。
+
+注意：FASTA 记录按分库（染色体）顺序输出，而不是按输入顺序。
+"""
+
+import gzip
+import io
+import tempfile
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+from utils.db_query import iter_by_genes, resolve_primary_gene_ids
+
+
+SEQUENCE_TYPES = ("cdna", "cds", "protein")
+
+# 单个临时文件在内存中最多保留的字节数，超过后自动写到磁盘
+SPOOL_MAX_BYTES = 32 * 1024 * 1024
+
+# 每次从分库读取的基因数，控制单块 DataFrame 的大小
+FASTA_CHUNK_GENES = 200
+
+
+def format_fasta_record(
+    input_gene_id: str,
+    primary_gene_id: str,
+    transcript_id: str,
+    sequence_type: str,
+    sequence: str,
+) -> str:
+    """
+    生成一条 FASTA 记录，header 格式与网页下载保持一致：
+    >输入基因号|统一主键|transcript_id|序列类型
+    """
+    header = f">{input_gene_id}|{primary_gene_id}|{transcript_id}|{sequence_type}"
+    return f"{header}\n{sequence}\n"
+
+
+def iter_sequence_records(
+    input_ids: Iterable[Any],
+    sequence_types: Tuple[str, ...] = SEQUENCE_TYPES,
+    resolved: Optional[Dict[Any, Optional[str]]] = None,
+) -> Iterator[Tuple[str, str, str, str, str]]:
+    """
+    逐条生成序列记录：
+    (input_gene_id, primary_gene_id, transcript_id, sequence_type, sequence)
+
+    resolved 可传入已经解析好的 {输入ID: primary_gene_id}，避免重复解析。
+    """
+    if resolved is None:
+        resolved = resolve_primary_gene_ids(input_ids)
+
+    inputs_by_primary: Dict[str, List[Any]] = {}
+    for input_id, primary_gene_id in resolved.items():
+        if primary_gene_id is not None:
+            inputs_by_primary.setdefault(primary_gene_id, []).append(input_id)
+
+    if not inputs_by_primary or not sequence_types:
+        return
+
+    chunks = iter_by_genes(
+        "gene_sequence_resource",
+        list(inputs_by_primary),
+        columns=["primary_gene_id", "transcript_id", "sequence_type", "sequence"],
+        extra_where="sequence_type IN ({})".format(", ".join(["?"] * len(sequence_types))),
+        extra_params=tuple(sequence_types),
+        order_by="primary_gene_id, transcript_id, sequence_type",
+        gene_column="primary_gene_id",
+        chunk_size=FASTA_CHUNK_GENES,
+    )
+
+    for df in chunks:
+        for primary_gene_id, tx_id, seq_type, seq in df.itertuples(index=False, name=None):
+            for input_id in inputs_by_primary[primary_gene_id]:
+                yield (
+                    input_id,
+                    primary_gene_id,
+                    "" if pd.isna(tx_id) else tx_id,
+                    seq_type,
+                    "" if pd.isna(seq) else seq,
+                )
+
+
+def build_promoter_outputs(
+    gene_ids: Iterable[Any],
+    promoter_df: pd.DataFrame,
+) -> Tuple[List[str], List[list], List[Any]]:
+    """
+    把批量查询到的启动子结果整理成 FASTA 记录和统计行。
+
+    promoter_df 第一列为 input_gene_id，每个输入基因最多一行。
+    """
+    fasta_records = []
+    summary_rows = []
+    failed_genes = []
+
+    if promoter_df.empty:
+        rows_by_input = {}
+    else:
+        rows_by_input = {
+            row["input_gene_id"]: row
+            for row in promoter_df.to_dict("records")
+        }
+
+    for input_gene_id in gene_ids:
+        row = rows_by_input.get(input_gene_id)
+
+        if row is None:
+            failed_genes.append(input_gene_id)
+            summary_rows.append([input_gene_id, "", "", "", "", "", 0])
+            continue
+
+        primary_id = row.get("primary_gene_id", "")
+        chrom = row.get("chromosome", "")
+        strand = row.get("strand", "")
+        promoter_start = row.get("promoter_start", "")
+        promoter_end = row.get("promoter_end", "")
+        promoter_length = row.get("promoter_length", "")
+        promoter_seq = row.get("promoter_sequence", "")
+
+        header = f">{input_gene_id}|{primary_id}|promoter_2000|{chrom}:{promoter_start}-{promoter_end}|{strand}"
+        fasta_records.append(f"{header}\n{promoter_seq}\n")
+
+        summary_rows.append([
+            input_gene_id,
+            primary_id if pd.notna(primary_id) else "",
+            chrom if pd.notna(chrom) else "",
+            promoter_start if pd.notna(promoter_start) else "",
+            promoter_end if pd.notna(promoter_end) else "",
+            strand if pd.notna(strand) else "",
+            promoter_length if pd.notna(promoter_length) else 0
+        ])
+
+    return fasta_records, summary_rows, failed_genes
+
+
+def _open_spooled_output(compress: bool):
+    """
+    返回 (底层临时文件, 写入句柄)。compress=True 时写入句柄为 gzip 流。
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES, mode="w+b")
+    if compress:
+        return spool, gzip.GzipFile(fileobj=spool, mode="wb")
+    return spool, spool
+
+
+class SpoolReader(io.RawIOBase):
+    """
+    SpooledTemporaryFile 的只读 RawIOBase 包装。
+
+    st.download_button 只接受 bytes / BytesIO / BufferedReader / RawIOBase，
+    不接受 SpooledTemporaryFile，用这个包装把临时文件交给按钮；关闭包装时同时关闭临时文件。
+    按钮内部仍会 read() 出完整的 bytes 保存在内存中，这个包装只是省去调用方
+    自己再读一份，并不能让下载本身按块进行。
+    """
+
+    def __init__(self, spool):
+        self._spool = spool
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        return self._spool.seek(offset, whence)
+
+    def tell(self) -> int:
+        return self._spool.tell()
+
+    def readinto(self, buffer) -> int:
+        data = self._spool.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def readall(self) -> bytes:
+        return self._spool.read()
+
+    def close(self) -> None:
+        if not self.closed:
+            self._spool.close()
+        super().close()
+
+
+def write_sequence_fasta_files(
+    input_ids: Iterable[Any],
+    compress: bool = False,
+    sequence_types: Tuple[str, ...] = SEQUENCE_TYPES,
+) -> dict:
+    """
+    一次遍历分库，同时写出多个类型的 FASTA 文件。
+
+    返回：
+    {
+        "files": {"cdna": 文件对象, "cds": 文件对象, "protein": 文件对象},
+        "summary": DataFrame(input_gene_id, primary_gene_id, cdna, cds, protein),
+        "failed_genes": [没有任何序列的输入基因],
+    }
+
+    文件对象已经 seek(0)，用完后由调用方 close()。
+    临时文件只保证生成期间的内存占用有上限；交给 st.download_button 时
+    （用 SpoolReader 包装）按钮会把整个文件读进内存。
+    """
+    input_ids = list(dict.fromkeys(input_ids))
+    resolved = resolve_primary_gene_ids(input_ids)
+
+    outputs = {t: _open_spooled_output(compress) for t in sequence_types}
+    counts = {x: dict.fromkeys(sequence_types, 0) for x in input_ids}
+
+    try:
+        for record in iter_sequence_records(input_ids, sequence_types, resolved=resolved):
+            input_id, _, _, seq_type, _ = record
+            outputs[seq_type][1].write(format_fasta_record(*record).encode("utf-8"))
+            counts[input_id][seq_type] += 1
+    except BaseException:
+        for spool, _ in outputs.values():
+            spool.close()
+        raise
+
+    files = {}
+    for seq_type, (spool, writer) in outputs.items():
+        if writer is not spool:
+            writer.close()
+        spool.seek(0)
+        files[seq_type] = spool
+
+    summary = pd.DataFrame(
+        [
+            [x, resolved.get(x) or ""] + [counts[x][t] for t in sequence_types]
+            for x in input_ids
+        ],
+        columns=["input_gene_id", "primary_gene_id"] + list(sequence_types),
+    )
+    failed_genes = [x for x in input_ids if not any(counts[x].values())]
+
+    return {
+        "files": files,
+        "summary": summary,
+        "failed_genes": failed_genes,
+    }
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+
+"""
+小麦基因号解析
+
+原来每次查询都要分别做：清理输入（strip / 去掉 FASTA header 的 ">" 和 "|" 后的字段）、
+re.sub 去掉 transcript 后缀、两次 re.search 判断中国春 / Fielder 染色体，
+同一个 ID 在一次请求中往往被重复处理好几遍。这里合并为：
+
+1. 一次解析得到：清理后的 ID、基础基因号、transcript 后缀、基因组（CS / FLD）、染色体，
+   基因组和染色体由一个预编译正则一次 search 得到，后缀用 rpartition 判断；
+2. 结果是只读的 ParsedGeneId（__slots__，占用内存小）；
+3. parse_gene_id 带有大小受限的 LRU 缓存，重复出现的 ID 不再重新解析。
+
+db_query 的路由 / ID 转换和 scripts/ 下的拆库脚本共用这里的解析，
+保证拆库时的分库与查询时的路由一致。
+"""
+
+import re
+from functools import lru_cache
+from typing import Any, Optional
+
+
+# 解析结果缓存的条目数（每条约 300 字节，合计约 20MB）
+GENE_ID_CACHE_SIZE = 1 << 16
+
+UNKNOWN_CHR = "unknown"
+
+# 基因组 + 染色体：取第一个 TraesCS / TraesFLD 片段
+_GENOME_CHR_RE = re.compile(r"Traes(CS|FLD)([1-7][ABD])")
+
+# 染色体 / 基因组名只有少数几种，统一复用同一个字符串对象
+_CHR_NAMES = {f"{n}{g}": f"{n}{g}" for n in "1234567" for g in "ABD"}
+_GENOMES = {"CS": "CS", "FLD": "FLD"}
+
+
+class ParsedGeneId:
+    """
+    一个输入基因号的解析结果（缓存共享，请勿修改属性）。
+
+    gene_id:
+        清理后的输入，例如 TraesCS5B02G233300.1
+    base_id:
+        去掉 transcript 后缀的基因号，例如 TraesCS5B02G233300
+    suffix:
+        transcript 后缀，例如 ".1"；没有时为 ""
+    genome:
+        "CS"（中国春）/ "FLD"（Fielder）；无法识别时为 None
+    chr:
+        染色体，例如 "5B"；无法识别时为 "unknown"
+    """
+
+    __slots__ = ("gene_id", "base_id", "suffix", "genome", "chr")
+
+    def __init__(self, gene_id: str, base_id: str, suffix: str, genome: Optional[str], chr: str):
+        self.gene_id = gene_id
+        self.base_id = base_id
+        self.suffix = suffix
+        self.genome = genome
+        self.chr = chr
+
+    def __repr__(self) -> str:
+        return (
+            f"ParsedGeneId(gene_id={self.gene_id!r}, base_id={self.base_id!r}, "
+            f"suffix={self.suffix!r}, genome={self.genome!r}, chr={self.chr!r})"
+        )
+
+
+_EMPTY = ParsedGeneId("", "", "", None, UNKNOWN_CHR)
+
+
+def normalize_gene_id(input_id: Any) -> str:
+    """
+    清理用户输入的基因号。
+    """
+    return parse_gene_id(input_id).gene_id
+
+
+def parse_gene_id(input_id: Any) -> ParsedGeneId:
+    """
+    解析基因号。
+
+    支持：
+    TraesCS5B02G233300
+    TraesCS5B02G233300.1
+    TraesFLD5B01G105200
+    >TraesCS5B02G233300.1|xxx（从 FASTA header 复制）
+    """
+    if input_id is None:
+        return _EMPTY
+    return _parse_cached(input_id if isinstance(input_id, str) else str(input_id))
+
+
+@lru_cache(maxsize=GENE_ID_CACHE_SIZE)
+def _parse_cached(raw: str) -> ParsedGeneId:
+    # 如果用户从 FASTA header 复制了 >gene_id|xxx，只取第一个字段
+    s = raw.strip().lstrip(">").split("|")[0].strip()
+    if not s:
+        return _EMPTY
+
+    # transcript 后缀：末尾的 ".数字"（与 re.sub(r"\.\d+$", "", s) 一致）
+    head, dot, tail = s.rpartition(".")
+    if dot and tail.isdecimal():
+        base_id, suffix = head, dot + tail
+    else:
+        base_id, suffix = s, ""
+
+    m = _GENOME_CHR_RE.search(s)
+    if m is None:
+        return ParsedGeneId(s, base_id, suffix, None, UNKNOWN_CHR)
+
+    genome, chr_name = m.groups()
+    return ParsedGeneId(s, base_id, suffix, _GENOMES[genome], _CHR_NAMES[chr_name])
+
+
+def clear_gene_id_cache() -> None:
+    _parse_cached.cache_clear()
@@ -0,0 +1,505 @@
+# -*- coding: utf-8 -*-
+
+"""
+GO 有向无环图（DAG）
+
+从本地 OBO 文件（默认 data/go_mapping/go-basic.obo）读取 GO 结构：
+1. 只使用 is_a 和 part_of 关系，跳过 obsolete term，alt_id 映射到主 ID；
+2. term 按字典序编码为整数，父子关系保存为 (term × term) 稀疏矩阵；
+3. 预先计算「祖先（含自身）」闭包和每个 term 的深度（到根的最长路径）；
+4. GOIndex 的注释沿 DAG 向上传递到所有祖先（propagate_go_index）；
+5. 闭包两级缓存：进程内按文件 stat 缓存，磁盘按内容哈希缓存
+   （data/cache/go_dag_<哈希>.npz），只在 OBO 变化时重新计算。
+
+闭包以稀疏 0/1 矩阵保存，每一行相当于一个 term 的祖先位集合；
+GO 约有 4-5 万个 term，稠密位图需要数百 MB，稀疏存储只需几 MB。
+"""
+
+import hashlib
+import os
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix, identity, vstack
+
+from utils.cache_util import DerivedCache
+from utils.go_index import CACHE_DIR, PROJECT_ROOT, GOIndex, file_stat_key, store_latest
+
+
+DEFAULT_OBO_PATH = PROJECT_ROOT / "data" / "go_mapping" / "go-basic.obo"
+
+# 闭包格式变化时加一，旧缓存自动失效
+GO_DAG_VERSION = 1
+
+# 参与传递的关系类型
+PROPAGATE_RELATIONSHIPS = ("is_a", "part_of")
+
+NAMESPACE_TO_ONTOLOGY = {
+    "biological_process": "BP",
+    "molecular_function": "MF",
+    "cellular_component": "CC",
+}
+
+_DAG_CACHE: Dict[Tuple, "GODag"] = {}
+_DAG_LOCK = threading.Lock()
+
+
+class GODag:
+    """
+    GO DAG 及其预计算结构，构建一次后只读共享。
+
+    term_ids / names / namespaces:
+        term（排序后）及其名称、namespace，数组下标即 term 编号
+    parents:
+        (term × term) 0/1 稀疏矩阵，parents[i, j] = 1 表示 j 是 i 的直接父节点
+    ancestors:
+        (term × term) 0/1 稀疏矩阵，ancestors[i, j] = 1 表示 j 是 i 的祖先或 i 自身
+    depth:
+        每个 term 到根节点的最长路径长度；子节点的 depth 一定大于父节点
+    alt_ids:
+        {alt_id: 主 ID}
+    """
+
+    def __init__(
+        self,
+        term_ids: np.ndarray,
+        names: np.ndarray,
+        namespaces: np.ndarray,
+        parents: csr_matrix,
+        ancestors: csr_matrix,
+        depth: np.ndarray,
+        alt_ids: Dict[str, str],
+        content_hash: str = "",
+    ):
+        self.term_ids = term_ids
+        self.names = names
+        self.namespaces = namespaces
+        self.parents = parents
+        self.ancestors = ancestors
+        self.depth = depth
+        self.alt_ids = alt_ids
+        self.content_hash = content_hash
+
+        self._derived = DerivedCache()
+
+    @property
+    def n_terms(self) -> int:
+        return len(self.term_ids)
+
+    def codes_for(self, go_ids: np.ndarray) -> np.ndarray:
+        """
+        GO ID -> term 编号，alt_id 自动映射到主 ID，不在 DAG 中的返回 -1。
+        """
+        go_ids = np.asarray(
+            [self.alt_ids.get(g, g) for g in np.asarray(go_ids, dtype=str).tolist()],
+            dtype=str,
+        )
+        if len(go_ids) == 0 or self.n_terms == 0:
+            return np.full(len(go_ids), -1, dtype=np.int64)
+
+        pos = np.minimum(np.searchsorted(self.term_ids, go_ids), self.n_terms - 1)
+        return np.where(self.term_ids[pos] == go_ids, pos, -1).astype(np.int64)
+
+    def derived(self, source: object, build: Callable[[object], object]) -> object:
+        """
+        缓存由 source（进程内共享的 GOIndex 等）和本 DAG 计算得到的结构，
+        同一个 source 只计算一次。
+        """
+        return self._derived.get(source, build)
+
+
+# ==============================
+# OBO 解析
+# ==============================
+
+def iter_obo_terms(obo_path: str) -> Iterator[Dict[str, List[str]]]:
+    """
+    逐个返回 OBO 文件中的 [Term] 段，格式为 {标签: [值, ...]}。
+    值中 " ! " 之后的注释会被去掉。
+    """
+    stanza: Optional[Dict[str, List[str]]] = None
+
+    with open(obo_path, "r", encoding="utf-8") as f:
+        for raw in f:
+            line = raw.strip()
+
+            if line.startswith("["):
+                if stanza is not None:
+                    yield stanza
+                stanza = {} if line == "[Term]" else None
+                continue
+
+            if stanza is None or not line or ":" not in line:
+                continue
+
+            tag, value = line.split(":", 1)
+            value = value.split(" ! ", 1)[0].strip()
+            stanza.setdefault(tag.strip(), []).append(value)
+
+    if stanza is not None:
+        yield stanza
+
+
+def _parse_obo(obo_path: str):
+    term_ids = []
+    names = []
+    namespaces = []
+    edges = []
+    alt_ids = {}
+
+    for stanza in iter_obo_terms(obo_path):
+        go_id = stanza.get("id", [""])[0]
+        if not go_id.startswith("GO:"):
+            continue
+        if stanza.get("is_obsolete", ["false"])[0] == "true":
+            continue
+
+        term_ids.append(go_id)
+        names.append(stanza.get("name", [""])[0])
+        namespaces.append(stanza.get("namespace", [""])[0])
+
+        for alt in stanza.get("alt_id", []):
+            alt_ids[alt] = go_id
+
+        if "is_a" in PROPAGATE_RELATIONSHIPS:
+            for parent in stanza.get("is_a", []):
+                edges.append((go_id, parent.split()[0]))
+
+        for rel in stanza.get("relationship", []):
+            parts = rel.split()
+            if len(parts) >= 2 and parts[0] in PROPAGATE_RELATIONSHIPS:
+                edges.append((go_id, parts[1]))
+
+    return term_ids, names, namespaces, edges, alt_ids
+
+
+# ==============================
+# 构建
+# ==============================
+
+def _compute_depth(parents: csr_matrix) -> np.ndarray:
+    """
+    到根节点的最长路径长度。
+
+    按层的 Kahn 拓扑排序：父节点全部出队后子节点才入队，入队时的层号即最长路径长度；
+    每条边只访问一次，有 term 始终无法入队说明存在环。
+    """
+    n = parents.shape[0]
+    children = parents.T.tocsr()
+    remaining = np.diff(parents.indptr).astype(np.int64)
+    depth = np.zeros(n, dtype=np.int64)
+
+    frontier = np.flatnonzero(remaining == 0)
+    level = 0
+    visited = 0
+    while len(frontier):
+        depth[frontier] = level
+        visited += len(frontier)
+
+        kids = children[frontier].indices
+        remaining -= np.bincount(kids, minlength=n)
+        frontier = np.unique(kids[remaining[kids] == 0])
+        level += 1
+
+    if visited < n:
+        raise ValueError("GO OBO 中存在环，无法构建 DAG。")
+
+    return depth
+
+
+def _compute_ancestors(parents: csr_matrix, depth: np.ndarray) -> csr_matrix:
+    """
+    祖先（含自身）闭包：A = I + P @ A。
+    按 depth 从根到叶逐层计算，每层只做一次稀疏矩阵乘法。
+    """
+    n = parents.shape[0]
+    ancestors = identity(n, dtype=np.int32, format="csr")
+
+    for d in range(1, int(depth.max()) + 1 if n else 0):
+        rows = np.flatnonzero(depth == d)
+        level = parents[rows] @ ancestors
+
+        select = csr_matrix(
+            (np.ones(len(rows), dtype=np.int32), (rows, np.arange(len(rows)))),
+            shape=(n, len(rows)),
+        )
+        ancestors = ancestors + select @ level
+        ancestors.data[:] = 1
+
+    ancestors = ancestors.tocsr()
+    ancestors.sort_indices()
+    return ancestors.astype(np.int8)
+
+
+def build_go_dag(obo_path: str, content_hash: str = "") -> GODag:
+    term_ids, names, namespaces, edges, alt_ids = _parse_obo(obo_path)
+
+    order = np.argsort(np.asarray(term_ids, dtype=str), kind="stable")
+    term_ids_arr = np.asarray(term_ids, dtype=str)[order]
+    names_arr = np.asarray(names, dtype=object)[order]
+    namespaces_arr = np.asarray(namespaces, dtype=object)[order]
+
+    n = len(term_ids_arr)
+    code_of = {t: i for i, t in enumerate(term_ids_arr.tolist())}
+
+    # 指向 obsolete 或缺失 term 的边直接丢弃
+    pairs = sorted({
+        (code_of[child], code_of[parent])
+        for child, parent in edges
+        if child in code_of and parent in code_of and child != parent
+    })
+    rows = np.asarray([p[0] for p in pairs], dtype=np.int64)
+    cols = np.asarray([p[1] for p in pairs], dtype=np.int64)
+
+    parents = csr_matrix(
+        (np.ones(len(pairs), dtype=np.int32), (rows, cols)),
+        shape=(n, n),
+    )
+    parents.sort_indices()
+
+    depth = _compute_depth(parents)
+    ancestors = _compute_ancestors(parents, depth)
+
+    return GODag(
+        term_ids=term_ids_arr,
+        names=names_arr,
+        namespaces=namespaces_arr,
+        parents=parents,
+        ancestors=ancestors,
+        depth=depth,
+        alt_ids={a: p for a, p in alt_ids.items() if p in code_of},
+        content_hash=content_hash,
+    )
+
+
+# ==============================
+# 缓存
+# ==============================
+
+def _content_hash(path: str) -> str:
+    h = hashlib.sha1(f"go_dag_v{GO_DAG_VERSION}".encode())
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()[:16]
+
+
+def save_go_dag(dag: GODag, path: Path) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(f".{os.getpid()}.tmp.npz")
+
+    np.savez(
+        tmp_path,
+        term_ids=dag.term_ids,
+        names=dag.names.astype(str),
+        namespaces=dag.namespaces.astype(str),
+        parents_indptr=dag.parents.indptr,
+        parents_indices=dag.parents.indices,
+        ancestors_indptr=dag.ancestors.indptr,
+        ancestors_indices=dag.ancestors.indices,
+        depth=dag.depth,
+        alt_keys=np.asarray(list(dag.alt_ids.keys()), dtype=str),
+        alt_values=np.asarray(list(dag.alt_ids.values()), dtype=str),
+    )
+    os.replace(tmp_path, path)
+
+
+def load_go_dag_file(path: Path, content_hash: str = "") -> GODag:
+    with np.load(path, allow_pickle=False) as data:
+        n = len(data["term_ids"])
+
+        def _csr(prefix: str, dtype) -> csr_matrix:
+            indices = data[f"{prefix}_indices"]
+            return csr_matrix(
+                (np.ones(len(indices), dtype=dtype), indices, data[f"{prefix}_indptr"]),
+                shape=(n, n),
+            )
+
+        return GODag(
+            term_ids=data["term_ids"],
+            names=data["names"].astype(object),
+            namespaces=data["namespaces"].astype(object),
+            parents=_csr("parents", np.int32),
+            ancestors=_csr("ancestors", np.int8),
+            depth=data["depth"],
+            alt_ids=dict(zip(data["alt_keys"].tolist(), data["alt_values"].tolist())),
+            content_hash=content_hash,
+        )
+
+
+def get_go_dag(obo_path: Optional[str] = None, cache_dir: Optional[Path] = None) -> GODag:
+    """
+    获取 GODag；OBO 文件不变时直接返回进程内共享的对象。
+    """
+    obo_path = str(obo_path or DEFAULT_OBO_PATH)
+    if not os.path.exists(obo_path):
+        raise FileNotFoundError(
+            f"找不到 GO OBO 文件: {obo_path}\n"
+            f"请从 http://purl.obolibrary.org/obo/go/go-basic.obo 下载后放到 data/go_mapping/ 目录。"
+        )
+
+    stat_key = file_stat_key((obo_path,))
+
+    dag = _DAG_CACHE.get(stat_key)
+    if dag is not None:
+        return dag
+
+    with _DAG_LOCK:
+        dag = _DAG_CACHE.get(stat_key)
+        if dag is not None:
+            return dag
+
+        content_hash = _content_hash(obo_path)
+        cache_path = Path(cache_dir or CACHE_DIR) / f"go_dag_{content_hash}.npz"
+
+        dag = None
+        if cache_path.exists():
+            try:
+                dag = load_go_dag_file(cache_path, content_hash)
+            except (OSError, ValueError, KeyError):
+                dag = None
+
+        if dag is None:
+            dag = build_go_dag(obo_path, content_hash)
+            try:
+                save_go_dag(dag, cache_path)
+            except OSError:
+                pass
+
+        store_latest(_DAG_CACHE, stat_key, dag)
+
+        return dag
+
+
+def clear_go_dag_cache() -> None:
+    with _DAG_LOCK:
+        _DAG_CACHE.clear()
+
+
+# ==============================
+# 注释向上传递
+# ==============================
+
+class DagGOIndex:
+    """
+    沿 DAG 向上传递后的 GOIndex，以及与其 term 顺序对齐的 DAG 结构。
+
+    index:
+        传递后的 GOIndex：每个 term 包含自身及全部后代 term 注释的基因
+    dag_codes:
+        index.term_ids 在 DAG 中的编号，不在 OBO 中的 term 为 -1（不参与传递）
+    depth / parents / strict_ancestors:
+        与 index.term_ids 对齐的深度、直接父节点、严格祖先（不含自身）矩阵
+    """
+
+    def __init__(self, index: GOIndex, dag: GODag, dag_codes: np.ndarray):
+        self.index = index
+        self.dag_codes = dag_codes
+
+        known = np.flatnonzero(dag_codes >= 0)
+        n = index.n_terms
+
+        # DAG 编号 -> 本地编号
+        local = np.full(dag.n_terms, -1, dtype=np.int64)
+        local[dag_codes[known]] = known
+
+        self.depth = np.zeros(n, dtype=np.int64)
+        self.depth[known] = dag.depth[dag_codes[known]]
+
+        self.parents = _restrict(dag.parents, dag_codes, local, n)
+        strict = _restrict(dag.ancestors, dag_codes, local, n)
+        strict.setdiag(0)
+        strict.eliminate_zeros()
+        self.strict_ancestors = strict.astype(np.int32)
+
+        self._parent_union: Optional[csr_matrix] = None
+
+    @property
+    def parent_union(self) -> csr_matrix:
+        """
+        (term × gene) 0/1 矩阵：每个 term 所有直接父节点基因的并集，首次使用时计算。
+        没有父节点的 term 对应空行。
+        """
+        if self._parent_union is None:
+            union = (self.parents @ self.index.membership).tocsr()
+            union.data[:] = 1
+            self._parent_union = union
+        return self._parent_union
+
+
+def _restrict(matrix: csr_matrix, dag_codes: np.ndarray, local: np.ndarray, n: int) -> csr_matrix:
+    """
+    把 (DAG term × DAG term) 矩阵限制到本地 term 上，并换成本地编号。
+    """
+    known = np.flatnonzero(dag_codes >= 0)
+    sub = matrix[dag_codes[known]].tocoo()
+    cols = local[sub.col]
+    ok = cols >= 0
+
+    return csr_matrix(
+        (sub.data[ok].astype(np.int32), (known[sub.row[ok]], cols[ok])),
+        shape=(n, n),
+    )
+
+
+def propagate_go_index(index: GOIndex, dag: GODag) -> DagGOIndex:
+    """
+    把 GOIndex 的注释沿 DAG 传递到所有祖先 term（true path rule）。
+
+    传递结果 = ancestors.T @ 直接注释矩阵，一次稀疏矩阵乘法完成；
+    按源索引缓存，同一个 GOIndex 只传递一次。
+    不在 OBO 中的 term 保留原有基因，不参与传递。
+    """
+    def build(source: GOIndex) -> DagGOIndex:
+        codes = dag.codes_for(source.term_ids)
+        known = codes >= 0
+
+        mapping = csr_matrix(
+            (np.ones(int(known.sum()), dtype=np.int32), (codes[known], np.flatnonzero(known))),
+            shape=(dag.n_terms, source.n_terms),
+        )
+        direct = mapping @ source.membership
+        propagated = (dag.ancestors.T.astype(np.int32) @ direct).tocsr()
+        propagated.data[:] = 1
+
+        nonempty = np.flatnonzero(np.diff(propagated.indptr) > 0)
+        unknown = np.flatnonzero(~known)
+
+        membership = vstack([propagated[nonempty], source.membership[unknown]]).tocsr()
+        membership.sort_indices()
+
+        term_ids = np.concatenate([dag.term_ids[nonempty], source.term_ids[unknown]]).astype(str)
+        dag_codes = np.concatenate([nonempty, np.full(len(unknown), -1)]).astype(np.int64)
+
+        # 传递新增的祖先 term 在 TERM2NAME / metadata 中没有记录，用 OBO 补齐
+        extra = pd.DataFrame({
+            "go_id": dag.term_ids[nonempty],
+            "go_term_name": dag.names[nonempty],
+            "go_namespace": dag.namespaces[nonempty],
+        })
+        extra["ontology"] = extra["go_namespace"].map(NAMESPACE_TO_ONTOLOGY)
+
+        term2name = _append_missing(source.term2name, extra)
+        metadata = _append_missing(source.metadata, extra)
+
+        propagated_index = GOIndex(
+            gene_ids=source.gene_ids,
+            term_ids=term_ids,
+            indptr=membership.indptr.astype(np.int64),
+            indices=membership.indices.astype(np.int32),
+            term2name=term2name,
+            metadata=metadata,
+            content_hash=f"{source.content_hash}+{dag.content_hash}",
+        )
+        return DagGOIndex(propagated_index, dag, dag_codes)
+
+    return dag.derived(index, build)
+
+
+def _append_missing(df: pd.DataFrame, extra: pd.DataFrame) -> pd.DataFrame:
+    cols = [c for c in df.columns if c in extra.columns]
+    missing = extra[~extra["go_id"].isin(df["go_id"])][cols]
+    return pd.concat([df, missing], ignore_index=True)
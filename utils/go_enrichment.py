@@ -2,10 +2,28 @@ import io
 import math
 from typing import Set, Dict, List, Tuple, Optional
 
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
+from scipy.sparse import csr_matrix
 from scipy.stats import hypergeom
-from statsmodels.stats.multitest import multipletests
+
+from utils.batch import run_contrast_chunks, stack_frames, with_contrast
+from utils.go_dag import DagGOIndex, get_go_dag, propagate_go_index
+from utils.go_index import GOIndex, build_go_index, get_go_index
+from utils.homoeolog import HomoeologIndex, get_homoeolog_index
+from utils.permutation import permutation_pvalues
+from utils.plot_cache import check_image_format
+from utils.stats import bh_adjust, bh_reject
+
+
+# flat：原始注释，不使用 DAG；classic：注释沿 DAG 传递后的经典检验；
+# elim / parent_child：topGO 风格的去相关检验（见 _enrich_elim / _enrich_parent_child）。
+# 没有实现 topGO 的 weight / weight01，原因见 _enrich_parent_child
+GO_DAG_MODES = ("flat", "classic", "elim", "parent_child")
+
+# 置换检验只打乱 DEG 标签、重算超几何检验；elim / parent_child 的检验依赖逐层结果，
+# 不能用同一个置换矩阵一次算完，因此只支持这两种模式
+PERMUTATION_DAG_MODES = ("flat", "classic")
 
 
 def normalize_gene_list(gene_list: List[str]) -> List[str]:
@@ -62,54 +80,139 @@ def build_go_to_genes(term2gene: pd.DataFrame, background_genes: Set[str]) -> Di
     return go_to_genes
 
 
-def enrich_go(
+def enrich_go_index(
+    index: GOIndex,
     study_genes: Set[str],
-    background_genes: Set[str],
-    go_to_genes: Dict[str, Set[str]],
     min_geneset_size: int = 3,
     max_geneset_size: int = 2000,
+    n_permutations: int = 0,
+    permutation_seed: int = 0,
 ) -> pd.DataFrame:
-    study_genes = study_genes & background_genes
+    """
+    基于 GOIndex 的向量化 GO 富集。
+
+    1. 一次稀疏矩阵 × 向量得到所有 term 的 overlap 数；
+    2. 对通过大小过滤且 overlap > 0 的 term，一次性调用 hypergeom.sf；
+    3. 只为最终保留的 term 拼接 geneID 字符串。
 
-    N = len(background_genes)
-    n = len(study_genes)
+    n_permutations > 0 时额外计算置换检验的经验 p 值（见 utils.permutation），
+    增加 perm_pvalue、perm_p.adjust、perm_n 三列。
+    """
+    study_vec = index.study_indicator(study_genes)
 
-    if n == 0:
+    if not study_vec.any():
         raise ValueError("输入的 DEG 与背景基因集没有交集，无法进行富集分析。")
 
-    results = []
+    return _enrich_from_counts(
+        index,
+        study_vec,
+        index.membership @ study_vec,
+        min_geneset_size=min_geneset_size,
+        max_geneset_size=max_geneset_size,
+        n_permutations=n_permutations,
+        permutation_seed=permutation_seed,
+    )
 
-    for go_id, term_genes in go_to_genes.items():
-        M = len(term_genes)
-        if M < min_geneset_size or M > max_geneset_size:
-            continue
 
-        overlap = study_genes & term_genes
-        k = len(overlap)
-        if k == 0:
-            continue
+def _enrich_from_counts(
+    index: GOIndex,
+    study_vec: np.ndarray,
+    overlap_counts: np.ndarray,
+    min_geneset_size: int,
+    max_geneset_size: int,
+    n_permutations: int = 0,
+    permutation_seed: int = 0,
+) -> pd.DataFrame:
+    """
+    已知 study 0/1 向量和每个 term 的 overlap 数时，完成检验、校正并生成结果表。
+    单列表和批量模式共用。
+    """
+    N = index.n_background
+    n = int(study_vec.sum())
+    term_sizes = index.term_sizes
+
+    keep = np.flatnonzero(
+        (term_sizes >= min_geneset_size) &
+        (term_sizes <= max_geneset_size) &
+        (overlap_counts > 0)
+    )
+
+    if len(keep) == 0:
+        return pd.DataFrame()
+
+    M = term_sizes[keep]
+    k = overlap_counts[keep]
+    pvalues = hypergeom.sf(k - 1, N, M, n)
+
+    extra = {}
+    if n_permutations > 0:
+        perm_p, perm_n = permutation_pvalues(
+            index.membership[keep],
+            k,
+            set_size=n,
+            n_background=N,
+            n_permutations=n_permutations,
+            seed=permutation_seed,
+        )
+        extra["perm_pvalue"] = perm_p
+        extra["perm_p.adjust"] = bh_adjust(perm_p)
+        extra["perm_n"] = perm_n
+
+    return _result_frame(
+        index,
+        keep,
+        M,
+        N,
+        k,
+        n,
+        pvalues,
+        index.membership[keep].multiply(study_vec).tocsr(),
+        extra,
+    )
 
-        pvalue = hypergeom.sf(k - 1, N, M, n)
 
-        results.append({
-            "go_id": go_id,
-            "BgRatio_numerator": M,
-            "BgRatio_denominator": N,
-            "GeneRatio_numerator": k,
-            "GeneRatio_denominator": n,
-            "Count": k,
-            "pvalue": pvalue,
-            "geneID": "/".join(sorted(overlap))
-        })
+def _result_frame(
+    index: GOIndex,
+    keep: np.ndarray,
+    M: np.ndarray,
+    N,
+    k: np.ndarray,
+    n,
+    pvalues: np.ndarray,
+    overlap,
+    extra: Optional[Dict[str, np.ndarray]] = None,
+) -> pd.DataFrame:
+    """
+    由检验结果生成标准结果表：BH 校正、GeneRatio / BgRatio、-log10 列，并排序。
+
+    N / n 可以是标量（经典检验）或与 keep 等长的数组（parent-child 模式下每个 term 的总体不同）；
+    overlap 为 (保留 term × gene) 的稀疏矩阵，非零位置即 geneID 中的基因。
+    """
+    # 基因编号按字典序分配，编号有序即名称有序
+    overlap.eliminate_zeros()
+    overlap.sort_indices()
+    gene_ids = index.gene_ids
+    gene_strings = [
+        "/".join(gene_ids[overlap.indices[overlap.indptr[i]:overlap.indptr[i + 1]]].tolist())
+        for i in range(len(keep))
+    ]
 
-    res_df = pd.DataFrame(results)
+    res_df = pd.DataFrame({
+        "go_id": index.term_ids[keep].tolist(),
+        "BgRatio_numerator": M.astype(np.int64),
+        "BgRatio_denominator": N,
+        "GeneRatio_numerator": k.astype(np.int64),
+        "GeneRatio_denominator": n,
+        "Count": k.astype(np.int64),
+        "pvalue": pvalues,
+        "geneID": gene_strings,
+    })
 
-    if res_df.empty:
-        return res_df
+    res_df["p.adjust"] = bh_adjust(res_df["pvalue"])
+    res_df["significant"] = bh_reject(res_df["pvalue"])
 
-    reject, p_adjust, _, _ = multipletests(res_df["pvalue"], method="fdr_bh")
-    res_df["p.adjust"] = p_adjust
-    res_df["significant"] = reject
+    for col, values in (extra or {}).items():
+        res_df[col] = values
 
     res_df["GeneRatio"] = (
         res_df["GeneRatio_numerator"].astype(str) + "/" +
@@ -140,6 +243,259 @@ def enrich_go(
     return res_df
 
 
+# ==============================
+# GO DAG 模式
+# ==============================
+
+def _keep_terms(
+    index: GOIndex,
+    overlap_counts: np.ndarray,
+    min_geneset_size: int,
+    max_geneset_size: int,
+) -> np.ndarray:
+    term_sizes = index.term_sizes
+    return np.flatnonzero(
+        (term_sizes >= min_geneset_size) &
+        (term_sizes <= max_geneset_size) &
+        (overlap_counts > 0)
+    )
+
+
+def _enrich_elim(
+    dag_index: DagGOIndex,
+    study_vec: np.ndarray,
+    overlap_counts: np.ndarray,
+    min_geneset_size: int,
+    max_geneset_size: int,
+    elim_cutoff: float,
+) -> pd.DataFrame:
+    """
+    topGO elim：从最深的 term 开始逐层检验，某个 term 的 p < elim_cutoff 时，
+    把它的基因从所有祖先 term 中移除，祖先再检验时不再重复计入这些基因。
+
+    同一深度的 term 互不为祖先，整层一次性检验；移除操作为
+    (显著 term 的祖先矩阵).T @ (显著 term 的当前基因) 一次稀疏矩阵乘法。
+    elim 后不再包含 DEG 的 term 不报告。
+    """
+    index = dag_index.index
+    N = index.n_background
+    n = int(study_vec.sum())
+    membership = index.membership
+
+    keep = _keep_terms(index, overlap_counts, min_geneset_size, max_geneset_size)
+    if len(keep) == 0:
+        return pd.DataFrame()
+
+    removed = csr_matrix(membership.shape, dtype=np.int32)
+    M = np.zeros(index.n_terms, dtype=np.int64)
+    k = np.zeros(index.n_terms, dtype=np.int64)
+    pvalues = np.ones(index.n_terms)
+
+    depth = dag_index.depth
+    for d in np.unique(depth[keep])[::-1]:
+        rows = keep[depth[keep] == d]
+
+        current = (membership[rows] - removed[rows]).tocsr()
+        current.eliminate_zeros()
+
+        M[rows] = np.diff(current.indptr)
+        k[rows] = current @ study_vec
+
+        tested = k[rows] > 0
+        p = np.ones(len(rows))
+        p[tested] = hypergeom.sf(k[rows][tested] - 1, N, M[rows][tested], n)
+        pvalues[rows] = p
+
+        sig = np.flatnonzero(p < elim_cutoff)
+        if len(sig):
+            removed = removed + dag_index.strict_ancestors[rows[sig]].T @ current[sig]
+            removed.data[:] = 1
+
+    keep = keep[k[keep] > 0]
+    if len(keep) == 0:
+        return pd.DataFrame()
+
+    overlap = (membership[keep] - removed[keep]).multiply(study_vec).tocsr()
+
+    return _result_frame(index, keep, M[keep], N, k[keep], n, pvalues[keep], overlap)
+
+
+def _enrich_parent_child(
+    dag_index: DagGOIndex,
+    study_vec: np.ndarray,
+    overlap_counts: np.ndarray,
+    min_geneset_size: int,
+    max_geneset_size: int,
+) -> pd.DataFrame:
+    """
+    parent-child（union）：每个 term 以其直接父节点基因的并集为总体，
+    总体中的 DEG 为抽样数，检验该 term 相对父节点是否进一步富集。
+    没有父节点的 term（根节点、OBO 中没有的 term）以全部背景为总体。
+
+    BgRatio / GeneRatio 的分母分别为父节点总体大小和总体中的 DEG 数。
+
+    这里用 parent-child 代替 topGO 的 weight / weight01，而不是实现后者：
+    - 两者要解决的是同一个问题：祖先 term 因为包含显著子 term 的基因而「继承」显著性。
+      elim 直接删掉这些基因，parent-child 以父节点为条件检验，都能去掉这种继承；
+      topGO 自带 parentchild 算法（Grossmann et al. 2007），结果可以与 R 对照；
+    - weight 在每个 term 上与子 term 反复比较 p 值、按比值调整基因权重并递归重算，
+      结果依赖遍历顺序，检验也变成加权基因数上的近似超几何检验，无法按层向量化；
+      parent-child 只需要一次稀疏矩阵乘法（父节点并集）和一次超几何检验；
+    - weight01 是 elim 与 weight 的组合，需要 topGO 默认行为时 elim 已覆盖其保守部分。
+    """
+    index = dag_index.index
+    N = index.n_background
+    n = int(study_vec.sum())
+
+    keep = _keep_terms(index, overlap_counts, min_geneset_size, max_geneset_size)
+    if len(keep) == 0:
+        return pd.DataFrame()
+
+    union = dag_index.parent_union[keep]
+    has_parents = np.diff(dag_index.parents.indptr)[keep] > 0
+
+    population = np.where(has_parents, np.diff(union.indptr), N).astype(np.int64)
+    population_study = np.where(has_parents, union @ study_vec, n).astype(np.int64)
+
+    M = index.term_sizes[keep]
+    k = overlap_counts[keep]
+    pvalues = hypergeom.sf(k - 1, population, M, population_study)
+
+    return _result_frame(
+        index,
+        keep,
+        M,
+        population,
+        k,
+        population_study,
+        pvalues,
+        index.membership[keep].multiply(study_vec).tocsr(),
+    )
+
+
+def check_dag_mode(dag_mode: str, n_permutations: int = 0) -> None:
+    """
+    在读取任何数据之前检查 dag_mode，以及它能否与置换检验组合。
+    """
+    if dag_mode not in GO_DAG_MODES:
+        raise ValueError(f"dag_mode 必须是 {GO_DAG_MODES} 之一，当前为: {dag_mode}")
+    if n_permutations > 0 and dag_mode not in PERMUTATION_DAG_MODES:
+        raise ValueError(
+            f"置换检验只支持 {' / '.join(PERMUTATION_DAG_MODES)} 模式，"
+            f"{dag_mode} 模式请把置换次数设为 0。"
+        )
+
+
+def _prepare_dag_index(
+    index: GOIndex,
+    dag_mode: str,
+    obo_path: Optional[str],
+) -> Tuple[GOIndex, Optional[DagGOIndex]]:
+    """
+    dag_mode 为 flat 时原样返回；否则沿 DAG 传递注释，返回 (传递后的 GOIndex, DagGOIndex)。
+    """
+    check_dag_mode(dag_mode)
+
+    if dag_mode == "flat":
+        return index, None
+
+    dag_index = propagate_go_index(index, get_go_dag(obo_path))
+    return dag_index.index, dag_index
+
+
+def _enrich_mode(
+    index: GOIndex,
+    dag_index: Optional[DagGOIndex],
+    dag_mode: str,
+    study_vec: np.ndarray,
+    overlap_counts: np.ndarray,
+    min_geneset_size: int,
+    max_geneset_size: int,
+    n_permutations: int = 0,
+    permutation_seed: int = 0,
+    elim_cutoff: float = 0.01,
+) -> pd.DataFrame:
+    """
+    按 dag_mode 选择检验方式，单列表和批量模式共用。
+    """
+    if dag_mode in ("flat", "classic"):
+        return _enrich_from_counts(
+            index,
+            study_vec,
+            overlap_counts,
+            min_geneset_size=min_geneset_size,
+            max_geneset_size=max_geneset_size,
+            n_permutations=n_permutations,
+            permutation_seed=permutation_seed,
+        )
+
+    if dag_mode == "elim":
+        return _enrich_elim(
+            dag_index,
+            study_vec,
+            overlap_counts,
+            min_geneset_size,
+            max_geneset_size,
+            elim_cutoff,
+        )
+
+    return _enrich_parent_child(
+        dag_index,
+        study_vec,
+        overlap_counts,
+        min_geneset_size,
+        max_geneset_size,
+    )
+
+
+def enrich_go(
+    study_genes: Set[str],
+    background_genes: Set[str],
+    go_to_genes: Dict[str, Set[str]],
+    min_geneset_size: int = 3,
+    max_geneset_size: int = 2000,
+) -> pd.DataFrame:
+    """
+    兼容旧接口：把 {go_id: 基因集合} 临时编译成 GOIndex 后调用 enrich_go_index。
+    """
+    term2gene = pd.DataFrame(
+        [(go_id, g) for go_id, genes in go_to_genes.items() for g in genes],
+        columns=["go_id", "gene_id"],
+    )
+    index = build_go_index(
+        term2gene=term2gene,
+        term2name=pd.DataFrame(columns=["go_id", "go_term_name"]),
+        metadata=pd.DataFrame(columns=["go_id"]),
+        background_genes=set(background_genes),
+    )
+    return enrich_go_index(
+        index,
+        study_genes,
+        min_geneset_size=min_geneset_size,
+        max_geneset_size=max_geneset_size,
+    )
+
+
+def collapse_go_index(index: GOIndex, homoeologs: HomoeologIndex) -> GOIndex:
+    """
+    把 GOIndex 的背景基因合并为 homoeolog 组：组内任一基因注释到某个 term，
+    该组即属于这个 term。合并结果按源索引缓存，只计算一次。
+    """
+    def build(source: GOIndex) -> GOIndex:
+        labels, membership = homoeologs.collapse(source.gene_ids, source.membership)
+        return GOIndex(
+            gene_ids=labels,
+            term_ids=source.term_ids,
+            indptr=membership.indptr.astype(np.int64),
+            indices=membership.indices.astype(np.int32),
+            term2name=source.term2name,
+            metadata=source.metadata,
+            content_hash=f"{source.content_hash}+homoeolog",
+        )
+
+    return homoeologs.derived(index, build)
+
+
 def finalize_result_table(
     res: pd.DataFrame,
     term2name: pd.DataFrame,
@@ -201,33 +557,65 @@ def run_go_enrichment(
     background_path: str,
     min_size: int = 3,
     max_size: int = 2000,
-    padj_cutoff: float = 0.05
+    padj_cutoff: float = 0.05,
+    n_permutations: int = 0,
+    permutation_seed: int = 0,
+    collapse_homoeologs: bool = False,
+    dag_mode: str = "flat",
+    obo_path: Optional[str] = None,
+    elim_cutoff: float = 0.01
 ) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """
+    collapse_homoeologs=True 时先把输入基因和背景基因合并为 A/B/D homoeolog 组，
+    富集在组层面进行：Count、geneID 和摘要中的背景 / 交集数都按组计，
+    geneID 中的名称为组名（组内字典序最小的基因号）。
+
+    dag_mode 见 GO_DAG_MODES：除 flat 外，注释先沿 GO DAG 传递到所有祖先
+    （需要 obo_path，默认 data/go_mapping/go-basic.obo）；
+    elim 模式下 p < elim_cutoff 的 term 的基因不再计入其祖先。
+    n_permutations > 0 时只支持 PERMUTATION_DAG_MODES。
+    """
+    check_dag_mode(dag_mode, n_permutations)
+
     gene_list = normalize_gene_list(gene_list)
     study_genes = set(gene_list)
+    input_gene_count = len(study_genes)
+
+    # 四个注释文件只在第一次使用（或文件变化）时解析，之后直接复用预编译索引
+    index = get_go_index(term2gene_path, term2name_path, metadata_path, background_path)
+
+    if collapse_homoeologs:
+        homoeologs = get_homoeolog_index()
+        index = collapse_go_index(index, homoeologs)
+        study_genes = set(homoeologs.labels_for(study_genes))
 
-    term2gene = load_term2gene(term2gene_path)
-    term2name = load_term2name(term2name_path)
-    metadata = load_go_metadata(metadata_path)
-    background_genes = load_background_genes(background_path)
+    index, dag_index = _prepare_dag_index(index, dag_mode, obo_path)
+
+    term2name = index.term2name
+    metadata = index.metadata
+    background_genes = index.background_genes()
 
     overlap_input = study_genes & background_genes
     if len(overlap_input) == 0:
         raise ValueError("你的 DEG 列表与背景基因没有交集，请检查基因 ID 格式是否一致。")
 
-    go_to_genes = build_go_to_genes(term2gene, background_genes)
-
-    res = enrich_go(
-        study_genes=study_genes,
-        background_genes=background_genes,
-        go_to_genes=go_to_genes,
+    study_vec = index.study_indicator(study_genes)
+    res = _enrich_mode(
+        index,
+        dag_index,
+        dag_mode,
+        study_vec,
+        index.membership @ study_vec,
         min_geneset_size=min_size,
-        max_geneset_size=max_size
+        max_geneset_size=max_size,
+        n_permutations=n_permutations,
+        permutation_seed=permutation_seed,
+        elim_cutoff=elim_cutoff
     )
 
     if res.empty:
         summary_df = build_summary_df(
-            input_gene_count=len(study_genes),
+            input_gene_count=input_gene_count,
             background_gene_count=len(background_genes),
             deg_in_background_count=len(overlap_input),
             tested_go_term_count=0,
@@ -239,7 +627,7 @@ def run_go_enrichment(
     sig = res[res["p.adjust"] <= padj_cutoff].copy()
 
     summary_df = build_summary_df(
-        input_gene_count=len(study_genes),
+        input_gene_count=input_gene_count,
         background_gene_count=len(background_genes),
         deg_in_background_count=len(overlap_input),
         tested_go_term_count=len(res),
@@ -249,18 +637,128 @@ def run_go_enrichment(
     return res, sig, summary_df
 
 
-def create_go_barplot_bytes(
+def run_go_enrichment_batch(
+    gene_lists: Dict[str, List[str]],
+    term2gene_path: str,
+    term2name_path: str,
+    metadata_path: str,
+    background_path: str,
+    min_size: int = 3,
+    max_size: int = 2000,
+    padj_cutoff: float = 0.05,
+    n_permutations: int = 0,
+    permutation_seed: int = 0,
+    collapse_homoeologs: bool = False,
+    dag_mode: str = "flat",
+    obo_path: Optional[str] = None,
+    elim_cutoff: float = 0.01,
+    n_jobs: int = 1
+) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """
+    多个 DEG 列表（contrast）的批量 GO 富集。
+
+    gene_lists 为 {contrast 名称: 基因列表}。返回的三张表与 run_go_enrichment 一致，
+    第一列为 contrast，按 gene_lists 的顺序堆叠；摘要表为 contrast / metric / value。
+
+    - 所有 contrast 的 overlap 数由一次 (term × gene) @ (gene × contrast) 稀疏矩阵乘法得到；
+    - BH 校正在每个 contrast 内部独立进行，结果与逐个调用 run_go_enrichment 相同；
+    - 与背景没有交集的 contrast 不报错，只在摘要中体现；
+    - collapse_homoeologs / dag_mode / obo_path / elim_cutoff 的含义与 run_go_enrichment 相同；
+    - n_jobs > 1 时把 contrast 分组后放到进程池中计算。
+    """
+    check_dag_mode(dag_mode, n_permutations)
+
+    if n_jobs > 1 and len(gene_lists) > 1:
+        results_df, sig_df, summary_df = run_contrast_chunks(
+            run_go_enrichment_batch,
+            gene_lists,
+            n_jobs,
+            term2gene_path=term2gene_path,
+            term2name_path=term2name_path,
+            metadata_path=metadata_path,
+            background_path=background_path,
+            min_size=min_size,
+            max_size=max_size,
+            padj_cutoff=padj_cutoff,
+            n_permutations=n_permutations,
+            permutation_seed=permutation_seed,
+            collapse_homoeologs=collapse_homoeologs,
+            dag_mode=dag_mode,
+            obo_path=obo_path,
+            elim_cutoff=elim_cutoff
+        )
+        return results_df, sig_df, summary_df
+
+    index = get_go_index(term2gene_path, term2name_path, metadata_path, background_path)
+
+    names = list(gene_lists)
+    study_sets = [set(normalize_gene_list(gene_lists[name])) for name in names]
+    input_counts = [len(genes) for genes in study_sets]
+
+    if collapse_homoeologs:
+        homoeologs = get_homoeolog_index()
+        index = collapse_go_index(index, homoeologs)
+        study_sets = [set(homoeologs.labels_for(genes)) for genes in study_sets]
+
+    index, dag_index = _prepare_dag_index(index, dag_mode, obo_path)
+
+    study = index.study_matrix(study_sets)
+    overlap = (index.membership @ study.T).toarray()
+
+    res_frames = []
+    sig_frames = []
+    summary_frames = []
+
+    for j, name in enumerate(names):
+        study_vec = study[j].toarray().ravel()
+
+        res = pd.DataFrame()
+        if study_vec.any():
+            res = _enrich_mode(
+                index,
+                dag_index,
+                dag_mode,
+                study_vec,
+                overlap[:, j],
+                min_geneset_size=min_size,
+                max_geneset_size=max_size,
+                n_permutations=n_permutations,
+                permutation_seed=permutation_seed,
+                elim_cutoff=elim_cutoff
+            )
+
+        if not res.empty:
+            res = finalize_result_table(res, index.term2name, index.metadata)
+            res_frames.append(with_contrast(res, name))
+            sig_frames.append(with_contrast(res[res["p.adjust"] <= padj_cutoff], name))
+
+        summary_frames.append(with_contrast(build_summary_df(
+            input_gene_count=input_counts[j],
+            background_gene_count=index.n_background,
+            deg_in_background_count=int(study_vec.sum()),
+            tested_go_term_count=len(res),
+            significant_go_term_count_fdr=int((res["p.adjust"] <= padj_cutoff).sum()) if not res.empty else 0
+        ), name))
+
+    return stack_frames(res_frames), stack_frames(sig_frames), stack_frames(summary_frames)
+
+
+def prepare_go_plot_subsets(
     df: pd.DataFrame,
     top_n: int = 10,
-    plot_metric: str = "fdr",
-    figsize=(12, 12)
-) -> Optional[bytes]:
+    plot_metric: str = "fdr"
+) -> Tuple[List[Tuple[str, pd.DataFrame]], str, str]:
+    """
+    准备 GO 条形图数据：每个大类（BP / CC / MF）按 plot_metric 取前 top_n 个 term。
+
+    返回 ([(ontology, 子表), ...], 横轴列名, 横轴标题)；没有可画的数据时子表列表为空。
+    """
     if df.empty:
-        return None
+        return [], "", ""
 
     df = df[df["ontology"].isin(["BP", "CC", "MF"])].copy()
     if df.empty:
-        return None
+        return [], "", ""
 
     if plot_metric == "fdr":
         score_col = "minus_log10_padj"
@@ -282,9 +780,29 @@ def create_go_barplot_bytes(
         sub["Description_short"] = sub["go_term_name"].fillna(sub["go_id"])
         subsets.append((onto, sub))
 
+    return subsets, score_col, x_label
+
+
+def create_go_barplot_bytes(
+    df: pd.DataFrame,
+    top_n: int = 10,
+    plot_metric: str = "fdr",
+    figsize=(12, 12),
+    dpi: int = 300,
+    image_format: str = "png"
+) -> Optional[bytes]:
+    """
+    GO 富集条形图，返回 image_format（png / svg / pdf）格式的 bytes。
+    """
+    image_format = check_image_format(image_format)
+
+    subsets, score_col, x_label = prepare_go_plot_subsets(df, top_n=top_n, plot_metric=plot_metric)
     if not subsets:
         return None
 
+    # matplotlib 导入较慢，只在真正出图时导入
+    import matplotlib.pyplot as plt
+
     n_panels = len(subsets)
     fig, axes = plt.subplots(n_panels, 1, figsize=figsize, constrained_layout=True)
 
@@ -299,7 +817,7 @@ def create_go_barplot_bytes(
         ax.set_ylabel("GO term")
 
     buf = io.BytesIO()
-    plt.savefig(buf, format="png", dpi=300, bbox_inches="tight")
+    plt.savefig(buf, format=image_format, dpi=dpi, bbox_inches="tight")
     plt.close(fig)
     buf.seek(0)
     return buf.getvalue()
\ No newline at end of file
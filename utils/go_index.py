@@ -0,0 +1,372 @@
+# -*- coding: utf-8 -*-
+
+"""
+GO 富集预编译索引
+
+把 data/go_mapping/ 下的四个文件：
+├── TERM2GENE_protein_coding.tsv
+├── TERM2NAME_protein_coding.tsv
+├── wheat_go_metadata.tsv
+└── wheat_protein_coding_genes.tsv
+
+编译成一个 GOIndex：
+1. 背景基因按字典序编码为整数；
+2. term -> gene 以 CSR 形式（indptr / indices）保存；
+3. 同时保存 term 大小、TERM2NAME 和 metadata 表。
+
+索引两级缓存：
+- 进程内：按源文件的 (大小, mtime) 缓存，所有 Streamlit 会话共享同一个对象；
+- 磁盘：data/cache/go_index_<内容哈希>.npz，进程重启后直接加载，不再解析 TSV。
+"""
+
+import hashlib
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+CACHE_DIR = PROJECT_ROOT / "data" / "cache"
+
+# 索引格式变化时加一，旧缓存自动失效
+GO_INDEX_VERSION = 1
+
+_INDEX_CACHE: Dict[Tuple, "GOIndex"] = {}
+_INDEX_LOCK = threading.Lock()
+
+
+class GOIndex:
+    """
+    GO 富集所需的全部数据，构建一次后只读共享。
+
+    gene_ids:
+        背景基因（排序后），数组下标即整数基因编号
+    term_ids:
+        GO term，顺序与 TERM2GENE 中首次出现的顺序一致
+    indptr / indices:
+        term -> gene 的 CSR 结构，第 i 个 term 的基因编号为
+        indices[indptr[i]:indptr[i + 1]]
+    term_sizes:
+        每个 term 在背景中的基因数
+    term2name / metadata:
+        与 load_term2name / load_go_metadata 返回的表一致
+    """
+
+    def __init__(
+        self,
+        gene_ids: np.ndarray,
+        term_ids: np.ndarray,
+        indptr: np.ndarray,
+        indices: np.ndarray,
+        term2name: pd.DataFrame,
+        metadata: pd.DataFrame,
+        content_hash: str = "",
+    ):
+        self.gene_ids = gene_ids
+        self.term_ids = term_ids
+        self.indptr = indptr
+        self.indices = indices
+        self.term_sizes = np.diff(indptr)
+        self.term2name = term2name
+        self.metadata = metadata
+        self.content_hash = content_hash
+        self._gene_codes: Optional[Dict[str, int]] = None
+        self._background_genes: Optional[Set[str]] = None
+        self._go_to_genes: Optional[Dict[str, Set[str]]] = None
+        self._membership = None
+
+    @property
+    def n_background(self) -> int:
+        return len(self.gene_ids)
+
+    @property
+    def n_terms(self) -> int:
+        return len(self.term_ids)
+
+    @property
+    def gene_codes(self) -> Dict[str, int]:
+        """
+        基因号 -> 整数编号，首次使用时构建。
+        """
+        if self._gene_codes is None:
+            self._gene_codes = {g: i for i, g in enumerate(self.gene_ids.tolist())}
+        return self._gene_codes
+
+    def encode_genes(self, genes: Iterable[str]) -> np.ndarray:
+        """
+        把基因号转换为整数编号，不在背景中的基因会被忽略。
+        """
+        codes = self.gene_codes
+        return np.array(
+            sorted({codes[g] for g in genes if g in codes}),
+            dtype=np.int64,
+        )
+
+    def background_genes(self) -> Set[str]:
+        """
+        背景基因集合，首次使用时构建；调用方不要修改返回的集合。
+        """
+        if self._background_genes is None:
+            self._background_genes = set(self.gene_ids.tolist())
+        return self._background_genes
+
+    @property
+    def membership(self):
+        """
+        term × gene 的 scipy.sparse CSR 0/1 矩阵，直接复用 indptr / indices。
+        """
+        if self._membership is None:
+            from scipy.sparse import csr_matrix
+
+            self._membership = csr_matrix(
+                (np.ones(len(self.indices), dtype=np.int32), self.indices, self.indptr),
+                shape=(self.n_terms, self.n_background),
+            )
+        return self._membership
+
+    def study_indicator(self, genes: Iterable[str]) -> np.ndarray:
+        """
+        长度为背景基因数的 0/1 向量，study 基因位置为 1。
+        """
+        vec = np.zeros(self.n_background, dtype=np.int32)
+        vec[self.encode_genes(genes)] = 1
+        return vec
+
+    def study_matrix(self, gene_sets: Iterable[Iterable[str]]):
+        """
+        多个 study 基因集合的 (集合数 × 背景基因数) scipy.sparse CSR 0/1 矩阵，
+        第 j 行等价于 study_indicator(gene_sets[j])。
+        """
+        from scipy.sparse import csr_matrix
+
+        rows = [self.encode_genes(genes) for genes in gene_sets]
+        indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum([len(r) for r in rows], out=indptr[1:])
+        indices = np.concatenate(rows) if rows else np.empty(0, dtype=np.int64)
+
+        return csr_matrix(
+            (np.ones(len(indices), dtype=np.int32), indices, indptr),
+            shape=(len(rows), self.n_background),
+        )
+
+    def term_genes(self, term_pos: int) -> np.ndarray:
+        return self.indices[self.indptr[term_pos]:self.indptr[term_pos + 1]]
+
+    def go_to_genes(self) -> Dict[str, Set[str]]:
+        """
+        还原成 build_go_to_genes 的 {go_id: 基因集合} 结构，首次使用时构建。
+        """
+        if self._go_to_genes is None:
+            genes = self.gene_ids
+            self._go_to_genes = {
+                go_id: set(genes[self.term_genes(i)].tolist())
+                for i, go_id in enumerate(self.term_ids.tolist())
+            }
+        return self._go_to_genes
+
+
+# ==============================
+# 构建
+# ==============================
+
+def build_go_index(
+    term2gene: pd.DataFrame,
+    term2name: pd.DataFrame,
+    metadata: pd.DataFrame,
+    background_genes: Set[str],
+    content_hash: str = "",
+) -> GOIndex:
+    """
+    从已经读取的四张表构建 GOIndex。
+
+    term2gene 中不在背景里的基因会被丢弃；term 顺序与首次出现顺序一致，
+    和 build_go_to_genes 生成的字典顺序相同。
+    """
+    gene_ids = np.array(sorted(background_genes), dtype=str)
+
+    t2g = term2gene[term2gene["gene_id"].isin(background_genes)]
+    term_codes, term_ids = pd.factorize(t2g["go_id"], sort=False)
+    gene_codes = np.searchsorted(gene_ids, t2g["gene_id"].to_numpy(dtype=str))
+
+    pairs = np.unique(
+        np.stack([term_codes.astype(np.int64), gene_codes.astype(np.int64)], axis=1),
+        axis=0,
+    ) if len(t2g) else np.empty((0, 2), dtype=np.int64)
+
+    counts = np.bincount(pairs[:, 0], minlength=len(term_ids))
+    indptr = np.zeros(len(term_ids) + 1, dtype=np.int64)
+    np.cumsum(counts, out=indptr[1:])
+
+    return GOIndex(
+        gene_ids=gene_ids,
+        term_ids=np.asarray(term_ids, dtype=str),
+        indptr=indptr,
+        indices=pairs[:, 1].astype(np.int32),
+        term2name=term2name.reset_index(drop=True),
+        metadata=metadata.reset_index(drop=True),
+        content_hash=content_hash,
+    )
+
+
+# ==============================
+# 磁盘缓存
+# ==============================
+
+def file_stat_key(paths: Tuple[str, ...]) -> Tuple:
+    """
+    进程内缓存键：文件路径 + 大小 + mtime，只需要 stat，不读文件内容。
+    """
+    key = []
+    for p in paths:
+        st = os.stat(p)
+        key.append((os.path.abspath(p), st.st_size, st.st_mtime_ns))
+    return tuple(key)
+
+
+def store_latest(cache: Dict[Tuple, object], stat_key: Tuple, value: object) -> None:
+    """
+    以 file_stat_key 为键写入进程内缓存；同一组文件（路径相同）只保留最新的一份，
+    文件变化后旧版本的索引随之释放。调用方负责加锁。
+    """
+    paths = [p for p, _, _ in stat_key]
+    for key in [k for k in cache if [p for p, _, _ in k] == paths]:
+        del cache[key]
+    cache[stat_key] = value
+
+
+def _content_hash(paths: Tuple[str, ...]) -> str:
+    """
+    磁盘缓存键：四个源文件内容的 sha1。
+    """
+    h = hashlib.sha1(f"go_index_v{GO_INDEX_VERSION}".encode())
+    for p in paths:
+        with open(p, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        h.update(b"\0")
+    return h.hexdigest()[:16]
+
+
+def _frame_to_arrays(prefix: str, df: pd.DataFrame) -> Dict[str, np.ndarray]:
+    return {
+        f"{prefix}__{col}": df[col].fillna("").to_numpy(dtype=str)
+        for col in df.columns
+    }
+
+
+def _arrays_to_frame(prefix: str, data) -> pd.DataFrame:
+    cols = [k.split("__", 1)[1] for k in data.files if k.startswith(f"{prefix}__")]
+    df = pd.DataFrame({c: data[f"{prefix}__{c}"].astype(object) for c in cols})
+    return df.replace("", np.nan)
+
+
+def save_go_index(index: GOIndex, path: Path) -> None:
+    """
+    写入 npz 缓存（先写临时文件再替换，避免并发进程读到半个文件）。
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(f".{os.getpid()}.tmp.npz")
+
+    np.savez(
+        tmp_path,
+        gene_ids=index.gene_ids,
+        term_ids=index.term_ids,
+        indptr=index.indptr,
+        indices=index.indices,
+        **_frame_to_arrays("term2name", index.term2name),
+        **_frame_to_arrays("metadata", index.metadata),
+    )
+    os.replace(tmp_path, path)
+
+
+def load_go_index_file(path: Path, content_hash: str = "") -> GOIndex:
+    with np.load(path, allow_pickle=False) as data:
+        return GOIndex(
+            gene_ids=data["gene_ids"],
+            term_ids=data["term_ids"],
+            indptr=data["indptr"],
+            indices=data["indices"],
+            term2name=_arrays_to_frame("term2name", data),
+            metadata=_arrays_to_frame("metadata", data),
+            content_hash=content_hash,
+        )
+
+
+def _build_from_files(paths: Tuple[str, ...], content_hash: str) -> GOIndex:
+    # 延迟导入，避免与 go_enrichment 循环引用
+    from utils.go_enrichment import (
+        load_background_genes,
+        load_go_metadata,
+        load_term2gene,
+        load_term2name,
+    )
+
+    term2gene_path, term2name_path, metadata_path, background_path = paths
+    return build_go_index(
+        term2gene=load_term2gene(term2gene_path),
+        term2name=load_term2name(term2name_path),
+        metadata=load_go_metadata(metadata_path),
+        background_genes=load_background_genes(background_path),
+        content_hash=content_hash,
+    )
+
+
+def get_go_index(
+    term2gene_path: str,
+    term2name_path: str,
+    metadata_path: str,
+    background_path: str,
+    cache_dir: Optional[Path] = None,
+) -> GOIndex:
+    """
+    获取 GOIndex。
+
+    - 源文件没有变化时，直接返回进程内共享的索引；
+    - 文件有变化（或进程刚启动）时，按内容哈希查找磁盘缓存；
+    - 磁盘缓存不存在时才解析 TSV 并写入缓存。
+    """
+    paths = (term2gene_path, term2name_path, metadata_path, background_path)
+    stat_key = file_stat_key(paths)
+
+    index = _INDEX_CACHE.get(stat_key)
+    if index is not None:
+        return index
+
+    with _INDEX_LOCK:
+        index = _INDEX_CACHE.get(stat_key)
+        if index is not None:
+            return index
+
+        content_hash = _content_hash(paths)
+        cache_path = Path(cache_dir or CACHE_DIR) / f"go_index_{content_hash}.npz"
+
+        index = None
+        if cache_path.exists():
+            try:
+                index = load_go_index_file(cache_path, content_hash)
+            except (OSError, ValueError, KeyError):
+                index = None
+
+        if index is None:
+            index = _build_from_files(paths, content_hash)
+            try:
+                save_go_index(index, cache_path)
+            except OSError:
+                # 只读部署环境写不了缓存时，仍然可以使用内存中的索引
+                pass
+
+        store_latest(_INDEX_CACHE, stat_key, index)
+
+        return index
+
+
+def clear_go_index_cache() -> None:
+    """
+    清空进程内缓存（磁盘缓存保留）。
+    """
+    with _INDEX_LOCK:
+        _INDEX_CACHE.clear()
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+
+"""
+小麦 A/B/D 同源基因（homoeolog）分组
+
+六倍体小麦的一次表达变化常常同时体现在三个亚基因组的同源基因上，
+直接做富集时 Count 会被放大。这里把 cs_self_homolog_map 中的同源对
+看作图的边，用连通分量把基因合并成 homoeolog 组：
+
+1. 同源对只查询一次（get_cs_self_homolog_pairs），不逐个基因查询；
+2. 基因按字典序编码，组号保存在与之对齐的整数数组中；
+3. 每组以组内字典序最小的基因号作为组名，不在任何同源对中的基因自成一组；
+4. 索引在进程内只构建一次，所有 Streamlit 会话共享。
+"""
+
+import threading
+from typing import Callable, Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import coo_matrix, csr_matrix
+from scipy.sparse.csgraph import connected_components
+
+from utils.cache_util import DerivedCache
+
+
+_INDEX: Optional["HomoeologIndex"] = None
+_INDEX_LOCK = threading.Lock()
+
+
+class HomoeologIndex:
+    """
+    基因 -> homoeolog 组的数组索引。
+
+    gene_ids:
+        出现在同源对中的基因（排序后），数组下标即基因编号
+    group_codes:
+        与 gene_ids 对齐的组编号
+    group_labels:
+        组编号 -> 组名（组内字典序最小的基因号）
+    """
+
+    def __init__(self, gene_ids: np.ndarray, group_codes: np.ndarray):
+        self.gene_ids = gene_ids
+        self.group_codes = group_codes
+
+        # gene_ids 已排序，每组第一次出现的位置就是组内最小的基因号
+        n_groups = int(group_codes.max()) + 1 if len(group_codes) else 0
+        first = np.full(n_groups, len(gene_ids), dtype=np.int64)
+        np.minimum.at(first, group_codes, np.arange(len(gene_ids)))
+        self.group_labels = gene_ids[first] if n_groups else gene_ids[:0]
+
+        self._derived = DerivedCache()
+
+    @property
+    def n_groups(self) -> int:
+        return len(self.group_labels)
+
+    def labels_for(self, genes: Iterable[str]) -> np.ndarray:
+        """
+        基因号 -> 组名；不在任何同源对中的基因返回自身。
+        """
+        genes = np.asarray(list(genes), dtype=str)
+        if len(genes) == 0 or len(self.gene_ids) == 0:
+            return genes.astype(object)
+
+        pos = np.minimum(np.searchsorted(self.gene_ids, genes), len(self.gene_ids) - 1)
+        found = self.gene_ids[pos] == genes
+
+        labels = genes.astype(object)
+        labels[found] = self.group_labels[self.group_codes[pos[found]]]
+        return labels
+
+    def collapse(self, gene_ids: np.ndarray, matrix: csr_matrix) -> Tuple[np.ndarray, csr_matrix]:
+        """
+        把 (行 × 基因) 的 0/1 矩阵合并为 (行 × 组) 的 0/1 矩阵。
+
+        返回 (排序后的组名, 合并后的 CSR 矩阵)；某一行只要包含组内任一基因，
+        合并后就包含该组。
+        """
+        labels, codes = np.unique(self.labels_for(gene_ids).astype(str), return_inverse=True)
+
+        projection = csr_matrix(
+            (np.ones(len(codes), dtype=np.int32), (np.arange(len(codes)), codes)),
+            shape=(len(codes), len(labels)),
+        )
+
+        collapsed = (matrix @ projection).tocsr()
+        collapsed.data[:] = 1
+        collapsed.sort_indices()
+        return labels, collapsed
+
+    def derived(self, source: object, build: Callable[[object], object]) -> object:
+        """
+        缓存由 source（GOIndex / KeggIndex 等进程内共享的索引）合并得到的新索引，
+        同一个 source 只合并一次。
+        """
+        return self._derived.get(source, build)
+
+
+def build_homoeolog_index(pairs: pd.DataFrame) -> HomoeologIndex:
+    """
+    由同源对表 (cs_gene_id, self_homolog_gene_id) 构建 HomoeologIndex。
+    """
+    if pairs.empty:
+        return HomoeologIndex(np.array([], dtype=str), np.array([], dtype=np.int64))
+
+    left = pairs["cs_gene_id"].to_numpy(dtype=str)
+    right = pairs["self_homolog_gene_id"].to_numpy(dtype=str)
+
+    gene_ids, codes = np.unique(np.concatenate([left, right]), return_inverse=True)
+    n = len(gene_ids)
+
+    graph = coo_matrix(
+        (np.ones(len(left), dtype=np.int8), (codes[:len(left)], codes[len(left):])),
+        shape=(n, n),
+    )
+    _, group_codes = connected_components(graph, directed=False)
+
+    return HomoeologIndex(gene_ids, group_codes.astype(np.int64))
+
+
+def get_homoeolog_index() -> HomoeologIndex:
+    """
+    获取进程内共享的 HomoeologIndex，第一次调用时查询数据库并构建。
+    """
+    global _INDEX
+
+    if _INDEX is not None:
+        return _INDEX
+
+    with _INDEX_LOCK:
+        if _INDEX is None:
+            # 延迟导入：只有启用同源合并时才需要数据库
+            from utils.db_query import get_cs_self_homolog_pairs
+
+            _INDEX = build_homoeolog_index(get_cs_self_homolog_pairs())
+        return _INDEX
+
+
+def clear_homoeolog_index_cache() -> None:
+    global _INDEX
+
+    with _INDEX_LOCK:
+        _INDEX = None
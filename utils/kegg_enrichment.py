@@ -19,39 +19,31 @@ data/kegg_mapping/
 
 import io
 import textwrap
+import threading
+from itertools import chain
+
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
 
+from scipy.sparse import csr_matrix
 from scipy.stats import hypergeom
 
+from utils.batch import run_contrast_chunks, stack_frames, with_contrast
+from utils.go_index import file_stat_key, store_latest
+from utils.homoeolog import get_homoeolog_index
+from utils.permutation import permutation_pvalues
+from utils.plot_cache import check_image_format
+from utils.stats import bh_adjust, storey_qvalues
 
-# ==============================
-# 基础工具函数
-# ==============================
-
-def bh_adjust(pvalues):
-    """
-    Benjamini-Hochberg FDR 校正
-    """
-    pvalues = np.asarray(pvalues, dtype=float)
-    n = len(pvalues)
-
-    if n == 0:
-        return np.array([])
-
-    order = np.argsort(pvalues)
-    ranked = pvalues[order]
-
-    adjusted = ranked * n / np.arange(1, n + 1)
-    adjusted = np.minimum.accumulate(adjusted[::-1])[::-1]
-    adjusted = np.clip(adjusted, 0, 1)
 
-    result = np.empty(n)
-    result[order] = adjusted
+# 进程内共享的 KeggIndex：{三个 TSV 的 stat 键: KeggIndex}
+_INDEX_CACHE = {}
+_INDEX_LOCK = threading.Lock()
 
-    return result
 
+# ==============================
+# 基础工具函数
+# ==============================
 
 def wrap_text(text, width=42):
     """
@@ -134,38 +126,28 @@ def load_gene2ko(gene2ko_path):
             f"{gene2ko_path} 必须包含列 gene_id 和 ko_list，当前列名为：{list(df.columns)}"
         )
 
-    df = df[["gene_id", "ko_list"]].copy()
-    df.columns = ["gene", "KO"]
+    df = df[["gene_id", "ko_list"]].dropna()
+    df = df[(df["gene_id"] != "") & (df["ko_list"] != "")]
 
-    df = df.dropna()
-    df = df[(df["gene"] != "") & (df["KO"] != "")]
+    # 拆分多个 KO：每行只 split 一次，再按 KO 个数重复基因号
+    ko_lists = df["ko_list"].str.split(";").tolist()
+    genes = np.repeat(df["gene_id"].to_numpy(dtype=object), [len(x) for x in ko_lists])
 
-    # 拆分多个 KO
-    df["KO"] = df["KO"].str.split(";")
-    df = df.explode("KO")
+    df = pd.DataFrame({
+        "gene": pd.Series(genes, dtype=object).str.strip(),
+        "KO": pd.Series(list(chain.from_iterable(ko_lists)), dtype=object).str.strip(),
+    })
 
-    df["gene"] = df["gene"].astype(str).str.strip()
-    df["KO"] = df["KO"].astype(str).str.strip()
+    df = df[(df["gene"] != "") & df["KO"].str.startswith("K")]
 
-    df = df[(df["gene"] != "") & (df["KO"] != "")]
-    df = df[df["KO"].str.startswith("K")]
-
-    df = df.drop_duplicates()
+    df = df.drop_duplicates().reset_index(drop=True)
 
     return df
 
 
-def load_kegg_mapping(ko2pathway_path, pathway2name_path):
+def _read_kegg_tables(ko2pathway_path, pathway2name_path):
     """
-    读取本地 KEGG 注释文件。
-
-    kegg_ko2pathway.tsv:
-        KO      pathway
-        K00001  ko00010
-
-    kegg_pathway2name.tsv:
-        pathway     Description
-        ko00010     Glycolysis / Gluconeogenesis
+    读取并清理 KO -> pathway 和 pathway -> 名称两张表。
     """
 
     ko2pathway = pd.read_csv(ko2pathway_path, sep="\t", dtype=str)
@@ -200,6 +182,24 @@ def load_kegg_mapping(ko2pathway_path, pathway2name_path):
 
     ko2pathway = ko2pathway.drop_duplicates()
 
+    return ko2pathway, pathway2name
+
+
+def load_kegg_mapping(ko2pathway_path, pathway2name_path):
+    """
+    读取本地 KEGG 注释文件。
+
+    kegg_ko2pathway.tsv:
+        KO      pathway
+        K00001  ko00010
+
+    kegg_pathway2name.tsv:
+        pathway     Description
+        ko00010     Glycolysis / Gluconeogenesis
+    """
+
+    ko2pathway, pathway2name = _read_kegg_tables(ko2pathway_path, pathway2name_path)
+
     pathway_to_kos = (
         ko2pathway
         .groupby("pathway")["KO"]
@@ -215,54 +215,317 @@ def load_kegg_mapping(ko2pathway_path, pathway2name_path):
 
 
 # ==============================
-# KEGG 富集分析
+# KEGG 索引
 # ==============================
 
-def add_gene_name_columns(result_df, background, deg_genes):
+class KeggIndex:
     """
-    给富集结果添加：
-    AllGeneNames
-    DEG_GeneNames
+    预编译的 KEGG 富集索引。
+
+    ko_ids:
+        背景 KO（有基因注释的 KO），排序后数组下标即 KO 编号
+    pathway_ids / pathway_names:
+        pathway 及其名称，顺序与 pathway_to_kos 一致
+    membership:
+        pathway × KO 的 0/1 稀疏矩阵，只保留背景中的 KO
+    pathway_sizes:
+        每个 pathway 在背景中的 KO 数（与 DEG 无关，预先算好）
+    gene_ids:
+        背景基因（有 KO 注释），排序后数组下标即基因编号
+    ko_genes:
+        KO × gene 的 0/1 稀疏矩阵，用于直接得到通路对应的基因名
     """
 
-    if result_df.empty:
-        return result_df
+    def __init__(self, ko_ids, pathway_ids, pathway_names, membership, gene_ids, ko_genes):
+        self.ko_ids = ko_ids
+        self.pathway_ids = pathway_ids
+        self.pathway_names = pathway_names
+        self.membership = membership
+        self.pathway_sizes = np.diff(membership.indptr)
+        self.gene_ids = gene_ids
+        self.ko_genes = ko_genes
+        self.ko_codes = {ko: i for i, ko in enumerate(ko_ids.tolist())}
+        self.gene_codes = {g: i for i, g in enumerate(gene_ids.tolist())}
+        self._gene_kos = None
+
+    @property
+    def n_kos(self):
+        return len(self.ko_ids)
+
+    @property
+    def n_genes(self):
+        return len(self.gene_ids)
+
+    @property
+    def gene_kos(self):
+        """
+        gene × KO 的 0/1 稀疏矩阵（ko_genes 的转置），首次使用时构建。
+        """
+        if self._gene_kos is None:
+            self._gene_kos = self.ko_genes.T.tocsr()
+        return self._gene_kos
+
+    def ko_indicator(self, kos):
+        """
+        长度为背景 KO 数的 0/1 向量。
+        """
+        vec = np.zeros(self.n_kos, dtype=np.int32)
+        codes = [self.ko_codes[ko] for ko in kos if ko in self.ko_codes]
+        vec[codes] = 1
+        return vec
+
+    def gene_indicator(self, genes):
+        """
+        长度为背景基因数的 0/1 向量，不在背景中的基因被忽略。
+        """
+        vec = np.zeros(self.n_genes, dtype=np.int32)
+        codes = [self.gene_codes[g] for g in genes if g in self.gene_codes]
+        vec[codes] = 1
+        return vec
+
+    def deg_ko_indicator(self, gene_vec):
+        """
+        由 DEG 基因 0/1 向量得到前景 KO 的 0/1 向量（DEG 基因注释到的 KO）。
+        """
+        return (self.ko_genes @ gene_vec > 0).astype(np.int32)
+
+    def gene_matrix(self, gene_lists):
+        """
+        多个基因列表的 (列表数 × 背景基因数) 0/1 稀疏矩阵。
+        """
+        rows = []
+        cols = []
+        for i, genes in enumerate(gene_lists):
+            codes = {self.gene_codes[g] for g in genes if g in self.gene_codes}
+            rows.extend([i] * len(codes))
+            cols.extend(codes)
+
+        return csr_matrix(
+            (np.ones(len(rows), dtype=np.int32), (rows, cols)),
+            shape=(len(gene_lists), self.n_genes),
+        )
 
-    ko_to_all_genes = (
-        background
-        .groupby("KO")["gene"]
-        .apply(lambda x: sorted(set(x)))
-        .to_dict()
+    def gene_names_for(self, ko_matrix, deg_gene_vec):
+        """
+        根据 (行 × KO) 的 0/1 矩阵，返回每行对应的
+        (全部背景基因名, DEG 基因名) 两个字符串列表，基因名以 "; " 分隔。
+        """
+        row_genes = ko_matrix @ self.ko_genes
+        all_names = _join_rows(row_genes, self.gene_ids, "; ")
+        deg_names = _join_rows(row_genes.multiply(deg_gene_vec), self.gene_ids, "; ")
+        return all_names, deg_names
+
+
+def build_kegg_index(background, pathway_to_kos, pathway_to_name):
+    """
+    根据 gene-KO 背景和 pathway -> KO 映射构建 KeggIndex。
+    """
+    ko_ids = np.array(sorted(background["KO"].unique()), dtype=str)
+    gene_ids = np.array(sorted(background["gene"].unique()), dtype=str)
+    ko_codes = {ko: i for i, ko in enumerate(ko_ids.tolist())}
+
+    pathway_ids = list(pathway_to_kos)
+
+    indptr = [0]
+    indices = []
+    for pathway in pathway_ids:
+        codes = sorted(ko_codes[ko] for ko in pathway_to_kos[pathway] if ko in ko_codes)
+        indices.extend(codes)
+        indptr.append(len(indices))
+
+    membership = csr_matrix(
+        (
+            np.ones(len(indices), dtype=np.int32),
+            np.asarray(indices, dtype=np.int32),
+            np.asarray(indptr, dtype=np.int64),
+        ),
+        shape=(len(pathway_ids), len(ko_ids)),
     )
 
-    deg_background = background[background["gene"].isin(deg_genes)].copy()
+    ko_genes = csr_matrix(
+        (
+            np.ones(len(background), dtype=np.int32),
+            (
+                np.searchsorted(ko_ids, background["KO"].to_numpy(dtype=str)),
+                np.searchsorted(gene_ids, background["gene"].to_numpy(dtype=str)),
+            ),
+        ),
+        shape=(len(ko_ids), len(gene_ids)),
+    )
 
-    ko_to_deg_genes = (
-        deg_background
-        .groupby("KO")["gene"]
-        .apply(lambda x: sorted(set(x)))
-        .to_dict()
+    pathway_names = np.array(
+        [pathway_to_name.get(p, p) for p in pathway_ids],
+        dtype=object,
+    )
+
+    return KeggIndex(
+        ko_ids=ko_ids,
+        pathway_ids=np.array(pathway_ids, dtype=object),
+        pathway_names=pathway_names,
+        membership=membership,
+        gene_ids=gene_ids,
+        ko_genes=ko_genes,
+    )
+
+
+def build_kegg_index_from_tables(background, ko2pathway, pathway2name):
+    """
+    直接由 gene-KO 背景表和 KO -> pathway 表构建 KeggIndex，
+    基因、KO、pathway 都先编码为整数，不经过 {pathway: KO 集合} 字典。
+
+    结果与 build_kegg_index(background, *load_kegg_mapping(...)[:2]) 相同。
+    """
+    gene_ids, gene_codes = np.unique(background["gene"].to_numpy(dtype=str), return_inverse=True)
+    ko_ids, ko_codes = np.unique(background["KO"].to_numpy(dtype=str), return_inverse=True)
+
+    ko_genes = csr_matrix(
+        (np.ones(len(background), dtype=np.int32), (ko_codes, gene_codes)),
+        shape=(len(ko_ids), len(gene_ids)),
+    )
+
+    # groupby 默认按 pathway 排序，这里保持同样的顺序
+    pathway_ids, pathway_codes = np.unique(
+        ko2pathway["pathway"].to_numpy(dtype=str),
+        return_inverse=True
+    )
+
+    pathway_kos = ko2pathway["KO"].to_numpy(dtype=str)
+    pos = np.minimum(np.searchsorted(ko_ids, pathway_kos), max(len(ko_ids) - 1, 0))
+    in_background = (ko_ids[pos] == pathway_kos) if len(ko_ids) else np.zeros(len(pathway_kos), dtype=bool)
+
+    membership = csr_matrix(
+        (
+            np.ones(int(in_background.sum()), dtype=np.int32),
+            (pathway_codes[in_background], pos[in_background]),
+        ),
+        shape=(len(pathway_ids), len(ko_ids)),
+    )
+    membership.sort_indices()
+
+    pathway_to_name = dict(zip(pathway2name["pathway"], pathway2name["Description"]))
+    pathway_names = np.array(
+        [pathway_to_name.get(p, p) for p in pathway_ids.tolist()],
+        dtype=object,
     )
 
-    all_gene_names_list = []
-    deg_gene_names_list = []
+    return KeggIndex(
+        ko_ids=ko_ids,
+        pathway_ids=pathway_ids.astype(object),
+        pathway_names=pathway_names,
+        membership=membership,
+        gene_ids=gene_ids,
+        ko_genes=ko_genes,
+    )
+
+
+def get_kegg_index(gene2ko_path, ko2pathway_path, pathway2name_path):
+    """
+    获取 KeggIndex，每个进程只构建一次，所有 Streamlit 会话共享。
+
+    缓存键为三个 TSV 的 (路径, 大小, mtime)，任一文件变化后自动重建。
+    """
+    paths = (gene2ko_path, ko2pathway_path, pathway2name_path)
+    stat_key = file_stat_key(paths)
+
+    index = _INDEX_CACHE.get(stat_key)
+    if index is not None:
+        return index
+
+    with _INDEX_LOCK:
+        index = _INDEX_CACHE.get(stat_key)
+        if index is not None:
+            return index
+
+        background = load_gene2ko(gene2ko_path)
+        ko2pathway, pathway2name = _read_kegg_tables(ko2pathway_path, pathway2name_path)
+        index = build_kegg_index_from_tables(background, ko2pathway, pathway2name)
+
+        store_latest(_INDEX_CACHE, stat_key, index)
 
-    for _, row in result_df.iterrows():
-        kos_in_pathway = str(row["geneID"]).split("/")
+        return index
 
-        all_genes = []
-        deg_genes_in_pathway = []
 
-        for ko in kos_in_pathway:
-            all_genes.extend(ko_to_all_genes.get(ko, []))
-            deg_genes_in_pathway.extend(ko_to_deg_genes.get(ko, []))
+def clear_kegg_index_cache():
+    """
+    清空进程内缓存的 KeggIndex。
+    """
+    with _INDEX_LOCK:
+        _INDEX_CACHE.clear()
+
 
-        all_gene_names_list.append("; ".join(sorted(set(all_genes))))
-        deg_gene_names_list.append("; ".join(sorted(set(deg_genes_in_pathway))))
+def collapse_kegg_index(index, homoeologs):
+    """
+    把 KeggIndex 的背景基因合并为 homoeolog 组（KO × 组），pathway × KO 结构不变。
+    合并结果按源索引缓存，只计算一次。
+    """
+    def build(source):
+        labels, ko_groups = homoeologs.collapse(source.gene_ids, source.ko_genes)
+        return KeggIndex(
+            ko_ids=source.ko_ids,
+            pathway_ids=source.pathway_ids,
+            pathway_names=source.pathway_names,
+            membership=source.membership,
+            gene_ids=labels,
+            ko_genes=ko_groups,
+        )
+
+    return homoeologs.derived(index, build)
+
+
+def _join_rows(matrix, labels, sep):
+    """
+    把稀疏矩阵每一行的非零列对应的 labels 拼成字符串。
+    列编号按 labels 排序分配，因此结果天然有序。
+    """
+    matrix = matrix.tocsr()
+    matrix.eliminate_zeros()
+    matrix.sort_indices()
+    indptr = matrix.indptr
+    indices = matrix.indices
+    return [
+        sep.join(labels[indices[indptr[i]:indptr[i + 1]]].tolist())
+        for i in range(matrix.shape[0])
+    ]
+
+
+# ==============================
+# KEGG 富集分析
+# ==============================
+
+def add_gene_name_columns(result_df, background, deg_genes, index=None):
+    """
+    给富集结果添加：
+    AllGeneNames
+    DEG_GeneNames
+
+    run_kegg_enrichment 已经在富集时直接生成这两列；
+    这个函数保留给只有结果表（geneID 字符串）的旧调用方式。
+    """
+
+    if result_df.empty:
+        return result_df
+
+    if index is None:
+        index = build_kegg_index(background, {}, {})
+
+    ko_codes = index.ko_codes
+    rows = []
+    cols = []
+    for i, gene_id_str in enumerate(result_df["geneID"].astype(str)):
+        for ko in gene_id_str.split("/"):
+            if ko in ko_codes:
+                rows.append(i)
+                cols.append(ko_codes[ko])
+
+    ko_matrix = csr_matrix(
+        (np.ones(len(rows), dtype=np.int32), (rows, cols)),
+        shape=(len(result_df), index.n_kos),
+    )
+    all_names, deg_names = index.gene_names_for(ko_matrix, index.gene_indicator(deg_genes))
 
     result_df = result_df.copy()
-    result_df["AllGeneNames"] = all_gene_names_list
-    result_df["DEG_GeneNames"] = deg_gene_names_list
+    result_df["AllGeneNames"] = all_names
+    result_df["DEG_GeneNames"] = deg_names
 
     return result_df
 
@@ -274,7 +537,10 @@ def run_kegg_enrichment(
     pathway2name_path,
     min_size=3,
     max_size=500,
-    pvalue_cutoff=0.05
+    pvalue_cutoff=0.05,
+    n_permutations=0,
+    permutation_seed=0,
+    collapse_homoeologs=False
 ):
     """
     KEGG 富集主函数。
@@ -300,95 +566,154 @@ def run_kegg_enrichment(
 
     pvalue_cutoff:
         显著性阈值。小麦 KEGG 注释不充分时，推荐用 pvalue。
-    """
 
-    # 清理输入基因
-    deg_genes = [str(g).strip() for g in gene_list if str(g).strip()]
-    deg_genes = list(dict.fromkeys(deg_genes))
+    n_permutations:
+        大于 0 时额外做置换检验：从背景基因中随机抽取与 DEG 同样多的基因，
+        映射为 KO 集合后计算 overlap，结果增加 perm_pvalue、perm_p.adjust、perm_n 三列
 
-    background = load_gene2ko(gene2ko_path)
-    pathway_to_kos, pathway_to_name, ko2pathway, pathway2name = load_kegg_mapping(
-        ko2pathway_path,
-        pathway2name_path
-    )
+    permutation_seed:
+        置换检验的随机种子
 
-    universe_kos = set(background["KO"].unique())
+    collapse_homoeologs:
+        是否先把 DEG 和背景基因合并为 A/B/D homoeolog 组。
+        KEGG 在 KO 层面检验，同一组的基因通常注释到相同 KO，所以 Count 基本不变；
+        变化的是按组计数的映射基因数、以组名列出的基因名，以及按组抽样的置换检验
+    """
 
-    deg_background = background[background["gene"].isin(deg_genes)].copy()
-    deg_kos = set(deg_background["KO"].unique())
+    deg_genes = _clean_gene_list(gene_list)
+
+    # 注释文件只在第一次使用（或文件变化）时解析，之后直接复用索引
+    index = get_kegg_index(gene2ko_path, ko2pathway_path, pathway2name_path)
+
+    study_genes = deg_genes
+    if collapse_homoeologs:
+        homoeologs = get_homoeolog_index()
+        index = collapse_kegg_index(index, homoeologs)
+        study_genes = homoeologs.labels_for(deg_genes)
+
+    gene_vec = index.gene_indicator(study_genes)
+    deg_vec = index.deg_ko_indicator(gene_vec)
+
+    return _enrich_from_counts(
+        index,
+        deg_genes,
+        gene_vec,
+        deg_vec,
+        index.membership @ deg_vec,
+        min_size=min_size,
+        max_size=max_size,
+        pvalue_cutoff=pvalue_cutoff,
+        n_permutations=n_permutations,
+        permutation_seed=permutation_seed
+    )
 
-    mapped_gene_count = len(set(deg_genes) & set(background["gene"]))
 
+def _clean_gene_list(gene_list):
+    """
+    去空白、去重，保持原顺序
+    """
+    deg_genes = [str(g).strip() for g in gene_list if str(g).strip()]
+    return list(dict.fromkeys(deg_genes))
+
+
+def _enrich_from_counts(
+    index,
+    deg_genes,
+    gene_vec,
+    deg_vec,
+    overlap_counts,
+    min_size,
+    max_size,
+    pvalue_cutoff,
+    n_permutations=0,
+    permutation_seed=0
+):
+    """
+    已知 DEG 基因向量、前景 KO 向量和每个 pathway 的 overlap 数时，
+    完成检验、校正并生成 (全部结果, 显著结果, 摘要)。单列表和批量模式共用。
+    """
     summary_df = pd.DataFrame([
         ["输入 DEG 基因数", len(deg_genes)],
-        ["成功映射到 KO 的 DEG 基因数", mapped_gene_count],
-        ["前景 KO 数", len(deg_kos)],
-        ["背景基因数（有 KO 注释）", background["gene"].nunique()],
-        ["背景 gene-KO 映射条目数", len(background)],
-        ["背景 KO 数", len(universe_kos)],
-        ["本地 KEGG pathway 数", len(pathway_to_kos)],
+        ["成功映射到 KO 的 DEG 基因数", int(gene_vec.sum())],
+        ["前景 KO 数", int(deg_vec.sum())],
+        ["背景基因数（有 KO 注释）", index.n_genes],
+        ["背景 gene-KO 映射条目数", index.ko_genes.nnz],
+        ["背景 KO 数", index.n_kos],
+        ["本地 KEGG pathway 数", len(index.pathway_ids)],
         ["pvalue 阈值", pvalue_cutoff],
         ["最小 pathway KO 数", min_size],
         ["最大 pathway KO 数", max_size],
     ], columns=["项目", "数值"])
 
-    if len(deg_kos) < 3:
+    if deg_vec.sum() < 3:
         empty = pd.DataFrame()
         return empty, empty, summary_df
 
-    M = len(universe_kos)
-    N = len(deg_kos)
-
-    results = []
+    M = index.n_kos
+    N = int(deg_vec.sum())
 
-    for pathway, pathway_kos_all in pathway_to_kos.items():
+    pathway_sizes = index.pathway_sizes
 
-        pathway_kos_in_bg = set(pathway_kos_all) & universe_kos
-        n = len(pathway_kos_in_bg)
-
-        if n < min_size or n > max_size:
-            continue
-
-        overlap_kos = pathway_kos_in_bg & deg_kos
-        k = len(overlap_kos)
-
-        if k == 0:
-            continue
-
-        pvalue = hypergeom.sf(k - 1, M, n, N)
-
-        gene_ratio = f"{k}/{N}"
-        bg_ratio = f"{n}/{M}"
-
-        rich_factor = k / n
-        fold_enrichment = (k / N) / (n / M)
-
-        results.append({
-            "ID": pathway,
-            "Description": pathway_to_name.get(pathway, pathway),
-            "GeneRatio": gene_ratio,
-            "BgRatio": bg_ratio,
-            "pvalue": pvalue,
-            "geneID": "/".join(sorted(overlap_kos)),
-            "Count": k,
-            "InputNumber": k,
-            "PathwayKoNumberInBackground": n,
-            "RichFactor": rich_factor,
-            "FoldEnrichment": fold_enrichment
-        })
+    keep = np.flatnonzero(
+        (pathway_sizes >= min_size) &
+        (pathway_sizes <= max_size) &
+        (overlap_counts > 0)
+    )
 
-    result_df = pd.DataFrame(results)
+    if len(keep) == 0:
+        empty = pd.DataFrame()
+        return empty, empty, summary_df
 
-    if result_df.empty:
-        return result_df, result_df, summary_df
+    k = overlap_counts[keep].astype(np.int64)
+    n = pathway_sizes[keep].astype(np.int64)
+
+    pvalues = hypergeom.sf(k - 1, M, n, N)
+
+    overlap = index.membership[keep].multiply(deg_vec).tocsr()
+    all_gene_names, deg_gene_names = index.gene_names_for(overlap, gene_vec)
+
+    k_str = k.astype(str).astype(object)
+    n_str = n.astype(str).astype(object)
+
+    result_df = pd.DataFrame({
+        "ID": index.pathway_ids[keep],
+        "Description": index.pathway_names[keep],
+        "GeneRatio": k_str + f"/{N}",
+        "BgRatio": n_str + f"/{M}",
+        "pvalue": pvalues,
+        "geneID": _join_rows(overlap, index.ko_ids, "/"),
+        "Count": k,
+        "InputNumber": k,
+        "PathwayKoNumberInBackground": n,
+        "RichFactor": k / n,
+        "FoldEnrichment": (k / N) / (n / M),
+        "AllGeneNames": all_gene_names,
+        "DEG_GeneNames": deg_gene_names
+    })
 
     result_df["p.adjust"] = bh_adjust(result_df["pvalue"].values)
-    result_df["qvalue"] = result_df["p.adjust"]
+    result_df["qvalue"] = storey_qvalues(result_df["pvalue"].values)
 
     result_df["minus_log10_pvalue"] = -np.log10(
         result_df["pvalue"].replace(0, 1e-300)
     )
 
+    perm_cols = []
+    if n_permutations > 0:
+        perm_p, perm_n = permutation_pvalues(
+            index.membership[keep],
+            k,
+            set_size=int(gene_vec.sum()),
+            n_background=index.n_genes,
+            gene_to_feature=index.gene_kos,
+            n_permutations=n_permutations,
+            seed=permutation_seed
+        )
+        result_df["perm_pvalue"] = perm_p
+        result_df["perm_p.adjust"] = bh_adjust(perm_p)
+        result_df["perm_n"] = perm_n
+        perm_cols = ["perm_pvalue", "perm_p.adjust", "perm_n"]
+
     result_df = result_df.sort_values(
         ["pvalue", "RichFactor", "Count"],
         ascending=[True, False, False]
@@ -409,16 +734,12 @@ def run_kegg_enrichment(
             "InputNumber",
             "PathwayKoNumberInBackground",
             "RichFactor",
-            "FoldEnrichment"
-        ]
+            "FoldEnrichment",
+            "AllGeneNames",
+            "DEG_GeneNames"
+        ] + perm_cols
     ]
 
-    result_df = add_gene_name_columns(
-        result_df=result_df,
-        background=background,
-        deg_genes=deg_genes
-    )
-
     sig_df = result_df[result_df["pvalue"] <= pvalue_cutoff].copy()
 
     summary_extra = pd.DataFrame([
@@ -431,6 +752,96 @@ def run_kegg_enrichment(
     return result_df, sig_df, summary_df
 
 
+def run_kegg_enrichment_batch(
+    gene_lists,
+    gene2ko_path,
+    ko2pathway_path,
+    pathway2name_path,
+    min_size=3,
+    max_size=500,
+    pvalue_cutoff=0.05,
+    n_permutations=0,
+    permutation_seed=0,
+    collapse_homoeologs=False,
+    n_jobs=1
+):
+    """
+    多个 DEG 列表（contrast）的批量 KEGG 富集。
+
+    gene_lists:
+        {contrast 名称: 基因列表}
+
+    collapse_homoeologs:
+        含义与 run_kegg_enrichment 相同
+
+    n_jobs:
+        大于 1 时把 contrast 分组后放到进程池中计算
+
+    返回的三张表与 run_kegg_enrichment 一致，第一列为 contrast，按输入顺序堆叠。
+    注释文件只读取一次；所有 contrast 的前景 KO 和 overlap 数分别由一次稀疏矩阵乘法得到，
+    BH 校正在每个 contrast 内部独立进行。
+    """
+
+    if n_jobs > 1 and len(gene_lists) > 1:
+        result_df, sig_df, summary_df = run_contrast_chunks(
+            run_kegg_enrichment_batch,
+            gene_lists,
+            n_jobs,
+            gene2ko_path=gene2ko_path,
+            ko2pathway_path=ko2pathway_path,
+            pathway2name_path=pathway2name_path,
+            min_size=min_size,
+            max_size=max_size,
+            pvalue_cutoff=pvalue_cutoff,
+            n_permutations=n_permutations,
+            permutation_seed=permutation_seed,
+            collapse_homoeologs=collapse_homoeologs
+        )
+        return result_df, sig_df, summary_df
+
+    # 注释文件只在第一次使用（或文件变化）时解析，之后直接复用索引
+    index = get_kegg_index(gene2ko_path, ko2pathway_path, pathway2name_path)
+
+    names = list(gene_lists)
+    deg_lists = [_clean_gene_list(gene_lists[name]) for name in names]
+    study_lists = deg_lists
+
+    if collapse_homoeologs:
+        homoeologs = get_homoeolog_index()
+        index = collapse_kegg_index(index, homoeologs)
+        study_lists = [homoeologs.labels_for(genes) for genes in deg_lists]
+
+    # contrast × gene -> contrast × KO -> pathway × contrast
+    genes = index.gene_matrix(study_lists)
+    deg_kos = ((genes @ index.ko_genes.T).toarray() > 0).astype(np.int32)
+    overlap = index.membership @ deg_kos.T
+
+    result_frames = []
+    sig_frames = []
+    summary_frames = []
+
+    for j, name in enumerate(names):
+        result_df, sig_df, summary_df = _enrich_from_counts(
+            index,
+            deg_lists[j],
+            genes[j].toarray().ravel(),
+            deg_kos[j],
+            overlap[:, j],
+            min_size=min_size,
+            max_size=max_size,
+            pvalue_cutoff=pvalue_cutoff,
+            n_permutations=n_permutations,
+            permutation_seed=permutation_seed
+        )
+
+        if not result_df.empty:
+            result_frames.append(with_contrast(result_df, name))
+            sig_frames.append(with_contrast(sig_df, name))
+        summary_frames.append(with_contrast(summary_df, name))
+
+    return stack_frames(result_frames), stack_frames(sig_frames), stack_frames(summary_frames)
+
+
 # ==============================
 # 绘图数据准备
 # ==============================
@@ -501,12 +912,17 @@ def create_kegg_bubbleplot_bytes(
     clip_quantile=0.95,
     clip_fixed_value=30,
     min_x_cap=5,
-    label_wrap_width=42
+    label_wrap_width=42,
+    dpi=300,
+    image_format="png"
 ):
     """
-    创建 KEGG 气泡图 PNG bytes。
+    创建 KEGG 气泡图，返回 image_format（png / svg / pdf）格式的 bytes。
+    dpi 只影响像素密度，图形尺寸和布局不变。
     """
 
+    image_format = check_image_format(image_format)
+
     if df is None or df.empty:
         return None
 
@@ -527,6 +943,9 @@ def create_kegg_bubbleplot_bytes(
         max_size=bubble_max_size
     )
 
+    # matplotlib 导入较慢，只在真正出图时导入
+    import matplotlib.pyplot as plt
+
     height = max(6, 0.45 * len(plot_df))
 
     fig = plt.figure(figsize=(7.8, height))
@@ -620,7 +1039,7 @@ def create_kegg_bubbleplot_bytes(
     )
 
     buf = io.BytesIO()
-    fig.savefig(buf, format="png", dpi=300, bbox_inches="tight")
+    fig.savefig(buf, format=image_format, dpi=dpi, bbox_inches="tight")
     plt.close(fig)
     buf.seek(0)
 
@@ -639,12 +1058,17 @@ def create_kegg_barplot_bytes(
     clip_quantile=0.95,
     clip_fixed_value=30,
     min_x_cap=5,
-    label_wrap_width=42
+    label_wrap_width=42,
+    dpi=300,
+    image_format="png"
 ):
     """
-    创建 KEGG 条形图 PNG bytes。
+    创建 KEGG 条形图，返回 image_format（png / svg / pdf）格式的 bytes。
+    dpi 只影响像素密度，图形尺寸和布局不变。
     """
 
+    image_format = check_image_format(image_format)
+
     if df is None or df.empty:
         return None
 
@@ -659,6 +1083,9 @@ def create_kegg_barplot_bytes(
         label_wrap_width=label_wrap_width
     )
 
+    # matplotlib 导入较慢，只在真正出图时导入
+    import matplotlib.pyplot as plt
+
     height = max(6, 0.45 * len(plot_df))
 
     fig, ax = plt.subplots(figsize=(7.2, height))
@@ -730,7 +1157,7 @@ def create_kegg_barplot_bytes(
     plt.tight_layout()
 
     buf = io.BytesIO()
-    fig.savefig(buf, format="png", dpi=300, bbox_inches="tight")
+    fig.savefig(buf, format=image_format, dpi=dpi, bbox_inches="tight")
     plt.close(fig)
     buf.seek(0)
 
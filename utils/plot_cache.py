@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+
+"""
+富集图渲染缓存
+
+matplotlib 以 300 dpi + bbox_inches="tight" 出图是界面上最慢的一步，
+而 Streamlit 每次交互都会重跑脚本。这里缓存渲染好的 PNG：
+
+1. 缓存键 = (绘图函数, 绘图数据表的内容哈希, 绘图参数, dpi)，
+   数据表相同、参数相同的图只渲染一次；
+2. 进程内 LRU，按 PNG 总字节数限制大小（DEFAULT_MAX_BYTES）；
+3. 页面显示使用 PREVIEW_DPI 的低分辨率预览，下载时才渲染 EXPORT_DPI 的高清图。
+"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Callable, Optional, Tuple
+
+import pandas as pd
+
+
+PREVIEW_DPI = 100
+EXPORT_DPI = 300
+
+# 绘图函数支持的输出格式；svg / pdf 为矢量图，dpi 只影响其中的位图元素
+PLOT_FORMATS = ("png", "svg", "pdf")
+PLOT_MIME_TYPES = {
+    "png": "image/png",
+    "svg": "image/svg+xml",
+    "pdf": "application/pdf",
+}
+
+# 渲染缓存总大小上限（约 64MB）
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+def check_image_format(image_format: str) -> str:
+    """
+    校验输出格式，返回小写格式名。
+    """
+    fmt = str(image_format).lower()
+    if fmt not in PLOT_FORMATS:
+        raise ValueError(f"image_format 必须是 {PLOT_FORMATS} 之一，当前为: {image_format}")
+    return fmt
+
+
+def frame_hash(df: Optional[pd.DataFrame]) -> str:
+    """
+    数据表内容哈希（列名 + 每行的值，不含行索引）。
+    """
+    if df is None:
+        return "none"
+
+    h = hashlib.sha1(json.dumps([str(c) for c in df.columns]).encode())
+    h.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return h.hexdigest()[:24]
+
+
+def plot_key(plot_func: Callable, df: Optional[pd.DataFrame], dpi: int, params: dict) -> Tuple:
+    return (
+        f"{plot_func.__module__}.{plot_func.__qualname__}",
+        frame_hash(df),
+        json.dumps(params, sort_keys=True, default=str),
+        int(dpi),
+    )
+
+
+class RenderCache:
+    """
+    按总字节数限制大小的 PNG LRU 缓存，线程安全。
+    绘图函数返回 None（没有可画的数据）时同样缓存。
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple, Optional[bytes]]" = OrderedDict()
+        self._total = 0
+        self._lock = threading.Lock()
+
+    def __contains__(self, key: Tuple) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def get(self, key: Tuple) -> Tuple[bool, Optional[bytes]]:
+        """
+        返回 (是否命中, PNG bytes)。
+        """
+        with self._lock:
+            if key not in self._entries:
+                return False, None
+            self._entries.move_to_end(key)
+            return True, self._entries[key]
+
+    def put(self, key: Tuple, data: Optional[bytes]) -> None:
+        size = len(data) if data else 0
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            self._total -= len(old) if old else 0
+
+            self._entries[key] = data
+            self._total += size
+
+            while self._total > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._total -= len(evicted) if evicted else 0
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._total = 0
+
+
+_RENDER_CACHE = RenderCache()
+
+
+def get_render_cache() -> RenderCache:
+    return _RENDER_CACHE
+
+
+def cached_plot(
+    plot_func: Callable[..., Optional[bytes]],
+    df: Optional[pd.DataFrame],
+    dpi: int = EXPORT_DPI,
+    cache: Optional[RenderCache] = None,
+    **params
+) -> Optional[bytes]:
+    """
+    带缓存地调用 plot_func(df=df, dpi=dpi, **params)。
+    """
+    cache = cache or _RENDER_CACHE
+    key = plot_key(plot_func, df, dpi, params)
+
+    hit, data = cache.get(key)
+    if not hit:
+        data = plot_func(df=df, dpi=dpi, **params)
+        cache.put(key, data)
+
+    return data
+
+
+def is_rendered(
+    plot_func: Callable[..., Optional[bytes]],
+    df: Optional[pd.DataFrame],
+    dpi: int = EXPORT_DPI,
+    cache: Optional[RenderCache] = None,
+    **params
+) -> bool:
+    """
+    该图是否已经在缓存中（用于判断高清图是否需要重新渲染）。
+    """
+    cache = cache or _RENDER_CACHE
+    return plot_key(plot_func, df, dpi, params) in cache
@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+
+"""
+富集图的 Vega-Lite 规格（浏览器端交互式渲染）
+
+matplotlib 出图需要在服务器上栅格化整张图；页面预览只需要把前 N 条结果
+和编码方式发给浏览器，由 st.vega_lite_chart 在客户端绘制，
+服务器不再渲染 PNG，鼠标悬停还能看到 geneID、p 值等信息。
+
+每个函数接受与对应 matplotlib 绘图函数相同的参数（dpi / image_format 等
+只对位图有意义的参数除外），选取数据的逻辑也直接复用绘图函数的准备步骤，
+因此交互图与下载的静态图展示的是同一批条目。返回值是可以 JSON 序列化的 dict。
+"""
+
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from utils.go_enrichment import prepare_go_plot_subsets
+from utils.kegg_enrichment import prepare_kegg_plot_df
+
+
+VEGA_LITE_SCHEMA = "https://vega.github.io/schema/vega-lite/v5.json"
+
+# 与 matplotlib 图中 coolwarm 色图接近的配色
+RICH_FACTOR_SCHEME = {"scheme": "blueorange"}
+
+
+def _records(df: pd.DataFrame, columns: List[str]) -> List[Dict[str, object]]:
+    """
+    DataFrame -> Vega-Lite 内联数据；numpy 标量转为 Python 类型，缺失值转为 None。
+    """
+    out = df[columns].astype(object).where(df[columns].notna(), None)
+    return [
+        {k: (v.item() if isinstance(v, np.generic) else v) for k, v in row.items()}
+        for row in out.to_dict(orient="records")
+    ]
+
+
+def go_barplot_spec(
+    df: pd.DataFrame,
+    top_n: int = 10,
+    plot_metric: str = "fdr",
+    **_
+) -> Optional[dict]:
+    """
+    与 create_go_barplot_bytes 对应的分面条形图：每个大类一行，纵轴为 term。
+    """
+    subsets, score_col, x_label = prepare_go_plot_subsets(df, top_n=top_n, plot_metric=plot_metric)
+    if not subsets:
+        return None
+
+    plot_df = pd.concat([sub for _, sub in subsets], ignore_index=True)
+    columns = [
+        "go_id", "Description_short", "ontology", score_col,
+        "Count", "GeneRatio", "pvalue", "p.adjust", "geneID"
+    ]
+
+    return {
+        "$schema": VEGA_LITE_SCHEMA,
+        "data": {"values": _records(plot_df, columns)},
+        "mark": {"type": "bar"},
+        "encoding": {
+            "row": {"field": "ontology", "type": "nominal", "title": None, "sort": ["BP", "CC", "MF"]},
+            "y": {
+                "field": "Description_short",
+                "type": "nominal",
+                "sort": "-x",
+                "title": "GO term",
+                "axis": {"labelLimit": 360},
+            },
+            "x": {"field": score_col, "type": "quantitative", "title": x_label},
+            "tooltip": [
+                {"field": "go_id", "type": "nominal"},
+                {"field": "Description_short", "type": "nominal", "title": "term"},
+                {"field": "Count", "type": "quantitative"},
+                {"field": "GeneRatio", "type": "nominal"},
+                {"field": "pvalue", "type": "quantitative", "format": ".2e"},
+                {"field": "p.adjust", "type": "quantitative", "format": ".2e"},
+                {"field": "geneID", "type": "nominal"},
+            ],
+        },
+        "resolve": {"scale": {"y": "independent"}},
+    }
+
+
+def _kegg_plot_records(df: pd.DataFrame, params: dict) -> Optional[List[Dict[str, object]]]:
+    if df is None or df.empty:
+        return None
+
+    plot_df, _ = prepare_kegg_plot_df(df=df, **params)
+    columns = [
+        "ID", "Description", "minus_log10_pvalue_plot", "RichFactor",
+        "InputNumber", "Count", "GeneRatio", "pvalue", "p.adjust"
+    ]
+    return _records(plot_df, [c for c in columns if c in plot_df.columns])
+
+
+def _kegg_tooltip() -> List[dict]:
+    return [
+        {"field": "ID", "type": "nominal"},
+        {"field": "Description", "type": "nominal"},
+        {"field": "InputNumber", "type": "quantitative", "title": "Input number"},
+        {"field": "RichFactor", "type": "quantitative", "format": ".3f", "title": "Rich factor"},
+        {"field": "pvalue", "type": "quantitative", "format": ".2e"},
+        {"field": "p.adjust", "type": "quantitative", "format": ".2e"},
+    ]
+
+
+def kegg_bubbleplot_spec(
+    df: pd.DataFrame,
+    top_n: int = 20,
+    bubble_min_size: int = 25,
+    bubble_max_size: int = 220,
+    clip_minus_log10_p: bool = True,
+    clip_mode: str = "quantile",
+    clip_quantile: float = 0.95,
+    clip_fixed_value: float = 30,
+    min_x_cap: float = 5,
+    label_wrap_width: int = 42,
+    **_
+) -> Optional[dict]:
+    """
+    与 create_kegg_bubbleplot_bytes 对应的气泡图：横轴 -log10(P)，
+    气泡大小为 InputNumber，颜色为 RichFactor。
+    """
+    records = _kegg_plot_records(df, {
+        "top_n": top_n,
+        "clip_minus_log10_p": clip_minus_log10_p,
+        "clip_mode": clip_mode,
+        "clip_quantile": clip_quantile,
+        "clip_fixed_value": clip_fixed_value,
+        "min_x_cap": min_x_cap,
+        "label_wrap_width": label_wrap_width,
+    })
+    if not records:
+        return None
+
+    return {
+        "$schema": VEGA_LITE_SCHEMA,
+        "data": {"values": records},
+        "mark": {"type": "circle", "opacity": 0.95, "stroke": "black", "strokeWidth": 0.45},
+        "encoding": {
+            "y": {
+                "field": "Description",
+                "type": "nominal",
+                "sort": "-x",
+                "title": None,
+                "axis": {"labelLimit": label_wrap_width * 8},
+            },
+            "x": {"field": "minus_log10_pvalue_plot", "type": "quantitative", "title": "-log10(P-value)"},
+            "size": {
+                "field": "InputNumber",
+                "type": "quantitative",
+                "title": "Input number",
+                "scale": {"range": [bubble_min_size, bubble_max_size]},
+            },
+            "color": {
+                "field": "RichFactor",
+                "type": "quantitative",
+                "title": "Rich factor",
+                "scale": RICH_FACTOR_SCHEME,
+            },
+            "tooltip": _kegg_tooltip(),
+        },
+    }
+
+
+def kegg_barplot_spec(
+    df: pd.DataFrame,
+    top_n: int = 20,
+    clip_minus_log10_p: bool = True,
+    clip_mode: str = "quantile",
+    clip_quantile: float = 0.95,
+    clip_fixed_value: float = 30,
+    min_x_cap: float = 5,
+    label_wrap_width: int = 42,
+    **_
+) -> Optional[dict]:
+    """
+    与 create_kegg_barplot_bytes 对应的条形图：横轴 -log10(P)，颜色为 RichFactor。
+    """
+    records = _kegg_plot_records(df, {
+        "top_n": top_n,
+        "clip_minus_log10_p": clip_minus_log10_p,
+        "clip_mode": clip_mode,
+        "clip_quantile": clip_quantile,
+        "clip_fixed_value": clip_fixed_value,
+        "min_x_cap": min_x_cap,
+        "label_wrap_width": label_wrap_width,
+    })
+    if not records:
+        return None
+
+    return {
+        "$schema": VEGA_LITE_SCHEMA,
+        "data": {"values": records},
+        "mark": {"type": "bar"},
+        "encoding": {
+            "y": {
+                "field": "Description",
+                "type": "nominal",
+                "sort": "-x",
+                "title": None,
+                "axis": {"labelLimit": label_wrap_width * 8},
+            },
+            "x": {"field": "minus_log10_pvalue_plot", "type": "quantitative", "title": "-log10(P-value)"},
+            "color": {
+                "field": "RichFactor",
+                "type": "quantitative",
+                "title": "Rich factor",
+                "scale": RICH_FACTOR_SCHEME,
+            },
+            "tooltip": _kegg_tooltip(),
+        },
+    }
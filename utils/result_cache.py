@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+
+"""
+富集结果缓存
+
+同一个 DEG 列表只改作图参数（top_n、截断分位数、气泡大小等）时，
+Streamlit 每次重跑脚本都会重新做一次富集。这里按「输入内容」缓存结果：
+
+1. 缓存键 = sha1(分析类型 + 去重排序后的基因集合 + 分析参数 + 注释文件指纹)，
+   注释文件指纹为 (路径, 大小, mtime)，文件更新后旧结果自动失效；
+   collapse_homoeologs=True 时同源对数据库（cs_self_homolog_map 的分库）也计入指纹；
+2. 进程内按 LRU 保留最近 DEFAULT_MAX_ENTRIES 个结果，所有会话共享；
+3. 同时写入 data/cache/results/<键>.pkl，进程重启后仍可命中，
+   磁盘上只保留最近 DEFAULT_MAX_DISK_ENTRIES 个文件；
+4. 缓存的是 run_go_enrichment / run_kegg_enrichment 返回的
+   (结果表, 显著结果表, 摘要表)，取出时返回副本，调用方可以随意修改。
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Optional, Sequence, Tuple
+
+import pandas as pd
+
+from utils.go_index import CACHE_DIR
+
+
+RESULT_CACHE_DIR = CACHE_DIR / "results"
+
+# 结果表格式变化时加一，旧缓存自动失效
+RESULT_CACHE_VERSION = 1
+
+DEFAULT_MAX_ENTRIES = 32
+DEFAULT_MAX_DISK_ENTRIES = 256
+
+Frames = Tuple[pd.DataFrame, ...]
+
+
+def _file_fingerprint(paths: Iterable[str]) -> list:
+    """
+    (绝对路径, 大小, mtime)；文件不存在时记为 None，由分析函数自己报错。
+    """
+    fingerprint = []
+    for p in paths:
+        try:
+            st = os.stat(p)
+            fingerprint.append([os.path.abspath(p), st.st_size, st.st_mtime_ns])
+        except OSError:
+            fingerprint.append([os.path.abspath(p), None, None])
+    return fingerprint
+
+
+def _homoeolog_files() -> list:
+    """
+    homoeolog 合并读取的同源对数据库文件。
+    """
+    # 延迟导入：只有合并 homoeolog 时才需要读取 manifest
+    from utils.db_query import get_table_db_files
+
+    return get_table_db_files("cs_self_homolog_map")
+
+
+def result_key(
+    kind: str,
+    gene_list: Iterable[str],
+    params: Dict[str, object],
+    paths: Sequence[str],
+) -> str:
+    """
+    计算缓存键。基因按集合处理：顺序、重复和首尾空白不影响结果，也不影响键。
+
+    params 中 collapse_homoeologs 为真时，同源对数据库的指纹也计入键，
+    数据库更新后合并结果随之失效。
+    """
+    genes = sorted({str(g).strip() for g in gene_list if str(g).strip()})
+
+    paths = list(paths)
+    if params.get("collapse_homoeologs"):
+        paths += _homoeolog_files()
+
+    h = hashlib.sha1(f"result_v{RESULT_CACHE_VERSION}:{kind}".encode())
+    h.update(json.dumps(params, sort_keys=True, default=str).encode())
+    h.update(json.dumps(_file_fingerprint(paths)).encode())
+    h.update("\n".join(genes).encode())
+    return h.hexdigest()[:24]
+
+
+class ResultCache:
+    """
+    进程内 LRU + 磁盘 pickle 的两级结果缓存，线程安全。
+    """
+
+    def __init__(
+        self,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        cache_dir: Optional[Path] = None,
+        max_disk_entries: int = DEFAULT_MAX_DISK_ENTRIES,
+    ):
+        self.max_entries = max_entries
+        self.cache_dir = Path(cache_dir or RESULT_CACHE_DIR)
+        self.max_disk_entries = max_disk_entries
+        self._entries: "OrderedDict[str, Frames]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.pkl"
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            if key in self._entries:
+                return True
+        return self._path(key).exists()
+
+    def get(self, key: str) -> Optional[Frames]:
+        with self._lock:
+            frames = self._entries.get(key)
+            if frames is not None:
+                self._entries.move_to_end(key)
+                return tuple(df.copy() for df in frames)
+
+        path = self._path(key)
+        if not path.exists():
+            return None
+
+        try:
+            frames = tuple(pd.read_pickle(path))
+        except Exception:
+            # 写了一半或格式不兼容的缓存文件直接当作未命中
+            return None
+
+        self._remember(key, frames)
+        return tuple(df.copy() for df in frames)
+
+    def put(self, key: str, frames: Frames) -> None:
+        frames = tuple(df.copy() for df in frames)
+        self._remember(key, frames)
+
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            path = self._path(key)
+            tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+            pd.to_pickle(list(frames), tmp_path)
+            os.replace(tmp_path, path)
+            self._prune_disk()
+        except OSError:
+            # 只读部署环境写不了磁盘时，仍然保留内存缓存
+            pass
+
+    def _remember(self, key: str, frames: Frames) -> None:
+        with self._lock:
+            self._entries[key] = frames
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _prune_disk(self) -> None:
+        files = sorted(self.cache_dir.glob("*.pkl"), key=lambda p: p.stat().st_mtime_ns)
+        for p in files[:max(0, len(files) - self.max_disk_entries)]:
+            try:
+                p.unlink()
+            except OSError:
+                pass
+
+    def clear(self, disk: bool = False) -> None:
+        """
+        清空内存缓存；disk=True 时同时删除磁盘缓存文件。
+        """
+        with self._lock:
+            self._entries.clear()
+
+        if disk and self.cache_dir.exists():
+            for p in self.cache_dir.glob("*.pkl"):
+                try:
+                    p.unlink()
+                except OSError:
+                    pass
+
+
+_RESULT_CACHE = ResultCache()
+
+
+def get_result_cache() -> ResultCache:
+    return _RESULT_CACHE
+
+
+def cached_run(
+    kind: str,
+    run_func: Callable[..., Frames],
+    gene_list: Sequence[str],
+    paths: Sequence[str],
+    params: Dict[str, object],
+    extra_files: Sequence[str] = (),
+    cache: Optional[ResultCache] = None,
+) -> Tuple[str, Frames]:
+    """
+    带缓存地调用 run_func(gene_list, *paths, **params)。
+
+    extra_files 为 paths 以外会影响结果的文件（例如 GO DAG 模式下的 OBO），
+    只参与缓存键计算。返回 (缓存键, 结果表元组)。
+    """
+    cache = cache or _RESULT_CACHE
+    key = result_key(kind, gene_list, params, list(paths) + list(extra_files))
+
+    frames = cache.get(key)
+    if frames is None:
+        frames = tuple(run_func(list(gene_list), *paths, **params))
+        cache.put(key, frames)
+
+    return key, frames
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+
+"""
+分库路由表
+
+原来的 _get_table_db_path 每次调用都要查 manifest 字典、判断拆分策略、
+兼容 dict / list 两种 shards 写法（list 需要逐个扫描），并新建一个 Path。
+批量查询时每个基因号都要走一遍。这里在加载 manifest 后一次性编译为：
+
+1. whole_paths:  表名 -> 分库路径（whole_table）
+2. shard_paths:  (表名, 染色体) -> 分库路径（by_chr），
+   没有单独分库的染色体预先指向 "unknown" 分库（如果有）；
+3. 编译时检查所有分库文件是否存在，缺失的文件记录在 missing_files 中并给出警告。
+
+之后单个基因号的路由只剩一次 parse_gene_id（有缓存）和一次字典查找。
+"""
+
+import warnings
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from utils.gene_id import UNKNOWN_CHR, parse_gene_id
+
+
+WHOLE_TABLE = "whole_table"
+BY_CHR_STRATEGIES = frozenset({"by_chr", "by_chr_from_gene_id"})
+
+# 小麦 21 条染色体
+CHR_NAMES = tuple(f"{n}{g}" for n in "1234567" for g in "ABD")
+
+
+class ShardFile(NamedTuple):
+    table: str
+    strategy: str
+    shard: str
+    path: Path
+
+
+class ShardRouter:
+    """
+    由 manifest 编译得到的只读路由表。
+    """
+
+    def __init__(self, manifest: dict, root: Path, validate: bool = True):
+        self.manifest = manifest
+        self.root = Path(root)
+        self.tables: Dict[str, dict] = dict(manifest.get("tables", {}))
+        self.whole_paths: Dict[str, Path] = {}
+        self.shard_paths: Dict[Tuple[str, str], Path] = {}
+        self.files: List[ShardFile] = []
+
+        for table, info in self.tables.items():
+            strategy = info.get("strategy")
+
+            if strategy == WHOLE_TABLE:
+                path = self.root / info["path"]
+                self.whole_paths[table] = path
+                self.files.append(ShardFile(table, strategy, "", path))
+
+            elif strategy in BY_CHR_STRATEGIES:
+                self._compile_shards(table, strategy, info.get("shards", {}))
+
+        self.missing_files: List[ShardFile] = [f for f in self.files if not f.path.exists()]
+        if validate and self.missing_files:
+            preview = "\n".join(str(f.path) for f in self.missing_files[:5])
+            warnings.warn(
+                f"manifest.json 中有 {len(self.missing_files)} 个分库文件不存在，"
+                f"相关查询会失败：\n{preview}",
+                stacklevel=2,
+            )
+
+    def _compile_shards(self, table: str, strategy: str, shards) -> None:
+        # 兼容两种写法：
+        # "shards": {"5B": {"path": "..."}}
+        # "shards": [{"chr": "5B", "path": "..."}]
+        if isinstance(shards, dict):
+            items = [(name, shard["path"]) for name, shard in shards.items()]
+        elif isinstance(shards, list):
+            items = [(shard.get("chr", ""), shard["path"]) for shard in shards]
+        else:
+            items = []
+
+        paths: Dict[str, Path] = {}
+        for name, rel_path in items:
+            path = self.root / rel_path
+            self.files.append(ShardFile(table, strategy, name, path))
+            # list 写法中同一染色体出现多次时，与原来的线性扫描一致取第一个
+            paths.setdefault(name, path)
+
+        fallback = paths.get(UNKNOWN_CHR)
+        for chr_name in CHR_NAMES + (UNKNOWN_CHR,):
+            path = paths.get(chr_name, fallback)
+            if path is not None:
+                self.shard_paths[(table, chr_name)] = path
+
+    def table_info(self, table: str) -> dict:
+        """
+        manifest 中某个表的拆分信息。
+        """
+        try:
+            return self.tables[table]
+        except KeyError:
+            raise KeyError(
+                f"manifest.json 中找不到表 {table}。\n"
+                f"请检查 data/db/manifest.json 是否包含该表。"
+            )
+
+    def _check_by_chr(self, table: str) -> None:
+        strategy = self.table_info(table).get("strategy")
+        if strategy not in BY_CHR_STRATEGIES:
+            raise ValueError(f"未知拆分策略: table={table}, strategy={strategy}")
+
+    def route(self, table: str, gene_id: Optional[str] = None) -> Path:
+        """
+        根据表名和 gene_id 返回对应的小 SQLite 数据库路径。
+        """
+        path = self.whole_paths.get(table)
+        if path is not None:
+            return path
+
+        self._check_by_chr(table)
+        if gene_id is None:
+            raise ValueError(f"表 {table} 是按染色体拆分的，必须提供 gene_id。")
+
+        chr_name = parse_gene_id(gene_id).chr
+        path = self.shard_paths.get((table, chr_name))
+        if path is None:
+            raise FileNotFoundError(
+                f"找不到表 {table} 对应染色体 {chr_name} 的分库。\n"
+                f"gene_id = {gene_id}"
+            )
+        return path
+
+    def route_many(self, table: str, gene_ids: Iterable[str]) -> Dict[Path, List[str]]:
+        """
+        把一批基因号按目标分库分组（去重，保持输入顺序）。
+
+        whole_table 的表只有一个分库；by_chr 的表按染色体分到各自的分库。
+        找不到对应分库的基因号不可能有记录，直接跳过。
+        """
+        gene_ids = list(dict.fromkeys(g for g in gene_ids if g))
+
+        path = self.whole_paths.get(table)
+        if path is not None:
+            return {path: gene_ids} if gene_ids else {}
+
+        self._check_by_chr(table)
+        shard_paths = self.shard_paths
+        groups: Dict[Path, List[str]] = {}
+
+        for gene_id in gene_ids:
+            path = shard_paths.get((table, parse_gene_id(gene_id).chr))
+            if path is not None:
+                groups.setdefault(path, []).append(gene_id)
+
+        return groups
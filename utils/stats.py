@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+
+"""
+多重检验校正与 q 值（GO / KEGG 富集共用）
+
+GO 富集原来为了 BH 校正导入 statsmodels（导入慢、占内存），KEGG 富集则有自己的
+NumPy 版 bh_adjust。这里统一为纯 NumPy 实现：
+
+1. bh_adjust / by_adjust / bonferroni_adjust / p_adjust：向量化校正，
+   计算方式与 statsmodels.stats.multitest.multipletests 的
+   fdr_bh / fdr_by / bonferroni 逐位一致；
+2. bh_reject：BH step-up 判定，与 multipletests 返回的 reject 一致；
+   NaN 的 p 值按 R 的 p.adjust 处理：不计入检验个数，结果仍为 NaN（判定为 False）；
+3. storey_qvalues：Storey q 值，按 clusterProfiler 调用 qvalue 包的方式
+   （单个 lambda = 0.05）估计 pi0，q = pi0 * BH 校正值。
+"""
+
+from typing import Callable, Tuple
+
+import numpy as np
+
+
+P_ADJUST_METHODS = ("BH", "BY", "bonferroni")
+
+# clusterProfiler 计算 qvalue 时使用的 lambda
+DEFAULT_STOREY_LAMBDA = 0.05
+
+
+def _as_pvalues(pvalues) -> np.ndarray:
+    p = np.asarray(pvalues, dtype=float)
+    if p.ndim != 1:
+        raise ValueError("pvalues 必须是一维数组")
+    return p
+
+
+def _step_up(p: np.ndarray, scale: float = 1.0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    BH 型 step-up 校正。返回 (排序下标, 排序后的校正值)。
+
+    scale 为 BY 校正的调和数因子 sum(1/i)，BH 时为 1。
+    """
+    n = len(p)
+    order = np.argsort(p)
+
+    ecdf = np.arange(1, n + 1) / float(n)
+    if scale != 1.0:
+        ecdf = ecdf / scale
+
+    adjusted = p[order] / ecdf
+    adjusted = np.minimum.accumulate(adjusted[::-1])[::-1]
+    adjusted[adjusted > 1] = 1
+    return order, adjusted
+
+
+def _unsort(order: np.ndarray, values: np.ndarray) -> np.ndarray:
+    result = np.empty_like(values)
+    result[order] = values
+    return result
+
+
+def _ignore_nan(p: np.ndarray, adjust: Callable[[np.ndarray], np.ndarray], fill) -> np.ndarray:
+    """
+    只对非 NaN 的 p 值做校正（检验个数 n 也只计非 NaN），NaN 位置填 fill。
+
+    与 R 的 p.adjust 一致；multipletests 遇到 NaN 会让整列都变成 NaN。
+    """
+    ok = ~np.isnan(p)
+    if ok.all():
+        return adjust(p)
+
+    result = np.full(len(p), fill, dtype=np.asarray(fill).dtype)
+    if ok.any():
+        result[ok] = adjust(p[ok])
+    return result
+
+
+def bh_adjust(pvalues) -> np.ndarray:
+    """
+    Benjamini-Hochberg FDR 校正
+    """
+    p = _as_pvalues(pvalues)
+    return _ignore_nan(p, lambda x: _unsort(*_step_up(x)), np.nan)
+
+
+def by_adjust(pvalues) -> np.ndarray:
+    """
+    Benjamini-Yekutieli FDR 校正（任意相关性下成立，比 BH 保守）
+    """
+    def adjust(x: np.ndarray) -> np.ndarray:
+        harmonic = np.sum(1.0 / np.arange(1, len(x) + 1))
+        return _unsort(*_step_up(x, scale=harmonic))
+
+    return _ignore_nan(_as_pvalues(pvalues), adjust, np.nan)
+
+
+def bonferroni_adjust(pvalues) -> np.ndarray:
+    """
+    Bonferroni 校正
+    """
+    def adjust(x: np.ndarray) -> np.ndarray:
+        adjusted = x * float(len(x))
+        adjusted[adjusted > 1] = 1
+        return adjusted
+
+    return _ignore_nan(_as_pvalues(pvalues), adjust, np.nan)
+
+
+def p_adjust(pvalues, method: str = "BH") -> np.ndarray:
+    """
+    按 method（BH / BY / bonferroni，不区分大小写，也接受 fdr_bh / fdr_by）校正 p 值。
+    """
+    name = str(method).lower()
+    if name in {"bh", "fdr_bh", "fdr"}:
+        return bh_adjust(pvalues)
+    if name in {"by", "fdr_by"}:
+        return by_adjust(pvalues)
+    if name == "bonferroni":
+        return bonferroni_adjust(pvalues)
+
+    raise ValueError(f"method 必须是 {P_ADJUST_METHODS} 之一，当前为: {method}")
+
+
+def bh_reject(pvalues, alpha: float = 0.05) -> np.ndarray:
+    """
+    BH step-up 判定：排序后最后一个满足 p_(i) <= i / n * alpha 的位置及之前的检验都拒绝原假设。
+    NaN 的 p 值不参与判定，结果为 False。
+    """
+    def reject_sorted(x: np.ndarray) -> np.ndarray:
+        n = len(x)
+        order = np.argsort(x)
+        reject = x[order] <= np.arange(1, n + 1) / float(n) * alpha
+        if reject.any():
+            reject[:np.flatnonzero(reject)[-1]] = True
+        return _unsort(order, reject)
+
+    return _ignore_nan(_as_pvalues(pvalues), reject_sorted, False)
+
+
+def storey_pi0(pvalues, lam: float = DEFAULT_STOREY_LAMBDA) -> float:
+    """
+    真零假设比例 pi0 的 Storey 估计：mean(p >= lam) / (1 - lam)，上限为 1。
+    NaN 的 p 值不参与估计。
+    """
+    p = _as_pvalues(pvalues)
+    p = p[~np.isnan(p)]
+    if len(p) == 0:
+        return 1.0
+
+    return min(float(np.mean(p >= lam)) / (1.0 - lam), 1.0)
+
+
+def storey_qvalues(pvalues, lam: float = DEFAULT_STOREY_LAMBDA) -> np.ndarray:
+    """
+    Storey q 值：pi0 * BH 校正值。
+
+    与 qvalue 包一致，pi0 估计为 0（所有 p 值都小于 lam）时无法计算，
+    返回全 NaN（clusterProfiler 在这种情况下 qvalue 列同样为 NA）。
+    """
+    p = _as_pvalues(pvalues)
+    if len(p) == 0:
+        return np.array([])
+
+    pi0 = storey_pi0(p, lam)
+    if pi0 <= 0:
+        return np.full(len(p), np.nan)
+
+    return pi0 * bh_adjust(p)